@@ -0,0 +1,3 @@
+@echo off
+REM Keeps the Whisper model loaded for process_video.bat (Ctrl+C to stop)
+python src\asr_worker.py serve %*
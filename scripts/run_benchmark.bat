@@ -0,0 +1,3 @@
+@echo off
+REM Usage: scripts\run_benchmark.bat deadlines | startup | nxt | infer | suite [--save-baseline]
+python src\benchmark.py %*
@@ -0,0 +1,3 @@
+@echo off
+REM Usage: scripts\run_live.bat data\raw\AMI\standup.txt  (Ctrl+C to stop)
+python src\live.py %*
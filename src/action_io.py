@@ -0,0 +1,291 @@
+from __future__ import annotations
+import json
+import os
+from datetime import date
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+#Output sinks and readers for action items
+#
+# Writers take one meeting's actions at a time so nothing accumulates in
+# memory:
+#   .json     same layout as json.dumps(results, indent=2), streamed to a
+#             temp file and renamed into place when the run finishes
+#   .jsonl    one action per line, flushed as each meeting finishes
+#   .parquet  typed columns, one row group per meeting (needs pyarrow)
+# Readers pick whichever of these exists and can return a single page.
+
+ACTION_FIELDS = [
+    "meeting",
+    "speaker",
+    "speaker_role",
+    "assignee",
+    "assignee_role",
+    "action_item",
+    "deadline_text",
+    "deadline_iso",
+]
+
+FORMATS = ("json", "jsonl", "parquet")
+
+
+def format_for(path: Path, fmt: Optional[str] = None) -> str:
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r}, expected one of {FORMATS}")
+        return fmt
+    suffix = Path(path).suffix.lower().lstrip(".")
+    return suffix if suffix in FORMATS else "json"
+
+
+class ActionSink:
+    """Base sink: write(actions) per meeting, close() at the end."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+
+    def write(self, actions: List[dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+    def __enter__(self) -> "ActionSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonSink(ActionSink):
+    """JSON array, byte-identical to json.dumps(results, indent=2), written atomically."""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._f = self._tmp.open("w", encoding="utf-8")
+
+    def write(self, actions: List[dict]):
+        for item in actions:
+            self._f.write("[\n  " if self.count == 0 else ",\n  ")
+            self._f.write(json.dumps(item, indent=2).replace("\n", "\n  "))
+            self.count += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.write("\n]" if self.count else "[]")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        # keep the previous output rather than a half-written array
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class JsonlSink(ActionSink):
+    """
+    JSON Lines, flushed after every meeting so progress is visible on disk.
+    append=True adds to an existing file instead of replacing it.
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        super().__init__(path)
+        self._f = self.path.open("a" if append else "w", encoding="utf-8")
+
+    def write(self, actions: List[dict]):
+        for item in actions:
+            self._f.write(json.dumps(item, ensure_ascii=False))
+            self._f.write("\n")
+            self.count += 1
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    fields = [pa.field(name, pa.string()) for name in ACTION_FIELDS]
+    fields[0] = pa.field("meeting", pa.dictionary(pa.int32(), pa.string()))
+    fields[-1] = pa.field("deadline_iso", pa.date32())
+    return pa.schema(fields)
+
+
+class ParquetSink(ActionSink):
+    """Parquet with typed columns (deadline_iso is a date), one row group per meeting."""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow") from e
+        self._pa_schema = _parquet_schema()
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._writer = pq.ParquetWriter(str(self._tmp), self._pa_schema)
+
+    def write(self, actions: List[dict]):
+        import pyarrow as pa
+
+        if not actions:
+            return
+        columns = {name: [a.get(name) for a in actions] for name in ACTION_FIELDS}
+        columns["deadline_iso"] = [date.fromisoformat(d) if d else None for d in columns["deadline_iso"]]
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self._pa_schema))
+        self.count += len(actions)
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._tmp.unlink(missing_ok=True)
+
+
+_SINKS = {"json": JsonSink, "jsonl": JsonlSink, "parquet": ParquetSink}
+
+
+def open_sink(path: Path, fmt: Optional[str] = None) -> ActionSink:
+    """Sink for `path`; the format comes from `fmt` or the file suffix."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return _SINKS[format_for(path, fmt)](path)
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+def find_actions_file(path: Path) -> Optional[Path]:
+    """
+    The newest existing output among path and its .json/.jsonl/.parquet
+    siblings (same stem), or None.
+    """
+    path = Path(path)
+    candidates = [path] + [path.with_suffix(f".{fmt}") for fmt in FORMATS]
+    existing = [p for p in dict.fromkeys(candidates) if p.exists()]
+    if not existing:
+        return None
+    return max(existing, key=lambda p: p.stat().st_mtime_ns)
+
+
+def _parquet_rows(table) -> List[dict]:
+    rows = table.to_pylist()
+    for row in rows:
+        d = row.get("deadline_iso")
+        if d is not None:
+            row["deadline_iso"] = d.isoformat()
+    return rows
+
+
+def count_actions(path: Path) -> int:
+    """Number of actions; JSONL and Parquet are counted without decoding rows."""
+    path = Path(path)
+    fmt = format_for(path)
+    if fmt == "jsonl":
+        with path.open(encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(str(path)).metadata.num_rows
+    return len(json.loads(path.read_text(encoding="utf-8")))
+
+
+def iter_actions(path: Path) -> Iterator[dict]:
+    path = Path(path)
+    fmt = format_for(path)
+    if fmt == "jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(str(path))
+        for i in range(pf.num_row_groups):
+            yield from _parquet_rows(pf.read_row_group(i))
+    else:
+        yield from json.loads(path.read_text(encoding="utf-8"))
+
+
+def read_actions(path: Path, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """
+    Actions [offset, offset + limit). JSONL skips earlier lines without
+    parsing them and Parquet only reads the row groups that overlap the
+    page; the legacy JSON array has to be parsed whole.
+    """
+    path = Path(path)
+    stop = None if limit is None else offset + limit
+    fmt = format_for(path)
+    if fmt == "jsonl":
+        with path.open(encoding="utf-8") as f:
+            lines = (line for line in f if line.strip())
+            return [json.loads(line) for line in islice(lines, offset, stop)]
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(str(path))
+        rows: List[dict] = []
+        start = 0
+        for i in range(pf.num_row_groups):
+            n = pf.metadata.row_group(i).num_rows
+            end = start + n
+            if end > offset and (stop is None or start < stop):
+                group = _parquet_rows(pf.read_row_group(i))
+                lo = max(offset - start, 0)
+                hi = n if stop is None else min(stop - start, n)
+                rows.extend(group[lo:hi])
+            if stop is not None and end >= stop:
+                break
+            start = end
+        return rows
+    return list(islice(iter_actions(path), offset, stop))
+
+
+def read_page(path: Path, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+    """read_actions plus the total count, from a single read of the file."""
+    path = Path(path)
+    fmt = format_for(path)
+    if fmt == "parquet":
+        # both come from the footer and the overlapping row groups
+        return read_actions(path, offset, limit), count_actions(path)
+    stop = None if limit is None else offset + limit
+    if fmt == "jsonl":
+        page: List[dict] = []
+        total = 0
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if total >= offset and (stop is None or total < stop):
+                    page.append(json.loads(line))
+                total += 1
+        return page, total
+    actions = json.loads(path.read_text(encoding="utf-8"))
+    return actions[offset:stop], len(actions)
+
+
+def write_actions(path: Path, actions: Iterable[dict], fmt: Optional[str] = None) -> int:
+    """Write a whole list of actions through the matching sink; returns the count."""
+    with open_sink(path, fmt) as sink:
+        sink.write(list(actions))
+    return sink.count
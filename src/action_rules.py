@@ -1,6 +1,10 @@
 from __future__ import annotations
 import re
-from typing import Optional, Dict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Iterable, List, Tuple
+
+from utils import code_fingerprint
 
 # Phrases that usually start an action or request
 
@@ -34,6 +38,147 @@ DEADLINE_PATTERNS = [
 ]
 
 
+# ---------------------------------------------------------------------------
+# Compiled single-pass matcher
+#
+# One zero-width scan over the lowercased utterance reports every trigger
+# and every deadline anchor with its offset (overlaps included, so
+# "we need today" yields both "we need to" and "today").  The deadline
+# and addressee rules are then resolved from those offsets with anchored
+# matches instead of re-scanning the whole text once per pattern.
+# ---------------------------------------------------------------------------
+
+# Deadline anchors, indexed like DEADLINE_PATTERNS (lower index wins).
+_DEADLINE_ANCHORS = {
+    "by ": 0,
+    "in the next ": 1,
+    "within ": 2,
+    "next ": 3,
+    "tomorrow": 3,
+    "today": 3,
+    "tonight": 3,
+}
+
+# Anchored versions of DEADLINE_PATTERNS, applied to the lowercased text.
+_DEADLINE_AT = [
+    re.compile(r"by [^,.!?]+"),
+    re.compile(r"in the next [^,.!?]+"),
+    re.compile(r"within [^,.!?]+"),
+    re.compile(r"(?:next [^,.!?]+|tomorrow|today|tonight)\b"),
+]
+
+
+def _alternation(words: Iterable[str]) -> str:
+    # longest first so "let's all" wins over "let's" at the same offset
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_FIRST_CHARS = re.escape("".join(sorted({w[0] for w in [*CLEAN_TRIGGERS, *_DEADLINE_ANCHORS]})))
+_SCAN_RE = re.compile(
+    rf"(?=[{_FIRST_CHARS}])"
+    rf"(?=(?P<trigger>{_alternation(CLEAN_TRIGGERS)})"
+    rf"|\b(?P<deadline>{_alternation(_DEADLINE_ANCHORS)}))"
+)
+
+_TRIGGER_RE = re.compile(_alternation(CLEAN_TRIGGERS))
+
+_SENTENCE_END_RE = re.compile(r"[.?!]")
+_AFTER_CAN_YOU_RE = re.compile(r",?\s+([A-Z][a-z]+)\b")
+_LEADING_NAME_RE = re.compile(r"([A-Z][a-z]+),")
+
+
+class _Scan:
+    """Offsets of every trigger / deadline anchor / addressee cue in one utterance."""
+
+    __slots__ = ("triggers", "deadlines", "can_you", "please")
+
+    def __init__(self, original: str, lower: str):
+        self.triggers: List[Tuple[int, str]] = []
+        self.deadlines: List[Tuple[int, int]] = []  # (priority, offset)
+        self.can_you: List[int] = []
+        self.please: List[int] = []
+
+        for m in _SCAN_RE.finditer(lower):
+            pos = m.start()
+            trig = m.group("trigger")
+            if trig is not None:
+                self.triggers.append((pos, trig))
+                # addressee rules are case-sensitive, so check the original text
+                if trig == "can you" and original.startswith("can you", pos):
+                    self.can_you.append(pos)
+                elif trig == "please" and original.startswith("please", pos):
+                    self.please.append(pos)
+            else:
+                self.deadlines.append((_DEADLINE_ANCHORS[m.group("deadline")], pos))
+        self.deadlines.sort()
+
+
+def _name_ending_at(text: str, end: int) -> Optional[str]:
+    """Return the ``\\b[A-Z][a-z]+`` word that ends exactly at ``end``, if any."""
+    start = end
+    while start > 0 and "a" <= text[start - 1] <= "z":
+        start -= 1
+    if start == end or start == 0 or not "A" <= text[start - 1] <= "Z":
+        return None
+    start -= 1
+    if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+        return None
+    return text[start:end]
+
+
+def _name_before(text: str, pos: int, comma: bool) -> Optional[str]:
+    """Name directly before ``pos``: ``Name,\\s*`` if comma else ``Name\\s+``."""
+    end = pos
+    while end > 0 and text[end - 1].isspace():
+        end -= 1
+    if comma:
+        if end == 0 or text[end - 1] != ",":
+            return None
+        end -= 1
+    elif end == pos:
+        return None
+    return _name_ending_at(text, end)
+
+
+def _deadline_from_scan(original: str, lower: str, scan: _Scan, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+    for prio, pos in scan.deadlines:
+        if pos < start or (end is not None and pos >= end):
+            continue
+        m = _DEADLINE_AT[prio].match(lower, pos)
+        if m:
+            return original[m.start():m.end()].strip()
+    return None
+
+
+def _assignee_from_scan(original: str, scan: _Scan) -> Optional[str]:
+    # Same precedence as _extract_assignee_name, driven by the scanned offsets
+    for comma in (True, False):
+        for pos in scan.can_you:
+            nm = _name_before(original, pos, comma)
+            if nm:
+                return nm
+    for pos in scan.can_you:
+        m = _AFTER_CAN_YOU_RE.match(original, pos + len("can you"))
+        if m:
+            return m.group(1)
+    for pos in scan.please:
+        nm = _name_before(original, pos, True)
+        if nm:
+            return nm
+    m = _LEADING_NAME_RE.match(original)
+    if m:
+        return m.group(1)
+    return None
+
+
+def _extract_deadline(text: str) -> Optional[str]:
+    """Reference deadline lookup: first DEADLINE_PATTERNS entry that matches."""
+    for pat in DEADLINE_PATTERNS:
+        m = pat.search(text)
+        if m:
+            return m.group(0).strip()
+    return None
+
 
 def _extract_assignee_name(text: str) -> Optional[str]:
     """
@@ -72,6 +217,16 @@ def _extract_assignee_name(text: str) -> Optional[str]:
     return None
 
 
+def _cut_task(original: str, start: int) -> str:
+    task = original[start:].strip()
+    # Optionally, cut at the first sentence boundary after the trigger
+    # to avoid dragging too much junk at the end.
+    end_match = _SENTENCE_END_RE.search(task)
+    if end_match and end_match.end() < len(task):
+        # keep up to first . ? ! and drop the rest
+        task = task[: end_match.end()].strip()
+    return task
+
 
 def extract_task_and_deadline(text: str) -> Optional[Dict[str, Optional[str]]]:
     """
@@ -90,38 +245,23 @@ def extract_task_and_deadline(text: str) -> Optional[Dict[str, Optional[str]]]:
     lower = original.lower()
 
     # 1) Detect if this sentence even looks like an action
-    trigger_idx = None
-    for trig in CLEAN_TRIGGERS:
-        idx = lower.find(trig)
-        if idx != -1:
-            if trigger_idx is None or idx < trigger_idx:
-                trigger_idx = idx
-
-    if trigger_idx is None:
+    scan = _Scan(original, lower)
+    if not scan.triggers:
         # No action-like phrase -> treat as non-action
         return None
 
     # 2) Task text: start from the first trigger
-    task = original[trigger_idx:].strip()
-
-    # Optionally, cut at the first sentence boundary after the trigger
-    # to avoid dragging too much junk at the end.
-    end_match = re.search(r"[.?!]", task)
-    if end_match and end_match.end() < len(task):
-        # keep up to first . ? ! and drop the rest
-        task = task[: end_match.end()].strip()
+    task = _cut_task(original, scan.triggers[0][0])
 
-    # 3) Extract deadline (if any) from the original full text
-    deadline_raw: Optional[str] = None
-    for pat in DEADLINE_PATTERNS:
-        m = pat.search(original)
-        if m:
-            # use the full matched phrase or group(0)
-            deadline_raw = m.group(0).strip()
-            break
-
-    # 4) Extract assignee name (if any)
-    assignee_name = _extract_assignee_name(original)
+    # 3) + 4) Deadline and assignee. Offsets from the lowercased scan only
+    # line up with the original for ASCII text, so anything else goes
+    # through the per-pattern reference rules.
+    if original.isascii():
+        deadline_raw = _deadline_from_scan(original, lower, scan)
+        assignee_name = _assignee_from_scan(original, scan)
+    else:
+        deadline_raw = _extract_deadline(original)
+        assignee_name = _extract_assignee_name(original)
 
     # 5) Final sanity check: require at least a few words in the task
     if len(task.split()) < 3:
@@ -133,3 +273,75 @@ def extract_task_and_deadline(text: str) -> Optional[Dict[str, Optional[str]]]:
         "deadline_raw": deadline_raw,
         "assignee_name": assignee_name,
     }
+
+
+def extract_many(texts: Iterable[str]) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    Batch version of extract_task_and_deadline.
+
+    Meetings repeat a lot of short utterances ("yeah", "okay", ...), so each
+    distinct text is parsed once and duplicates get their own copy.
+    """
+    seen: Dict[str, Optional[Dict[str, Optional[str]]]] = {}
+    out: List[Optional[Dict[str, Optional[str]]]] = []
+    for text in texts:
+        if text in seen:
+            parsed = seen[text]
+            out.append(dict(parsed) if parsed is not None else None)
+            continue
+        parsed = extract_task_and_deadline(text)
+        seen[text] = parsed
+        out.append(parsed)
+    return out
+
+
+def has_trigger(lower: str) -> bool:
+    """Whether a lowercased utterance contains any action trigger (no parsing)."""
+    return _TRIGGER_RE.search(lower) is not None
+
+
+@lru_cache(maxsize=1)
+def rules_fingerprint() -> str:
+    """Version of the rules: changes whenever this module's source does."""
+    return code_fingerprint(Path(__file__))
+
+
+def find_action_spans(text: str) -> List[Dict[str, object]]:
+    """
+    Report every action span in an utterance, not only the first trigger.
+
+    Each span starts at a trigger and runs to the next sentence boundary.
+    Triggers inside an earlier span ("can you please ...") are not reported
+    again. Offsets (start/end) index into ``text`` as passed in.
+    """
+    if not text or not text.strip():
+        return []
+
+    original = text.strip()
+    lower = original.lower()
+    base = len(text) - len(text.lstrip())
+    ascii_only = original.isascii()
+    scan = _Scan(original, lower)
+
+    spans: List[Dict[str, object]] = []
+    covered = 0
+    for pos, trig in scan.triggers:
+        if pos < covered:
+            continue
+        task = _cut_task(original, pos)
+        end = pos + len(task)
+        covered = end
+        if len(task.split()) < 3:
+            continue
+        if ascii_only:
+            deadline_raw = _deadline_from_scan(original, lower, scan, pos, end)
+        else:
+            deadline_raw = _extract_deadline(task)
+        spans.append({
+            "start": base + pos,
+            "end": base + end,
+            "trigger": original[pos:pos + len(trig)],
+            "task": task,
+            "deadline_raw": deadline_raw,
+        })
+    return spans
@@ -1,70 +1,157 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import csv
+import re
+
 
 
- 
 #Loads and preprocesses AMI meeting corpus data
-# I considered defining additional classes here, but decided it would be unnecessarily complex.
+# Utterances are streamed from disk; Meeting/load_meeting are kept as the
+# simple list-based API on top of that.
 
-@dataclass
+@dataclass(slots=True)
 class Utterance:
     speaker: str
     text: str
+    start: Optional[float] = None  # seconds, when the source has timings
+    end: Optional[float] = None
 
 
 @dataclass
 class Meeting:
     name: str
-    utterances: List[Utterance]
+    utterances: Iterable[Utterance]
     roles: Dict[str, str]
 
 
-def load_roles(roles_path: Path) -> Dict[str, str]:
-    roles: Dict[str, str] = {}
-    if not roles_path.exists():
+class RolesRegistry:
+    """
+    Parses each roles.csv once and hands out per-meeting participant maps.
+
+    A roles.csv may carry an optional `meeting` column; rows with a meeting
+    name only apply to that meeting and override the shared rows. A file is
+    re-read only if its size or mtime changes.
+    """
+
+    def __init__(self):
+        self._files: Dict[Path, Tuple[Tuple[int, int], Dict[str, str], Dict[str, Dict[str, str]]]] = {}
+
+    def _load(self, roles_path: Path) -> Tuple[Dict[str, str], Dict[str, Dict[str, str]]]:
+        key = roles_path.resolve()
+        try:
+            st = key.stat()
+        except FileNotFoundError:
+            self._files.pop(key, None)
+            return {}, {}
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._files.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1], cached[2]
+
+        shared: Dict[str, str] = {}
+        per_meeting: Dict[str, Dict[str, str]] = {}
+        with key.open(encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                spk = row.get("speaker") or row.get("id") or row.get("name")
+                if not spk:
+                    continue
+                role = (row.get("role") or "").strip()
+                mtg = (row.get("meeting") or "").strip()
+                target = per_meeting.setdefault(mtg, {}) if mtg else shared
+                target[spk.strip()] = role
+        self._files[key] = (stamp, shared, per_meeting)
+        return shared, per_meeting
+
+    def roles_for(self, roles_path: Path, meeting: Optional[str] = None) -> Dict[str, str]:
+        """Speaker -> role map for `meeting` (shared rows if None)."""
+        shared, per_meeting = self._load(roles_path)
+        roles = dict(shared)
+        if meeting and meeting in per_meeting:
+            roles.update(per_meeting[meeting])
         return roles
 
-    with roles_path.open(encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    def clear(self):
+        self._files.clear()
 
-        for row in reader:
-            spk = row.get("speaker") or row.get("id") or row.get("name")
-            role = row.get("role") or ""
-            if spk:
-                roles[spk.strip()] = role.strip()
-    return roles
 
+ROLES = RolesRegistry()
 
-def load_meeting(transcript_path: Path, roles_path: Path) -> Meeting:
+
+def load_roles(roles_path: Path) -> Dict[str, str]:
+    return ROLES.roles_for(roles_path)
+
+
+# optional "[12.34-15.60] " timing prefix, written by ami_nxt for real AMI data
+_TIMING_RE = re.compile(r"^\[(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)\]\s*")
+
+
+def parse_line(line: str) -> Optional[Utterance]:
+    """One transcript line as an Utterance; None for blank lines."""
+    line = line.strip()
+    if not line:
+        return None
+    start = end = None
+    m = _TIMING_RE.match(line)
+    if m:
+        start, end = float(m.group(1)), float(m.group(2))
+        line = line[m.end():]
+    if ":" in line:
+        spk, txt = line.split(":", 1)
+        speaker = spk.strip() or "UNK"
+        text = txt.strip()
+    else:
+        speaker = "UNK"
+        text = line
+    if not text:
+        return None
+    return Utterance(speaker=speaker, text=text, start=start, end=end)
+
+
+def iter_utterances(transcript_path: Path) -> Iterator[Utterance]:
     """
-    Load a meeting from a simple transcript file:
-    Each line: SPEAKER: text , 
-    If no colon, speaker defaults to UNK. 
+    Stream utterances from a simple transcript file:
+    Each line: SPEAKER: text  (optionally prefixed with [start-end] seconds)
+    If no colon, speaker defaults to UNK.
     """
-    utterances: List[Utterance] = []
     with transcript_path.open(encoding="utf-8") as f:
         for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if ":" in line:
-                spk, txt = line.split(":", 1)
-                speaker = spk.strip() or "UNK"
-                text = txt.strip()
-            else:
-                speaker = "UNK"
-                text = line
-            if text:
-                utterances.append(Utterance(speaker=speaker, text=text))
-
-    roles = load_roles(roles_path)
+            utt = parse_line(line)
+            if utt is not None:
+                yield utt
+
+
+class _UtteranceStream:
+    """Re-iterable view of a transcript; each pass re-reads the file."""
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __iter__(self) -> Iterator[Utterance]:
+        return iter_utterances(self.path)
+
+
+def stream_meeting(transcript_path: Path, roles_path: Path) -> Meeting:
+    """Like load_meeting, but utterances are read lazily from disk."""
+    return Meeting(
+        name=transcript_path.stem,
+        utterances=_UtteranceStream(transcript_path),
+        roles=ROLES.roles_for(roles_path, transcript_path.stem),
+    )
+
+
+def load_meeting(transcript_path: Path, roles_path: Path) -> Meeting:
+    """
+    Load a meeting from a simple transcript file:
+    Each line: SPEAKER: text ,
+    If no colon, speaker defaults to UNK.
+    """
+    utterances: List[Utterance] = list(iter_utterances(transcript_path))
     return Meeting(
         name=transcript_path.stem,
         utterances=utterances,
-        roles=roles,
+        roles=ROLES.roles_for(roles_path, transcript_path.stem),
     )
-# Updated 
-# Updated 
@@ -0,0 +1,264 @@
+from __future__ import annotations
+import csv
+import heapq
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import typer
+from rich import print
+
+from config import RAW_DIR
+from ami_loader import Meeting, Utterance
+from utils import atomic_open
+
+#Streaming loader for the real AMI corpus (NXT XML annotations)
+#
+# Layout of the AMI manual annotations release:
+#   words/ES2002a.A.words.xml          <w nite:id=".." starttime= endtime= [punc="true"]>word</w>
+#   segments/ES2002a.A.segments.xml    <segment starttime= endtime=><nite:child href="..#id(a)..id(b)"/></segment>
+#   corpusResources/meetings.xml       <meeting observation="ES2002a"><speaker nxt_agent="A" role="PM"/></meeting>
+#
+# Every file is read with iterparse and cleared as we go, and the per-speaker
+# utterance streams are merged by start time, so memory stays bounded by
+# one segment per speaker.
+
+NITE = "{http://nite.sourceforge.net/}"
+
+AMI_ROLES = {
+    "PM": "Project Manager",
+    "ID": "Industrial Designer",
+    "UI": "User Interface",
+    "ME": "Marketing Expert",
+}
+
+_HREF_RE = re.compile(r"#id\(([^)]+)\)(?:\.\.id\(([^)]+)\))?")
+_ID_NUM_RE = re.compile(r"(\d+)$")
+_SENTENCE_END = {".", "?", "!"}
+
+app = typer.Typer()
+
+
+def _id_num(nite_id: str) -> int:
+    m = _ID_NUM_RE.search(nite_id)
+    return int(m.group(1)) if m else -1
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _iterparse_children(path: Path) -> Iterator[ET.Element]:
+    """Yield each direct child of the root once parsed, then drop it."""
+    context = ET.iterparse(str(path), events=("start", "end"))
+    _, root = next(context)
+    depth = 0
+    for event, elem in context:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield elem
+            root.clear()
+
+
+def iter_words(words_path: Path) -> Iterator[Tuple[int, Optional[str], Optional[float], Optional[float], bool]]:
+    """
+    (id number, word or None, start, end, is_punct) for every element in a
+    words file. Non-word elements (vocalsound, disfmarker, pause, gap...)
+    keep their place in the id sequence but carry no text.
+    """
+    for elem in _iterparse_children(words_path):
+        num = _id_num(elem.get(NITE + "id", ""))
+        if elem.tag == "w" and elem.text and elem.text.strip():
+            yield (num, elem.text.strip(), _float(elem.get("starttime")),
+                   _float(elem.get("endtime")), elem.get("punc") == "true")
+        else:
+            yield num, None, None, None, False
+
+
+def iter_segments(segments_path: Path) -> Iterator[Tuple[int, int, Optional[float], Optional[float]]]:
+    """(first word id, last word id, start, end) for each segment."""
+    for elem in _iterparse_children(segments_path):
+        ids: List[int] = []
+        for child in elem:
+            if child.tag != NITE + "child":
+                continue
+            m = _HREF_RE.search(child.get("href", ""))
+            if m:
+                ids.append(_id_num(m.group(1)))
+                ids.append(_id_num(m.group(2) or m.group(1)))
+        if ids:
+            yield min(ids), max(ids), _float(elem.get("starttime")), _float(elem.get("endtime"))
+
+
+def _join(tokens: List[Tuple[str, bool]]) -> str:
+    out: List[str] = []
+    for tok, punct in tokens:
+        if punct and out:
+            out[-1] += tok
+        else:
+            out.append(tok)
+    return " ".join(out)
+
+
+def _segment_utterances(speaker: str, words_path: Path, segments_path: Path) -> Iterator[Utterance]:
+    words = iter_words(words_path)
+    pending = next(words, None)
+    for first, last, seg_start, seg_end in iter_segments(segments_path):
+        tokens: List[Tuple[str, bool]] = []
+        w_start = w_end = None
+        while pending is not None and pending[0] <= last:
+            num, tok, start, end, punct = pending
+            if num >= first and tok is not None:
+                tokens.append((tok, punct))
+                if w_start is None and start is not None:
+                    w_start = start
+                if end is not None:
+                    w_end = end
+            pending = next(words, None)
+        if tokens:
+            yield Utterance(
+                speaker=speaker,
+                text=_join(tokens),
+                start=seg_start if seg_start is not None else w_start,
+                end=seg_end if seg_end is not None else w_end,
+            )
+
+
+def _gap_utterances(speaker: str, words_path: Path, max_gap: float) -> Iterator[Utterance]:
+    """Without a segments file: split on sentence punctuation or long pauses."""
+    tokens: List[Tuple[str, bool]] = []
+    u_start = u_end = None
+    for _, tok, start, end, punct in iter_words(words_path):
+        if tok is None:
+            continue
+        if tokens and start is not None and u_end is not None and start - u_end > max_gap:
+            yield Utterance(speaker=speaker, text=_join(tokens), start=u_start, end=u_end)
+            tokens, u_start = [], None
+        tokens.append((tok, punct))
+        if u_start is None:
+            u_start = start
+        if end is not None:
+            u_end = end
+        if punct and tok in _SENTENCE_END:
+            yield Utterance(speaker=speaker, text=_join(tokens), start=u_start, end=u_end)
+            tokens, u_start = [], None
+    if tokens:
+        yield Utterance(speaker=speaker, text=_join(tokens), start=u_start, end=u_end)
+
+
+def list_meetings(nxt_dir: Path) -> List[str]:
+    """Meeting ids that have at least one words file."""
+    names = {p.name.split(".")[0] for p in (nxt_dir / "words").glob("*.words.xml")}
+    return sorted(names)
+
+
+def load_meeting_roles(nxt_dir: Path) -> Dict[str, Dict[str, str]]:
+    """meeting id -> {participant letter: role name} from corpusResources/meetings.xml."""
+    path = nxt_dir / "corpusResources" / "meetings.xml"
+    roles: Dict[str, Dict[str, str]] = {}
+    if not path.exists():
+        return roles
+    for elem in _iterparse_children(path):
+        if elem.tag != "meeting":
+            continue
+        name = elem.get("observation") or elem.get(NITE + "id", "")
+        spk_roles: Dict[str, str] = {}
+        for spk in elem.iter("speaker"):
+            agent = spk.get("nxt_agent")
+            if agent:
+                role = spk.get("role") or ""
+                spk_roles[agent] = AMI_ROLES.get(role, role)
+        roles[name] = spk_roles
+    return roles
+
+
+def iter_nxt_utterances(nxt_dir: Path, meeting: str, max_gap: float = 1.5) -> Iterator[Utterance]:
+    """Time-ordered utterances of one meeting, merged across speakers."""
+    streams = []
+    for words_path in sorted((nxt_dir / "words").glob(f"{meeting}.*.words.xml")):
+        agent = words_path.name.split(".")[1]
+        segments_path = nxt_dir / "segments" / f"{meeting}.{agent}.segments.xml"
+        if segments_path.exists():
+            streams.append(_segment_utterances(agent, words_path, segments_path))
+        else:
+            streams.append(_gap_utterances(agent, words_path, max_gap))
+    inf = float("inf")
+    yield from heapq.merge(*streams, key=lambda u: u.start if u.start is not None else inf)
+
+
+class _NxtStream:
+    __slots__ = ("nxt_dir", "meeting")
+
+    def __init__(self, nxt_dir: Path, meeting: str):
+        self.nxt_dir = nxt_dir
+        self.meeting = meeting
+
+    def __iter__(self) -> Iterator[Utterance]:
+        return iter_nxt_utterances(self.nxt_dir, self.meeting)
+
+
+def iter_nxt_meetings(nxt_dir: Path) -> Iterator[Meeting]:
+    """Every meeting under an AMI NXT folder as a streaming Meeting."""
+    nxt_dir = Path(nxt_dir)
+    roles = load_meeting_roles(nxt_dir)
+    for name in list_meetings(nxt_dir):
+        yield Meeting(name=name, utterances=_NxtStream(nxt_dir, name), roles=roles.get(name, {}))
+
+
+def write_transcript(meeting: Meeting, out_path: Path) -> int:
+    """Write a meeting as '[start-end] SPEAKER: text' lines; returns line count."""
+    n = 0
+    with atomic_open(out_path) as f:
+        for utt in meeting.utterances:
+            if utt.start is not None and utt.end is not None:
+                f.write(f"[{utt.start:.2f}-{utt.end:.2f}] ")
+            f.write(f"{utt.speaker}: {utt.text}\n")
+            n += 1
+    return n
+
+
+def write_roles(roles: Dict[str, Dict[str, str]], roles_path: Path):
+    """Merge per-meeting roles into roles.csv (meeting column), keeping existing rows."""
+    rows: Dict[Tuple[str, str], str] = {}
+    if roles_path.exists():
+        with roles_path.open(encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                spk = row.get("speaker") or row.get("id") or row.get("name")
+                if spk:
+                    rows[((row.get("meeting") or "").strip(), spk.strip())] = (row.get("role") or "").strip()
+    for meeting, spk_roles in roles.items():
+        for spk, role in spk_roles.items():
+            rows[(meeting, spk)] = role
+    with roles_path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["speaker", "role", "meeting"])
+        for (meeting, spk), role in sorted(rows.items()):
+            w.writerow([spk, role, meeting])
+
+
+@app.command()
+def main(
+    nxt_dir: str = typer.Option(..., "--nxt-dir", "--nxt_dir"),
+    out_dir: str = typer.Option(str(RAW_DIR), "--out-dir", "--out_dir"),
+):
+    """Convert AMI NXT annotations into transcripts + roles.csv for the pipeline."""
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    roles: Dict[str, Dict[str, str]] = {}
+    total = 0
+    for meeting in iter_nxt_meetings(Path(nxt_dir)):
+        total += write_transcript(meeting, out_path / f"{meeting.name}.txt")
+        roles[meeting.name] = meeting.roles
+    write_roles(roles, out_path / "roles.csv")
+    print(f"[green]Wrote {len(roles)} meetings ({total} utterances) -> {out_path}")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,10 +1,12 @@
 from __future__ import annotations
 import subprocess
-import json
 from pathlib import Path
 import sys
 
 from config import ROOT, RAW_DIR, DEFAULT_OUTPUT_JSON
+from action_io import count_actions, find_actions_file, iter_actions
+
+PAGE_SIZE = 20
 
 
 def print_header():
@@ -20,23 +22,28 @@ def pause():
 
 
 def show_actions():
-    out_path = Path(DEFAULT_OUTPUT_JSON)
-    if not out_path.exists():
-        print("No actions.json found. Run processing first.")
+    # actions.json, or the .jsonl/.parquet output next to it, whichever is newest
+    out_path = find_actions_file(Path(DEFAULT_OUTPUT_JSON))
+    if out_path is None:
+        print("No actions file found. Run processing first.")
         return
 
-    data = json.loads(out_path.read_text(encoding="utf-8"))
-    if not data:
+    total = count_actions(out_path)
+    if not total:
         print("No action items detected.")
         return
 
-    print(f"\nFound {len(data)} action item(s):\n")
-    for i, item in enumerate(data, start=1):
+    print(f"\nFound {total} action item(s) in {out_path.name}:\n")
+    for i, item in enumerate(iter_actions(out_path), start=1):
         print(f"{i}. [meeting: {item.get('meeting')} | speaker: {item.get('speaker')}]")
         print(f"   action: {item.get('action_item')}")
         if item.get("deadline_text"):
             print(f"   deadline: {item.get('deadline_text')}  (ISO: {item.get('deadline_iso')})")
         print()
+        if i % PAGE_SIZE == 0 and i < total:
+            more = input(f"-- {i}/{total} shown, ENTER for more, q to stop -- ").strip().lower()
+            if more == "q":
+                break
 
 
 
@@ -96,6 +103,12 @@ def process_video():
         print(f"Batch script not found: {bat}")
         return
 
+    # the pipeline queues the video to the resident transcription worker;
+    # launching it now lets the model load while the batch script starts up
+    import asr_worker
+
+    asr_worker.ensure_worker(wait=False)
+
     try:
         subprocess.run(
             [str(bat), video_path.name],
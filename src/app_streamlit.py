@@ -1,26 +1,44 @@
-import json
 from pathlib import Path
 import pandas as pd
 import streamlit as st
 from config import DEFAULT_OUTPUT_JSON
+from action_io import find_actions_file, iter_actions
 
 st.set_page_config(page_title="Meeting Action Items", layout="wide")
 st.title("Meeting Action Items")
 
 
+@st.cache_data
+def load_actions(path: str, mtime_ns: int) -> pd.DataFrame:
+    # mtime_ns is only part of the cache key, so a rewritten file is reloaded
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+        if "deadline_iso" in df:
+            df["deadline_iso"] = df["deadline_iso"].astype("string")
+        return df
+    return pd.DataFrame(list(iter_actions(Path(path))))
+
+
 json_path = st.text_input("Actions JSON path", value=str(DEFAULT_OUTPUT_JSON))
+found = find_actions_file(Path(json_path))
 
-if Path(json_path).exists():
-    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
-    df = pd.DataFrame(data)
+if found is not None:
+    df = load_actions(str(found), found.stat().st_mtime_ns)
+    if df.empty:
+        st.info(f"No action items in {found.name}.")
+        st.stop()
     with st.sidebar:
-        meeting = st.selectbox("Filter by meeting", ["(all)"] + sorted(df["meeting"].dropna().unique().tolist()))
+        meeting = st.selectbox("Filter by meeting", ["(all)"] + sorted(df["meeting"].dropna().astype(str).unique().tolist()))
         assignee = st.selectbox("Filter by assignee", ["(all)"] + sorted(df["assignee"].dropna().unique().tolist()))
-    view = df.copy()
+        page_size = st.selectbox("Rows per page", [100, 500, 1000], index=1)
+    view = df
     if meeting != "(all)":
-        view = view[view["meeting"] == meeting]
+        view = view[view["meeting"].astype(str) == meeting]
     if assignee != "(all)":
         view = view[view["assignee"] == assignee]
-    st.dataframe(view, use_container_width=True)
+    pages = max(1, -(-len(view) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+    st.caption(f"{len(view)} action items from {found.name}")
+    st.dataframe(view.iloc[(page - 1) * page_size: page * page_size], use_container_width=True)
 else:
     st.warning("JSON not found. Run extraction first.")
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from asr_worker import SAMPLE_RATE
+
+#Chunked, parallel transcription
+#
+# The decoded audio is cut near every CHUNK_SECONDS at the quietest point
+# within SEARCH_SECONDS of the target (mean frame energy over a short
+# window), so cuts fall in pauses rather than mid-word. Each chunk is
+# transcribed with OVERLAP_SECONDS of audio either side for context, in a
+# process pool whose processes load the model once. Segment times come
+# back relative to the window and are shifted by the window's start; a
+# chunk only keeps the segments whose midpoint lies inside it, so text in
+# the overlaps is kept once, by the chunk that owns it, and a repeat of
+# the previous segment's text right at the cut is dropped.
+#
+# The model is any picklable object with load(), decode(media) -> samples
+# and transcribe_array(samples) -> [{"start", "end", "text"}], e.g.
+# asr_worker.WhisperModel or a deterministic stand-in.
+
+CHUNK_SECONDS = 120.0
+OVERLAP_SECONDS = 2.0
+SEARCH_SECONDS = 10.0
+FRAME_SECONDS = 0.02
+QUIET_SECONDS = 0.3  # energy is averaged over this much audio when looking for a pause
+
+# one model per pool process, set up by _init_model
+_MODEL: dict = {}
+
+
+def _init_model(model):
+    _MODEL["model"] = model
+    try:
+        model.load()
+    except Exception as e:
+        # raised from every task instead of breaking the pool with no message
+        _MODEL["error"] = e
+
+
+def _ready() -> int:
+    if "error" in _MODEL:
+        raise _MODEL["error"]
+    return os.getpid()
+
+
+def _transcribe_window(audio: np.ndarray) -> List[dict]:
+    _ready()
+    return _MODEL["model"].transcribe_array(audio)
+
+
+def frame_energy(audio: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Mean square per FRAME_SECONDS frame, smoothed over QUIET_SECONDS."""
+    hop = max(1, int(sr * FRAME_SECONDS))
+    n = audio.size // hop
+    if not n:
+        return np.zeros(0)
+    energy = np.square(audio[:n * hop].astype(np.float64)).reshape(n, hop).mean(axis=1)
+    k = max(1, int(QUIET_SECONDS / FRAME_SECONDS))
+    return np.convolve(energy, np.ones(k) / k, mode="same")
+
+
+def plan_chunks(
+    audio: np.ndarray,
+    sr: int = SAMPLE_RATE,
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = OVERLAP_SECONDS,
+    search_seconds: float = SEARCH_SECONDS,
+) -> List[Tuple[int, int, int, int]]:
+    """(start, end, window start, window end) in samples for each chunk, in order."""
+    total = audio.size
+    size = max(1, int(chunk_seconds * sr))
+    # a cut never moves more than a quarter chunk, so chunks stay in order
+    search = min(int(search_seconds * sr), size // 4)
+    if total <= size + search:
+        return [(0, total, 0, total)]
+    energy = frame_energy(audio, sr)
+    hop = max(1, int(sr * FRAME_SECONDS))
+    cuts = [0]
+    while total - cuts[-1] > size + search:
+        target = cuts[-1] + size
+        lo, hi = (target - search) // hop, min(energy.size, (target + search) // hop + 1)
+        cuts.append((lo + int(np.argmin(energy[lo:hi]))) * hop)
+    cuts.append(total)
+    pad = int(overlap_seconds * sr)
+    return [(a, b, max(0, a - pad), min(total, b + pad)) for a, b in zip(cuts, cuts[1:])]
+
+
+def _same_text(a: str, b: str) -> bool:
+    return " ".join(a.lower().split()) == " ".join(b.lower().split())
+
+
+def stitch(plan: List[Tuple[int, int, int, int]], results: List[List[dict]], sr: int = SAMPLE_RATE) -> List[dict]:
+    """One segment list in absolute seconds from per-window results."""
+    out: List[dict] = []
+    last = len(plan) - 1
+    for i, ((start, end, w_start, _), segments) in enumerate(zip(plan, results)):
+        offset = w_start / sr
+        lo = start / sr if i else float("-inf")
+        hi = end / sr if i < last else float("inf")
+        for seg in segments:
+            s, e = offset + seg["start"], offset + seg["end"]
+            if not lo <= (s + e) / 2 < hi:
+                continue  # owned by the neighbouring chunk
+            if out and out[-1]["end"] > s and _same_text(out[-1]["text"], seg["text"]):
+                continue  # the same words heard from both sides of the cut
+            if out:
+                s = max(s, out[-1]["start"])
+            out.append({"start": round(s, 3), "end": round(max(e, s), 3), "text": seg["text"]})
+    return out
+
+
+class ChunkedTranscriber:
+    """Transcriber that spreads silence-aligned chunks of one file over `workers` processes."""
+
+    def __init__(
+        self,
+        model,
+        workers: int = 2,
+        chunk_seconds: float = CHUNK_SECONDS,
+        overlap_seconds: float = OVERLAP_SECONDS,
+    ):
+        self.model = model
+        self.workers = max(1, workers)
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.stats: dict = {}
+
+    def load(self):
+        """Start the pool; every process loads the model once, now rather than on the first job."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_model, initargs=(self.model,))
+            try:
+                for f in [self.pool.submit(_ready) for _ in range(self.workers)]:
+                    f.result()
+            except Exception:
+                self.close()
+                raise
+
+    def transcribe(self, media: Path) -> List[dict]:
+        self.load()
+        t0 = time.perf_counter()
+        audio = self.model.decode(media)
+        t1 = time.perf_counter()
+        plan = plan_chunks(audio, SAMPLE_RATE, self.chunk_seconds, self.overlap_seconds)
+        results = list(self.pool.map(_transcribe_window, [audio[w0:w1] for _, _, w0, w1 in plan]))
+        segments = stitch(plan, results)
+        self.stats = {"decode": t1 - t0, "transcribe": time.perf_counter() - t1,
+                      "audio_seconds": audio.size / SAMPLE_RATE, "chunks": len(plan)}
+        return segments
+
+    def settings(self) -> dict:
+        return {**self.model.settings(), "chunked": True, "chunk_seconds": self.chunk_seconds,
+                "overlap_seconds": self.overlap_seconds}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
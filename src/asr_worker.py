@@ -0,0 +1,581 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from config import INTERIM_DIR, LOGS_DIR
+from utils import atomic_open, atomic_write_json
+
+if TYPE_CHECKING:
+    from transcript_cache import TranscriptCache
+
+#Resident transcription worker (python src/asr_worker.py serve)
+#
+# Loading Whisper takes longer than transcribing a short video, so one
+# long-lived process keeps the model loaded and takes jobs from a spool
+# directory (works the same on Windows and POSIX):
+#   data/interim/asr_queue/pending/<id>.json   {"media": ..., "out": ...}
+#   data/interim/asr_queue/running/<id>.json   claimed by os.replace
+#   data/interim/asr_queue/done/<id>.json      {"status": "ok" | "error", ...}
+#   data/interim/asr_queue/worker.json         pid, model, heartbeat
+#   data/interim/asr_queue/worker.lock         pid of the one serving worker
+# The worker writes each transcript to a temp file and renames it over the
+# job's "out" path before posting the result. Clients call `transcribe`
+# (or submit + wait). It starts a detached worker when none is alive; the
+# worker exits after --idle-timeout seconds without jobs, and jobs a dead
+# worker left in running/ are re-queued by the next one. Only the worker
+# holding worker.lock (created with O_EXCL) serves, so two clients that
+# each start a worker still load the model once. The transcriber
+# is any object with transcribe(media) -> [{"start", "end", "text"}], so a
+# fake one can be served in-process (Worker(spool, fake).run_once()).
+
+SPOOL_DIR = INTERIM_DIR / "asr_queue"
+WORKER_LOG = LOGS_DIR / "asr_worker.log"
+DEFAULT_MODEL = "small"
+SAMPLE_RATE = 16_000  # what the models decode to
+IDLE_TIMEOUT = 900.0  # seconds without jobs before the worker exits
+POLL = 0.2
+HEARTBEAT = 2.0
+STALE = 15.0  # a heartbeat older than this means the worker is gone
+START_TIMEOUT = 30.0  # seconds for a spawned worker to report in
+
+
+# processes for chunked transcription (1 = the whole file in one call)
+ASR_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+
+
+class TranscriptionError(RuntimeError):
+    pass
+
+
+class WhisperModel:
+    """openai-whisper behind the small interface the transcribers use."""
+
+    def __init__(self, name: str = DEFAULT_MODEL, language: str = "en", threads: int = 0):
+        self.name = name
+        self.language = language
+        self.threads = threads  # torch threads in this process (0 = torch default)
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            try:
+                import whisper
+            except Exception:
+                raise TranscriptionError("Whisper not installed. Run: pip install openai-whisper ffmpeg-python")
+            if self.threads:
+                import torch
+
+                torch.set_num_threads(self.threads)
+            self.model = whisper.load_model(self.name)
+
+    def decode(self, media: Path):
+        """16 kHz mono float32 samples (ffmpeg)."""
+        try:
+            import whisper
+        except Exception:
+            raise TranscriptionError("Whisper not installed. Run: pip install openai-whisper ffmpeg-python")
+        return whisper.load_audio(str(media))
+
+    def transcribe_array(self, audio) -> List[dict]:
+        """Segments with start/end in seconds from the start of `audio`."""
+        self.load()
+        # fp16=False for CPU on Windows
+        result = self.model.transcribe(audio, language=self.language, fp16=False)
+        return [{"start": float(s["start"]), "end": float(s["end"]), "text": s["text"]} for s in result.get("segments", [])]
+
+    def settings(self) -> dict:
+        return {"asr": "whisper", "model": self.name, "language": self.language}
+
+
+class Transcriber:
+    """The whole file in one model call."""
+
+    def __init__(self, model):
+        self.model = model
+        self.stats: Dict[str, float] = {}
+
+    def load(self):
+        self.model.load()
+
+    def transcribe(self, media: Path) -> List[dict]:
+        self.model.load()
+        # decode up front (ffmpeg -> 16 kHz mono) so it is timed apart from the model
+        t0 = time.perf_counter()
+        audio = self.model.decode(media)
+        t1 = time.perf_counter()
+        segments = self.model.transcribe_array(audio)
+        self.stats = {"decode": t1 - t0, "transcribe": time.perf_counter() - t1, "audio_seconds": len(audio) / SAMPLE_RATE}
+        return segments
+
+    def settings(self) -> dict:
+        return {**self.model.settings(), "chunked": False}
+
+
+def make_transcriber(model: str = DEFAULT_MODEL, workers: int = ASR_WORKERS, chunk_seconds: Optional[float] = None,
+                     overlap_seconds: Optional[float] = None):
+    """Whole-file Whisper, or chunks over a pool of `workers` processes."""
+    if workers <= 1:
+        return Transcriber(WhisperModel(model))
+    import asr_chunked
+
+    # split the cores between the pool processes instead of every torch using all of them
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return asr_chunked.ChunkedTranscriber(
+        WhisperModel(model, threads=threads), workers,
+        chunk_seconds if chunk_seconds is not None else asr_chunked.CHUNK_SECONDS,
+        overlap_seconds if overlap_seconds is not None else asr_chunked.OVERLAP_SECONDS,
+    )
+
+
+def write_transcript(segments: List[dict], out: Path):
+    """`[start-end] UNK: text` lines (no diarization), swapped into place atomically."""
+    with atomic_open(out) as f:
+        for seg in segments:
+            text = seg.get("text", "").strip()
+            if not text:
+                continue
+            if seg.get("start") is not None and seg.get("end") is not None:
+                f.write(f"[{seg['start']:.2f}-{seg['end']:.2f}] ")
+            f.write(f"UNK: {text}\n")
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid or pid <= 0:
+        return False
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return bool(ok) and code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _describe(settings: dict) -> str:
+    return ", ".join(f"{k} {v}" for k, v in settings.items()) or "-"
+
+
+class Spool:
+    """The queue directories; shared by the worker and its clients."""
+
+    def __init__(self, root: Path = SPOOL_DIR):
+        self.root = Path(root)
+        self.pending = self.root / "pending"
+        self.running = self.root / "running"
+        self.done = self.root / "done"
+        self.heartbeat = self.root / "worker.json"
+        self.lock = self.root / "worker.lock"
+        self.stop_flag = self.root / "stop"
+
+    def ensure(self):
+        for d in (self.pending, self.running, self.done):
+            d.mkdir(parents=True, exist_ok=True)
+
+    def worker(self) -> Optional[dict]:
+        """The live worker's heartbeat record, or None."""
+        beat = _read_json(self.heartbeat)
+        if beat and time.time() - beat.get("beat", 0) < STALE:
+            return beat
+        return None
+
+    def lock_holder(self) -> Optional[int]:
+        """Pid of the live process holding the worker lock, or None."""
+        try:
+            pid = int(self.lock.read_text(encoding="utf-8").strip() or 0)
+        except (OSError, ValueError):
+            return None
+        return pid if _pid_alive(pid) else None
+
+    def acquire(self) -> bool:
+        """Take the worker lock for this process; False if a live worker holds it."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self.lock_holder()
+                if holder is not None:
+                    return holder == os.getpid()
+                # left behind by a worker that died: take it over
+                self.lock.unlink(missing_ok=True)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def release(self):
+        if self.lock_holder() == os.getpid():
+            self.lock.unlink(missing_ok=True)
+
+    def submit(self, media: Path, out: Path, sha1: Optional[str] = None, reuse: bool = True) -> str:
+        """Queue a job; reuse=False transcribes even if the worker has a cached transcript."""
+        self.ensure()
+        # ids sort in submission order, which is the order jobs are served
+        job_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        atomic_write_json(self.pending / f"{job_id}.json", {
+            "id": job_id, "media": str(Path(media).resolve()), "out": str(Path(out).resolve()),
+            "sha1": sha1, "reuse": reuse, "submitted": time.time(),
+        })
+        return job_id
+
+    def result(self, job_id: str) -> Optional[dict]:
+        return _read_json(self.done / f"{job_id}.json")
+
+    def state(self, job_id: str) -> str:
+        if (self.done / f"{job_id}.json").exists():
+            return "done"
+        if (self.running / f"{job_id}.json").exists():
+            return "running"
+        if (self.pending / f"{job_id}.json").exists():
+            return "pending"
+        return "unknown"
+
+
+class Worker:
+    """Serves jobs from a spool with one resident transcriber."""
+
+    def __init__(self, spool: Spool, transcriber, cache: Optional[TranscriptCache] = None):
+        self.spool = spool
+        self.transcriber = transcriber
+        self.cache = cache
+        self.settings = transcriber.settings() if hasattr(transcriber, "settings") else {}
+        self.started = time.time()
+        self.jobs = 0
+        self.current: Optional[str] = None
+        self._beating = threading.Event()
+
+    def _beat(self):
+        atomic_write_json(self.spool.heartbeat, {"pid": os.getpid(), "settings": self.settings, "started": self.started,
+                                                 "beat": time.time(), "jobs": self.jobs, "current": self.current})
+
+    def _heartbeat_loop(self):
+        # also beats while a long job runs
+        while not self._beating.wait(HEARTBEAT):
+            self._beat()
+
+    def recover(self) -> int:
+        """Re-queue jobs a previous worker claimed but never finished; returns how many."""
+        me = os.getpid()
+        beat = self.spool.worker()
+        other_alive = beat is not None and beat.get("pid") != me and _pid_alive(beat.get("pid"))
+        n = 0
+        for p in self.spool.running.glob("*.json"):
+            job = _read_json(p) or {}
+            owner = job.get("worker")
+            if owner == me:
+                continue
+            if _pid_alive(owner) or (owner is None and other_alive):
+                continue  # still being transcribed by a live worker
+            try:
+                os.replace(p, self.spool.pending / p.name)
+            except OSError:
+                continue  # finished meanwhile
+            n += 1
+        return n
+
+    def claim(self) -> Optional[dict]:
+        """Oldest pending job, moved to running/ (None if the queue is empty)."""
+        for p in sorted(self.spool.pending.glob("*.json")):
+            target = self.spool.running / p.name
+            try:
+                os.replace(p, target)
+            except OSError:
+                continue  # taken by someone else
+            job = _read_json(target)
+            if job is not None:
+                # recover() leaves a job alone while this pid is alive
+                job["worker"] = os.getpid()
+                atomic_write_json(target, job)
+                return job
+            target.unlink(missing_ok=True)
+        return None
+
+    def process(self, job: dict) -> dict:
+        self.current = job["id"]
+        start = time.perf_counter()
+        result = {"id": job["id"], "media": job["media"], "out": job["out"], "settings": self.settings,
+                  "queued_s": round(time.time() - job.get("submitted", time.time()), 3)}
+        try:
+            media = Path(job["media"])
+            if not media.exists():
+                raise TranscriptionError(f"media not found: {media}")
+            key = None
+            if self.cache is not None:
+                key = self.cache.key(job.get("sha1") or self.cache.media_digest(media), self.settings)
+            if key is not None and job.get("reuse", True) and self.cache.restore(key, Path(job["out"])):
+                result.update(status="ok", cached=True, segments=None, stats={})
+            else:
+                segments = self.transcriber.transcribe(media)
+                write_transcript(segments, Path(job["out"]))
+                result.update(status="ok", cached=False, segments=len(segments),
+                              stats=dict(getattr(self.transcriber, "stats", {})))
+                if key is not None:
+                    self.cache.store(key, Path(job["out"]), {"media": job["media"], "settings": self.settings,
+                                                             "segments": len(segments), "created": time.time()})
+        except Exception as e:
+            result.update(status="error", error=str(e) if isinstance(e, TranscriptionError) else f"{type(e).__name__}: {e}")
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        atomic_write_json(self.spool.done / f"{job['id']}.json", result)
+        (self.spool.running / f"{job['id']}.json").unlink(missing_ok=True)
+        self.jobs += 1
+        self.current = None
+        self._beat()
+        return result
+
+    def run_once(self) -> int:
+        """Process every pending job; returns how many."""
+        self.spool.ensure()
+        n = 0
+        while True:
+            job = self.claim()
+            if job is None:
+                return n
+            self.process(job)
+            n += 1
+
+    def serve(self, idle_timeout: float = IDLE_TIMEOUT, log: Callable[[str], None] = print):
+        self.spool.ensure()
+        if not self.spool.acquire():
+            log(f"[asr] worker {self.spool.lock_holder()} already serves {self.spool.root}, exiting")
+            return
+        self.spool.stop_flag.unlink(missing_ok=True)
+        requeued = self.recover()
+        if requeued:
+            log(f"[asr] re-queued {requeued} job(s) left by a stopped worker")
+        self._beat()
+        beats = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        beats.start()
+        log(f"[asr] worker {os.getpid()} serving {self.spool.root} ({_describe(self.settings)})")
+        try:
+            if hasattr(self.transcriber, "load"):
+                t0 = time.perf_counter()
+                try:
+                    self.transcriber.load()
+                    log(f"[asr] model loaded in {time.perf_counter() - t0:.1f}s")
+                except Exception as e:
+                    # keep serving: every job reports the error until the model loads
+                    log(f"[asr] model not loaded: {e}")
+            idle_since = time.monotonic()
+            while not self.spool.stop_flag.exists():
+                job = self.claim()
+                if job is None:
+                    if time.monotonic() - idle_since > idle_timeout:
+                        log(f"[asr] idle for {idle_timeout:.0f}s, exiting")
+                        break
+                    time.sleep(POLL)
+                    continue
+                r = self.process(job)
+                log(f"[asr] {r['id']} {r['status']} in {r['seconds']:.1f}s -> {r['out']}" + (f" ({r['error']})" if r["status"] != "ok" else ""))
+                idle_since = time.monotonic()
+        finally:
+            self._beating.set()
+            beat = _read_json(self.spool.heartbeat)
+            if beat and beat.get("pid") == os.getpid():
+                self.spool.heartbeat.unlink(missing_ok=True)
+            self.spool.release()
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+def start_worker(spool: Spool, model: str = DEFAULT_MODEL, idle_timeout: float = IDLE_TIMEOUT) -> subprocess.Popen:
+    """Launch a detached worker that outlives this process; output goes to logs/asr_worker.log."""
+    WORKER_LOG.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(Path(__file__).resolve()), "serve", "--spool", str(spool.root),
+           "--model", model, "--idle-timeout", str(idle_timeout)]
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    with WORKER_LOG.open("a", encoding="utf-8") as log:
+        return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+
+
+def ensure_worker(spool: Optional[Spool] = None, model: str = DEFAULT_MODEL, wait: bool = True) -> Optional[dict]:
+    """The live worker's record, starting one if needed (wait=False returns right after launching)."""
+    spool = spool or Spool()
+    beat = spool.worker()
+    if beat is not None:
+        return beat
+    spool.ensure()
+    # a worker holding the lock is still starting up (no heartbeat yet): wait for it
+    proc = start_worker(spool, model) if spool.lock_holder() is None else None
+    if not wait:
+        return None
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        beat = spool.worker()
+        if beat is not None:
+            return beat
+        if proc is not None and proc.poll() is not None:
+            if spool.lock_holder() is None:
+                break
+            proc = None  # lost the race to another client's worker, which is starting
+        elif proc is None and spool.lock_holder() is None:
+            proc = start_worker(spool, model)
+        time.sleep(POLL)
+    raise TranscriptionError(f"transcription worker did not start; see {WORKER_LOG}")
+
+
+def wait(spool: Spool, job_id: str, timeout: Optional[float] = None, model: str = DEFAULT_MODEL) -> dict:
+    """Block until the job has a result, restarting the worker if it dies meanwhile."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        result = spool.result(job_id)
+        if result is not None:
+            return result
+        if spool.state(job_id) == "unknown":
+            raise TranscriptionError(f"job {job_id} vanished from {spool.root}")
+        if spool.worker() is None:
+            ensure_worker(spool, model)
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"job {job_id} not finished after {timeout}s")
+        time.sleep(POLL)
+
+
+def transcribe(media: Path, out: Path, spool: Optional[Spool] = None, model: str = DEFAULT_MODEL,
+               timeout: Optional[float] = None, cache: bool = True) -> dict:
+    """
+    Transcribe `media` to `out` through the resident worker; returns the job
+    result. A cached transcript of the same media and settings is restored
+    without starting or contacting the worker.
+    """
+    spool = spool or Spool()
+    if not Path(media).exists():
+        raise TranscriptionError(f"media not found: {media}")
+    digest = None
+    if cache:
+        start = time.perf_counter()
+        # hashlib/shutil/filecmp are imported here, not at startup (video_pipeline's 50 ms budget)
+        from transcript_cache import TranscriptCache
+
+        store = TranscriptCache()
+        beat = spool.worker()
+        settings = beat["settings"] if beat is not None else make_transcriber(model).settings()
+        digest = store.media_digest(media)
+        key = store.key(digest, settings)
+        if store.restore(key, out):
+            return {"status": "ok", "cached": True, "key": key, "media": str(media), "out": str(out),
+                    "settings": settings, "segments": None, "stats": {}, "queued_s": 0.0,
+                    "seconds": round(time.perf_counter() - start, 3)}
+    ensure_worker(spool, model)
+    job_id = spool.submit(media, out, sha1=digest, reuse=cache)
+    result = wait(spool, job_id, timeout, model)
+    (spool.done / f"{job_id}.json").unlink(missing_ok=True)
+    if result["status"] != "ok":
+        raise TranscriptionError(result.get("error") or "transcription failed")
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    # typer/rich are imported here, not at startup (video_pipeline imports this module; 50 ms budget)
+    import typer
+    from rich import print
+
+    app = typer.Typer(help="Resident Whisper transcription worker and its job queue.")
+
+    @app.command()
+    def serve(
+        model: str = typer.Option(DEFAULT_MODEL, "--model"),
+        idle_timeout: float = typer.Option(IDLE_TIMEOUT, "--idle-timeout", "--idle_timeout", help="Exit after this many idle seconds"),
+        workers: int = typer.Option(ASR_WORKERS, "--workers", help="Processes for chunked transcription (1 = whole file)"),
+        chunk_seconds: Optional[float] = typer.Option(None, "--chunk-seconds", "--chunk_seconds", help="Chunk length before snapping to a pause (default 120)"),
+        overlap_seconds: Optional[float] = typer.Option(None, "--overlap-seconds", "--overlap_seconds", help="Audio shared with each neighbouring chunk (default 2)"),
+        cache: bool = typer.Option(True, "--cache/--no-cache", help="Reuse and store transcripts"),
+        spool_dir: str = typer.Option(str(SPOOL_DIR), "--spool"),
+    ):
+        """Run the worker in the foreground."""
+        spool = Spool(Path(spool_dir))
+        beat = spool.worker()
+        holder = beat["pid"] if beat is not None else spool.lock_holder()
+        if holder is not None:
+            print(f"[yellow]Worker {holder} is already serving {spool.root}[/yellow]")
+            return
+        transcriber = make_transcriber(model, workers, chunk_seconds, overlap_seconds)
+        try:
+            from transcript_cache import TranscriptCache
+
+            # plain lines: the detached worker's output is logs/asr_worker.log
+            Worker(spool, transcriber, TranscriptCache() if cache else None).serve(idle_timeout, log=typer.echo)
+        finally:
+            if hasattr(transcriber, "close"):
+                transcriber.close()
+
+    @app.command()
+    def submit(
+        media: str = typer.Argument(..., help="Video or audio file"),
+        out: str = typer.Argument(..., help="Transcript path (SPEAKER: text lines)"),
+        model: str = typer.Option(DEFAULT_MODEL, "--model"),
+        spool_dir: str = typer.Option(str(SPOOL_DIR), "--spool"),
+        cache: bool = typer.Option(True, "--cache/--no-cache", help="Reuse a cached transcript when there is one"),
+        wait_for_it: bool = typer.Option(True, "--wait/--no-wait", help="Wait for the transcript"),
+    ):
+        """Queue a video/audio file and wait for its transcript."""
+        spool = Spool(Path(spool_dir))
+        if not wait_for_it:
+            ensure_worker(spool, model)
+            print(f"[cyan]Queued {spool.submit(Path(media), Path(out), reuse=cache)}[/cyan]")
+            return
+        try:
+            result = transcribe(Path(media), Path(out), spool, model, cache=cache)
+        except TranscriptionError as e:
+            print(f"[red]{e}[/red]")
+            raise typer.Exit(code=1)
+        how = "from the transcript cache" if result.get("cached") else f"{result['segments']} segments"
+        print(f"[green]Wrote {result['out']} ({how}, {result['seconds']:.1f}s)[/green]")
+
+    @app.command()
+    def status(spool_dir: str = typer.Option(str(SPOOL_DIR), "--spool")):
+        """Worker and queue state."""
+        spool = Spool(Path(spool_dir))
+        beat = spool.worker()
+        counts = {d.name: len(list(d.glob("*.json"))) if d.exists() else 0 for d in (spool.pending, spool.running, spool.done)}
+        queued = ", ".join(f"{n} {name}" for name, n in counts.items())
+        if beat is None:
+            print(f"[yellow]No worker running[/yellow]; queue: {queued}")
+        else:
+            print(f"[green]Worker {beat['pid']}[/green] ({_describe(beat.get('settings', {}))}, {beat['jobs']} jobs, "
+                  f"current {beat.get('current') or '-'}); queue: {queued}")
+
+    @app.command()
+    def stop(spool_dir: str = typer.Option(str(SPOOL_DIR), "--spool")):
+        """Ask the worker to exit after the current job."""
+        spool = Spool(Path(spool_dir))
+        spool.ensure()
+        spool.stop_flag.touch()
+        print("[cyan]Stop requested[/cyan]")
+
+    app(args=argv)
+
+
+if __name__ == "__main__":
+    main()
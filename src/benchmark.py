@@ -0,0 +1,510 @@
+from __future__ import annotations
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import typer
+from rich import print
+
+from config import BENCHMARK_BASELINE
+
+#Micro-benchmarks for the hot paths of the pipeline
+#Run: python src/benchmark.py <command> --help
+
+app = typer.Typer()
+
+
+@app.callback()
+def main():
+    """Micro-benchmarks; each command prints before/after throughput."""
+
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# import-time budget (ms, cumulative per -X importtime) for each CLI entry point
+STARTUP_BUDGET_MS = {
+    "extract": 150,
+    "infer_ml": 150,
+    "train_ml": 150,
+    "evaluate": 150,
+    "video_pipeline": 50,
+    "app_cli": 50,
+}
+
+# deadline phrases as action_rules.DEADLINE_PATTERNS produces them
+DEADLINE_PHRASES = [
+    "tomorrow",
+    "today",
+    "tonight",
+    "by Friday",
+    "by next Tuesday",
+    "next Tuesday",
+    "within 2 days",
+    "within a week",
+    "in the next two weeks",
+    "by EOD",
+    "by end of the week",
+    "by Monday morning",
+    "next week",
+    "next meeting",
+]
+
+
+def _rate(fn: Callable[[str], object], phrases: List[str]) -> float:
+    start = time.perf_counter()
+    for p in phrases:
+        fn(p)
+    return len(phrases) / (time.perf_counter() - start)
+
+
+@app.command()
+def deadlines(n: int = typer.Option(200, "--n", help="Number of phrases to resolve per run.")):
+    """Phrases/sec of normalize_deadline: plain dateparser vs fast path + cache."""
+    import dateparser
+    import temporal
+
+    phrases = [DEADLINE_PHRASES[i % len(DEADLINE_PHRASES)] for i in range(n)]
+
+    def before(raw: str):
+        # previous behaviour: dateparser on every phrase, fresh datetime.now()
+        return dateparser.parse(raw, settings={"RELATIVE_BASE": datetime.now(), "PREFER_DATES_FROM": "future"})
+
+    ref = temporal.reference_date()
+    temporal._resolve.cache_clear()
+    rows = [
+        ("before (dateparser per phrase)", _rate(before, phrases)),
+        ("after, cold cache", _rate(lambda p: temporal.normalize_deadline(p, ref), phrases[: len(DEADLINE_PHRASES)])),
+        ("after, warm cache", _rate(lambda p: temporal.normalize_deadline(p, ref), phrases)),
+    ]
+    temporal._resolve.cache_clear()
+    rows.append(("after, builtin only (no cache)", _rate(lambda p: temporal._resolve_builtin(temporal.normalize_phrase(p), ref), phrases)))
+
+    for name, rate in rows:
+        print(f"{name:34} {rate:>14,.0f} phrases/sec")
+
+
+def _import_time_us(module: str) -> int:
+    """Cumulative import time of `module` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1]}")
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2] == f" {module}":
+            return int(parts[1])
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+@app.command()
+def startup(runs: int = typer.Option(5, "--runs", help="Fresh interpreters per entry point (median is reported).")):
+    """Cold-start import cost of each entry point against its budget."""
+    over = []
+    for module, budget in STARTUP_BUDGET_MS.items():
+        ms = statistics.median(_import_time_us(module) for _ in range(runs)) / 1000
+        ok = ms <= budget
+        if not ok:
+            over.append(module)
+        tag = "[green]ok[/green]" if ok else "[red]OVER[/red]"
+        print(f"{module:16} {ms:8.1f} ms  (budget {budget} ms)  {tag}")
+    if over:
+        print(f"[red]Over budget: {', '.join(over)}[/red]")
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def nxt(
+    nxt_dir: Optional[str] = typer.Option(None, "--nxt-dir", help="Real AMI NXT folder; default is a synthetic one."),
+    meetings: int = typer.Option(20, "--meetings"),
+    words_per_speaker: int = typer.Option(2500, "--words-per-speaker"),
+    corpus_words: int = typer.Option(1_000_000, "--corpus-words", help="Words in the full corpus, for the projection."),
+):
+    """Streaming NXT XML parse rate, peak memory and projected full-corpus time."""
+    import tempfile
+    import tracemalloc
+    from ami_nxt import iter_nxt_meetings
+    from synth import write_synthetic_nxt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(nxt_dir) if nxt_dir else Path(tmp)
+        if not nxt_dir:
+            write_synthetic_nxt(root, meetings, words_per_speaker)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        n_meetings = n_utts = n_words = 0
+        for meeting in iter_nxt_meetings(root):
+            n_meetings += 1
+            for utt in meeting.utterances:
+                n_utts += 1
+                n_words += utt.text.count(" ") + 1
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    rate = n_words / elapsed if elapsed else 0.0
+    print(f"{n_meetings} meetings, {n_utts:,} utterances, {n_words:,} words in {elapsed:.2f} s")
+    print(f"{rate:,.0f} words/sec, peak traced memory {peak / 2**20:.1f} MiB")
+    if rate:
+        print(f"projected full corpus ({corpus_words:,} words): {corpus_words / rate / 60:.1f} min")
+
+
+def _bench_model(model_path: Optional[str], texts: List[str]) -> str:
+    """model_path, or a small TF-IDF model fitted on texts and registered as "<benchmark>"."""
+    import pipeline
+
+    if model_path:
+        return model_path
+    from action_rules import extract_task_and_deadline
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    clf = Pipeline([("tfidf", TfidfVectorizer(ngram_range=(1, 2), min_df=1)),
+                    ("logreg", LogisticRegression(max_iter=1000, class_weight="balanced"))])
+    clf.fit(texts, [1 if extract_task_and_deadline(t) else 0 for t in texts])
+    pipeline._MODELS["<benchmark>"] = clf
+    return "<benchmark>"
+
+
+@app.command()
+def infer(
+    utterances: int = typer.Option(5000, "--utterances", help="Utterances in the synthetic meeting."),
+    model_path: Optional[str] = typer.Option(None, "--model-path", help="Trained clf.joblib; default trains a small one."),
+):
+    """Per-utterance predict_proba (old loop) vs the batched ML pipeline."""
+    import pipeline
+    from action_rules import extract_task_and_deadline
+    from ami_loader import Meeting, Utterance
+    from infer_ml import ml_pipeline
+    from synth import synthetic_texts
+
+    texts = synthetic_texts(utterances)
+    model_path = _bench_model(model_path, texts)
+    clf = pipeline.get_model(model_path)
+
+    def before():
+        # previous loop: one pipeline call per utterance, rules run twice
+        for t in texts:
+            is_action = clf.predict_proba([t])[0][1] >= pipeline.DEFAULT_THRESHOLD
+            if is_action:
+                extract_task_and_deadline(t)
+            extract_task_and_deadline(t)
+
+    meeting = Meeting(name="bench", utterances=[Utterance("PM", t) for t in texts], roles={})
+    run = ml_pipeline(model_path)
+    rows = []
+    for name, fn in [("before (per utterance)", before),
+                     ("after (batched meeting)", lambda: run(meeting))]:
+        start = time.perf_counter()
+        fn()
+        rows.append((name, len(texts) / (time.perf_counter() - start)))
+    for name, rate in rows:
+        print(f"{name:26} {rate:>12,.0f} utterances/sec")
+    print(f"speedup: {rows[1][1] / rows[0][1]:.1f}x")
+
+
+@app.command()
+def cascade(
+    corpus_dir: Optional[str] = typer.Option(None, "--corpus-dir", help="Labeled transcripts; default is a synthetic corpus."),
+    utterances: int = typer.Option(20_000, "--utterances", help="Synthetic corpus size."),
+    model_path: Optional[str] = typer.Option(None, "--model-path", help="Trained clf.joblib; default trains a small one."),
+    max_recall_loss: float = typer.Option(0.0, "--max-recall-loss", help="Allowed share of full-ML actions lost."),
+    repeat: int = typer.Option(3, "--repeat", help="Runs per setting; the best is kept."),
+):
+    """Cascade screen settings vs the full-ML path: work skipped, throughput, recall loss."""
+    import shutil
+    import tempfile
+    from collections import Counter
+
+    from ami_loader import Meeting
+    from corpus_cache import iter_meetings
+    from infer_ml import MIN_TASK_WORDS, ml_pipeline
+    from pipeline import PreScreen
+    from synth import generate_corpus
+
+    tmp = None
+    if corpus_dir is None:
+        tmp = Path(tempfile.mkdtemp(prefix="cascade-"))
+        generate_corpus(tmp, utterances=utterances)
+        corpus_dir = str(tmp)
+    try:
+        meetings = [Meeting(m.name, list(m.utterances), m.roles)
+                    for m in iter_meetings(Path(corpus_dir), use_cache=False)]
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    texts = [u.text for m in meetings for u in m.utterances]
+    model_path = _bench_model(model_path, texts)
+
+    def run(screen):
+        pipe = ml_pipeline(model_path, screen=screen)
+        # detector-level positives, by (meeting, utterance index)
+        hits = set()
+        for m in meetings:
+            offset = 0
+            for batch in pipe.batches(m):
+                hits.update((m.name, offset + i) for i, hit in enumerate(batch.is_action) if hit)
+                offset += len(batch.texts)
+        best, actions = float("inf"), []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            actions = [a for m in meetings for a in pipe(m)]
+            best = min(best, time.perf_counter() - start)
+        kept = sum(1 for t in texts if screen is None or (t.strip() and screen.keep(t.strip())))
+        return hits, actions, len(texts) / best, kept
+
+    full_hits, full_actions, full_rate, _ = run(None)
+    full_keys = Counter(tuple(sorted(a.items())) for a in full_actions)
+    print(f"{len(meetings)} meetings, {len(texts):,} utterances; full ML: {full_rate:,.0f} utt/s, "
+          f"{len(full_hits)} detected, {len(full_actions)} actions")
+    print(f"{'min_words':>9} {'lexicon':>7} {'skipped':>8} {'utt/s':>10} {'speedup':>7} {'det loss':>8} {'act loss':>8}")
+    rows = []
+    for lexicon in (False, True):
+        for min_words in (0, 2, 3, MIN_TASK_WORDS, 5, 6, 8):
+            screen = PreScreen(min_words, lexicon)
+            hits, actions, rate, kept = run(screen)
+            lost = full_keys - Counter(tuple(sorted(a.items())) for a in actions)
+            det_loss = len(full_hits - hits) / len(full_hits) if full_hits else 0.0
+            act_loss = sum(lost.values()) / len(full_actions) if full_actions else 0.0
+            skipped = 1 - kept / len(texts)
+            rows.append((min_words, lexicon, skipped, rate, det_loss, act_loss))
+            print(f"{min_words:9} {str(lexicon):>7} {skipped:8.1%} {rate:10,.0f} {rate / full_rate:6.2f}x "
+                  f"{det_loss:8.2%} {act_loss:8.2%}")
+    ok = [r for r in rows if r[5] <= max_recall_loss]
+    if ok:
+        best = max(ok, key=lambda r: r[3])
+        flags = f"--cascade --cascade-min-words {best[0]} --{'' if best[1] else 'no-'}cascade-lexicon"
+        print(f"[green]Fastest within {max_recall_loss:.1%} action recall loss: infer_ml.py {flags}[/green]")
+    else:
+        print(f"[yellow]No setting stays within {max_recall_loss:.1%} action recall loss.[/yellow]")
+
+
+# ---------------------------------------------------------------------------
+# Suite: throughput of every stage on a synthetic corpus, against a baseline
+# ---------------------------------------------------------------------------
+
+_SCORER_PROBE = """
+import json, sys, time
+try:
+    import resource  # Unix: peak RSS straight from the kernel
+except ImportError:
+    resource = None
+    try:
+        import psutil  # Windows: peak working set
+    except ImportError:
+        psutil = None
+        import tracemalloc  # last resort: Python-level allocations only
+        tracemalloc.start()
+
+
+def peak_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 2**20
+    return tracemalloc.get_traced_memory()[1] / 2**20
+
+
+from synth import synthetic_texts
+texts = synthetic_texts({n}, seed=1)
+base = peak_mb()
+start = time.perf_counter()
+if {compact}:
+    from compact_model import CompactModel
+    clf = CompactModel.load({path!r})
+else:
+    import joblib
+    clf = joblib.load({path!r})
+load_s = time.perf_counter() - start
+clf.predict_proba(texts[:10])
+start = time.perf_counter()
+clf.predict_proba(texts)
+score_s = time.perf_counter() - start
+rss = peak_mb()
+print(json.dumps({{"load_ms": load_s * 1000, "rate": len(texts) / score_s, "rss_mb": rss, "load_rss_mb": rss - base,
+                  "mem": "rss" if resource or psutil else "tracemalloc", "sklearn": "sklearn" in sys.modules}}))
+"""
+
+
+@app.command()
+def scorer(
+    model_path: str = typer.Option(..., "--model-path", help="clf.joblib with an exported clf.compact next to it."),
+    utterances: int = typer.Option(20_000, "--utterances", help="Synthetic texts to score."),
+    runs: int = typer.Option(3, "--runs", help="Fresh interpreters per loader (median is reported)."),
+):
+    """joblib + sklearn vs the compact NumPy artifact: load time, memory, throughput, parity."""
+    import json
+    import joblib
+    from compact_model import CompactModel, compact_path_for, max_deviation
+    from synth import synthetic_texts
+
+    compact = compact_path_for(model_path)
+    if not (compact / "meta.json").exists():
+        print(f"[red]No compact artifact at {compact}; run train_ml.py or export it first.[/red]")
+        raise typer.Exit(code=1)
+    rows = {}
+    for name, path, is_compact in [("joblib+sklearn", model_path, False), ("compact numpy", str(compact), True)]:
+        probes = []
+        for _ in range(runs):
+            proc = subprocess.run([sys.executable, "-c", _SCORER_PROBE.format(n=utterances, compact=is_compact, path=path)],
+                                  cwd=SRC_DIR, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{name} probe failed: {proc.stderr.strip().splitlines()[-1]}")
+            probes.append(json.loads(proc.stdout))
+        rows[name] = {k: statistics.median(p[k] for p in probes) for k in ("load_ms", "rate", "rss_mb", "load_rss_mb")}
+        rows[name]["sklearn"] = probes[0]["sklearn"]
+        rows[name]["mem"] = probes[0]["mem"]
+    print(f"{'loader':16} {'load ms':>9} {'+RSS MB':>9} {'RSS MB':>8} {'utt/s':>11}  sklearn")
+    for name, r in rows.items():
+        print(f"{name:16} {r['load_ms']:9.1f} {r['load_rss_mb']:9.1f} {r['rss_mb']:8.1f} {r['rate']:11,.0f}  {r['sklearn']}")
+    if any(r["mem"] != "rss" for r in rows.values()):
+        print("[yellow]Neither resource nor psutil is available: memory columns are tracemalloc peaks, not RSS.[/yellow]")
+    texts = synthetic_texts(utterances, seed=1)
+    dev = max_deviation(joblib.load(model_path), CompactModel.load(compact), texts)
+    print(f"max |P_sklearn - P_compact| over {len(texts)} texts: {dev:.2e}")
+
+
+def _best_rate(fn: Callable[[], object], items: int, repeat: int) -> float:
+    """Best items/sec over `repeat` runs (the least disturbed run)."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = max(best, items / (time.perf_counter() - start))
+    return best
+
+
+def run_suite(corpus: Path, repeat: int = 3) -> Dict[str, float]:
+    """items/sec (higher is better) for each benchmark case on `corpus`."""
+    import contextlib
+    import io
+    import tempfile
+
+    import temporal
+    from action_rules import extract_many, extract_task_and_deadline
+    from ami_loader import iter_utterances
+    from corpus_cache import CorpusCache, iter_meetings
+    from extract import rules_pipeline
+    from infer_ml import ml_pipeline
+    from synth import DEADLINES
+    from train_ml import train
+    from utils import iter_meeting_files
+
+    files = list(iter_meeting_files(corpus))
+    texts = [u.text for p in files for u in iter_utterances(p)]
+    phrases = [DEADLINES[i % len(DEADLINES)] for i in range(20_000)]
+    ref = temporal.reference_date("2026-01-05")
+    CorpusCache(corpus).sync()
+
+    def parse_files():
+        for p in files:
+            for _ in iter_utterances(p):
+                pass
+
+    def read_cache():
+        for meeting in iter_meetings(corpus):
+            for _ in meeting.utterances:
+                pass
+
+    def over_corpus(fn):
+        return lambda: [fn(m) for m in iter_meetings(corpus)]
+
+    results: Dict[str, float] = {}
+    results["action_rules.extract_task_and_deadline"] = _best_rate(
+        lambda: [extract_task_and_deadline(t) for t in texts], len(texts), repeat)
+    results["action_rules.extract_many"] = _best_rate(lambda: extract_many(texts), len(texts), repeat)
+    results["temporal.resolve_builtin"] = _best_rate(
+        lambda: [temporal._resolve_builtin(temporal.normalize_phrase(p), ref) for p in phrases], len(phrases), repeat)
+    for p in DEADLINES:
+        temporal.normalize_deadline(p, ref)
+    results["temporal.normalize_deadline_warm"] = _best_rate(
+        lambda: [temporal.normalize_deadline(p, ref) for p in phrases], len(phrases), repeat)
+    results["ami_loader.iter_utterances"] = _best_rate(parse_files, len(texts), repeat)
+    results["corpus_cache.read"] = _best_rate(read_cache, len(texts), repeat)
+    results["extract.rules_pipeline"] = _best_rate(over_corpus(rules_pipeline(ref)), len(texts), repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = str(Path(tmp) / "clf.joblib")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["train_ml.train"] = _best_rate(
+                lambda: train(corpus, model_path, corpus_cache=True, label_cache=False), len(texts), max(1, repeat // 2))
+        results["infer_ml.ml_pipeline"] = _best_rate(over_corpus(ml_pipeline(model_path)), len(texts), repeat)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Print results next to the baseline; return the cases that regressed."""
+    regressed = []
+    print(f"{'case':40} {'items/sec':>14} {'baseline':>14} {'change':>8}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:40} {value:>14,.0f} {'-':>14} {'new':>8}")
+            continue
+        change = value / base - 1
+        tag = ""
+        if change < -tolerance:
+            regressed.append(name)
+            tag = "  [red]REGRESSION[/red]"
+        print(f"{name:40} {value:>14,.0f} {base:>14,.0f} {change:>+8.1%}{tag}")
+    return regressed
+
+
+@app.command()
+def suite(
+    utterances: int = typer.Option(20_000, "--utterances", help="Synthetic corpus size."),
+    corpus_dir: Optional[str] = typer.Option(None, "--corpus-dir", help="Use an existing corpus instead of a synthetic one."),
+    repeat: int = typer.Option(3, "--repeat", help="Runs per case; the best is kept."),
+    baseline: str = typer.Option(str(BENCHMARK_BASELINE), "--baseline"),
+    save_baseline: bool = typer.Option(False, "--save-baseline", help="Store these numbers as the new baseline."),
+    tolerance: float = typer.Option(0.15, "--tolerance", help="Allowed slowdown before a case is flagged."),
+    seed: int = typer.Option(0, "--seed"),
+):
+    """action_rules, temporal, ami_loader, train_ml and infer_ml throughput vs. a stored baseline."""
+    import json
+    import platform
+    import shutil
+    import tempfile
+    from corpus_cache import cache_dir_for
+    from synth import generate_corpus
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(corpus_dir) if corpus_dir else Path(tmp) / "corpus"
+        if not corpus_dir:
+            generate_corpus(corpus, utterances=utterances, seed=seed)
+        try:
+            results = run_suite(corpus, repeat)
+        finally:
+            if not corpus_dir:
+                # the corpus cache of a throwaway corpus is not worth keeping
+                shutil.rmtree(cache_dir_for(corpus), ignore_errors=True)
+
+    base_path = Path(baseline)
+    meta = {"utterances": utterances, "seed": seed, "python": platform.python_version(),
+            "machine": platform.machine(), "corpus_dir": corpus_dir, "date": datetime.now().isoformat(timespec="seconds")}
+    stored = json.loads(base_path.read_text(encoding="utf-8")) if base_path.exists() else None
+    if stored and stored.get("meta", {}).get("utterances") != utterances:
+        print(f"[yellow]Baseline was recorded with {stored['meta'].get('utterances')} utterances; rates may not compare.")
+    regressed = compare(results, stored["results"] if stored else {}, tolerance)
+
+    if save_baseline:
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        base_path.write_text(json.dumps({"meta": meta, "results": results}, indent=2), encoding="utf-8")
+        print(f"[green]Saved baseline -> {base_path}")
+    elif regressed:
+        print(f"[red]{len(regressed)} case(s) slower than baseline by more than {tolerance:.0%}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
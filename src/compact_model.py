@@ -0,0 +1,265 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+#Compact, sklearn-free classifier artifact
+#
+# export_compact() turns a trained Pipeline (TF-IDF + LogisticRegression or
+# Hashing + SGD) into a directory next to the joblib file:
+#   clf.compact/meta.json   kind, tokenizer settings, intercept, fingerprint
+#   clf.compact/tokens.txt  sorted kept vocabulary, one n-gram per line (tfidf)
+#   clf.compact/keys.npy    sorted kept hash buckets (hashing)
+#   clf.compact/idf.npy     idf per kept token (tfidf)
+#   clf.compact/coef.npy    weight per kept token / bucket
+# CompactModel scores with NumPy only, reproducing the sklearn tokenizer,
+# l2-normalised tf-idf (or hashed counts) and the logistic link, so
+# infer_ml never has to import sklearn or unpickle the vocabulary dict.
+#
+# Pruning drops features with |weight| <= prune_tol. Hashed buckets keep
+# counting in the l2 norm (it comes from the token counts alone), so only
+# their weight is lost and zero-weight buckets are always dropped. TF-IDF
+# tokens need their idf for the norm, so they are only dropped when
+# prune_tol > 0; train_ml reports the resulting max probability error.
+
+FORMAT_VERSION = 1
+
+_TOKEN_RE_DEFAULT = r"(?u)\b\w\w+\b"
+
+
+def compact_path_for(model_path: Path) -> Path:
+    return Path(model_path).with_suffix(".compact")
+
+
+# ---------------------------------------------------------------------------
+# MurmurHash3 x86_32, as used by sklearn's HashingVectorizer
+# ---------------------------------------------------------------------------
+
+def murmurhash3_32(data: bytes, seed: int = 0) -> int:
+    """Signed 32-bit MurmurHash3 (x86_32) of `data`."""
+    c1, c2 = 0xCC9E2D51, 0x1B873593
+    h = seed & 0xFFFFFFFF
+    n = len(data)
+    end = n - n % 4
+    for i in range(0, end, 4):
+        k = int.from_bytes(data[i:i + 4], "little")
+        k = (k * c1) & 0xFFFFFFFF
+        k = ((k << 15) | (k >> 17)) & 0xFFFFFFFF
+        k = (k * c2) & 0xFFFFFFFF
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & 0xFFFFFFFF
+        h = (h * 5 + 0xE6546B64) & 0xFFFFFFFF
+    tail = data[end:]
+    if tail:
+        k = int.from_bytes(tail, "little")
+        k = (k * c1) & 0xFFFFFFFF
+        k = ((k << 15) | (k >> 17)) & 0xFFFFFFFF
+        k = (k * c2) & 0xFFFFFFFF
+        h ^= k
+    h ^= n
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+def _bucket(token: str, n_features: int) -> int:
+    h = murmurhash3_32(token.encode("utf-8"))
+    if h == -2147483648:
+        return (2147483647 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _fingerprint(meta: dict, arrays: Dict[str, np.ndarray], tokens: Optional[List[str]]) -> str:
+    h = hashlib.sha1(json.dumps(meta, sort_keys=True).encode("utf-8"))
+    for name in sorted(arrays):
+        h.update(name.encode("utf-8"))
+        h.update(np.ascontiguousarray(arrays[name]).tobytes())
+    if tokens is not None:
+        h.update("\n".join(tokens).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def export_compact(clf, out_dir: Path, prune_tol: float = 0.0, source: Optional[Path] = None) -> dict:
+    """
+    Write the compact artifact for a fitted sklearn Pipeline to out_dir
+    (replaced atomically). Returns the meta dict.
+    """
+    vec, model = clf.steps[0][1], clf.steps[-1][1]
+    if vec.analyzer != "word" or vec.preprocessor is not None or vec.tokenizer is not None \
+            or vec.stop_words is not None or vec.strip_accents is not None:
+        raise ValueError("only word n-gram vectorizers without custom hooks can be exported")
+    if not hasattr(model, "coef_") or np.asarray(model.coef_).shape[0] != 1:
+        raise ValueError(f"only binary linear models can be exported, not {type(model).__name__}")
+    coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+    meta = {
+        "format": FORMAT_VERSION,
+        "ngram_range": list(vec.ngram_range),
+        "lowercase": bool(vec.lowercase),
+        "token_pattern": vec.token_pattern or _TOKEN_RE_DEFAULT,
+        "norm": vec.norm,
+        "intercept": float(np.asarray(model.intercept_).ravel()[0]),
+        "prune_tol": prune_tol,
+    }
+    tokens: Optional[List[str]] = None
+    if hasattr(vec, "vocabulary_"):
+        if vec.sublinear_tf or not vec.use_idf:
+            raise ValueError("only TfidfVectorizer(use_idf=True, sublinear_tf=False) can be exported")
+        names = vec.get_feature_names_out()
+        # every token feeds the norm, so only a positive tolerance prunes
+        keep = np.flatnonzero(np.abs(coef) > prune_tol) if prune_tol > 0 else np.arange(coef.size)
+        order = keep[np.argsort(names[keep], kind="stable")]
+        tokens = [str(t) for t in names[order]]
+        arrays = {"idf": vec.idf_[order].astype(np.float64), "coef": coef[order]}
+        meta.update(kind="tfidf", n_vocab=len(names))
+    else:
+        if vec.alternate_sign or vec.binary:
+            raise ValueError("only HashingVectorizer(alternate_sign=False, binary=False) can be exported")
+        keys = np.flatnonzero(np.abs(coef) > prune_tol).astype(np.int64)  # already sorted
+        arrays = {"keys": keys, "coef": coef[keys]}
+        meta.update(kind="hashing", n_features=int(vec.n_features))
+    meta["kept"] = int(arrays["coef"].size)
+    meta["pruned"] = int(coef.size - arrays["coef"].size)
+    if source is not None:
+        st = Path(source).stat()
+        meta["source"] = {"name": Path(source).name, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    meta["fingerprint"] = _fingerprint(meta, arrays, tokens)
+
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", arr)
+    if tokens is not None:
+        (tmp / "tokens.txt").write_text("\n".join(tokens), encoding="utf-8")
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    # swap the whole directory so a reader never sees a half-written artifact
+    old = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+class CompactModel:
+    """NumPy re-implementation of the exported pipeline's predict_proba."""
+
+    def __init__(self, meta: dict, coef: np.ndarray, idf: Optional[np.ndarray] = None,
+                 vocab: Optional[Dict[str, int]] = None, keys: Optional[np.ndarray] = None):
+        self.meta = meta
+        self.kind = meta["kind"]
+        self.coef = coef
+        self.idf = idf
+        self.vocab = vocab
+        self.keys = keys
+        self.intercept = meta["intercept"]
+        self.fingerprint = meta["fingerprint"]
+        self._token_re = re.compile(meta["token_pattern"])
+        self._ngrams = tuple(meta["ngram_range"])
+        self._buckets: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "CompactModel":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported compact model format {meta.get('format')!r}")
+        coef = np.load(path / "coef.npy")
+        if meta["kind"] == "tfidf":
+            text = (path / "tokens.txt").read_text(encoding="utf-8")
+            tokens = text.split("\n") if text else []
+            return cls(meta, coef, idf=np.load(path / "idf.npy"), vocab={t: i for i, t in enumerate(tokens)})
+        return cls(meta, coef, keys=np.load(path / "keys.npy"))
+
+    def _analyze(self, text: str) -> List[str]:
+        if self.meta["lowercase"]:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        min_n, max_n = self._ngrams
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _columns(self, grams: List[str]) -> List[int]:
+        if self.kind == "tfidf":
+            vocab = self.vocab
+            return [vocab[g] for g in grams if g in vocab]
+        buckets, n_features = self._buckets, self.meta["n_features"]
+        cols = []
+        for g in grams:
+            b = buckets.get(g)
+            if b is None:
+                if len(buckets) > 200_000:  # bound the memo on long runs
+                    buckets.clear()
+                b = buckets[g] = _bucket(g, n_features)
+            cols.append(b)
+        return cols
+
+    def decision_function(self, texts: Iterable[str]) -> np.ndarray:
+        rows: List[int] = []
+        cols: List[int] = []
+        n = 0
+        for n, text in enumerate(texts, 1):
+            c = self._columns(self._analyze(text))
+            rows.extend([n - 1] * len(c))
+            cols.extend(c)
+        if not rows:
+            return np.full(n, self.intercept)
+        # term counts per (text, feature), collisions included
+        width = int(self.coef.size if self.kind == "tfidf" else self.meta["n_features"])
+        pairs, tf = np.unique(np.asarray(rows, dtype=np.int64) * width + np.asarray(cols, dtype=np.int64),
+                              return_counts=True)
+        r, c = np.divmod(pairs, width)
+        vals = tf.astype(np.float64)
+        if self.kind == "tfidf":
+            w = self.coef[c]
+            vals = vals * self.idf[c]
+        else:
+            # buckets that were pruned (zero weight) still count in the norm
+            keys = np.append(self.keys, -1)
+            coef = np.append(self.coef, 0.0)
+            pos = np.searchsorted(self.keys, c)
+            w = np.where(keys[pos] == c, coef[pos], 0.0)
+        dot = np.bincount(r, vals * w, minlength=n)
+        if self.meta["norm"] == "l2":
+            norm = np.sqrt(np.bincount(r, vals * vals, minlength=n))
+            dot = np.divide(dot, norm, out=np.zeros_like(dot), where=norm > 0)
+        elif self.meta["norm"] == "l1":
+            norm = np.bincount(r, np.abs(vals), minlength=n)
+            dot = np.divide(dot, norm, out=np.zeros_like(dot), where=norm > 0)
+        return dot + self.intercept
+
+    def predict_proba(self, texts: Iterable[str]) -> np.ndarray:
+        """(n, 2) array like sklearn's, column 1 = P(action)."""
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+        return np.column_stack([1.0 - p, p])
+
+
+def max_deviation(clf, compact: CompactModel, texts: List[str]) -> float:
+    """Largest |P_sklearn - P_compact| over texts."""
+    if not texts:
+        return 0.0
+    a = clf.predict_proba(texts)[:, 1]
+    b = compact.predict_proba(texts)[:, 1]
+    return float(np.max(np.abs(a - b)))
+
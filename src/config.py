@@ -8,10 +8,16 @@ ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT / "data"
 RAW_DIR = DATA_DIR / "raw" / "AMI"
 PROCESSED_DIR = DATA_DIR / "processed"
-# to make sure directories exist
+INTERIM_DIR = DATA_DIR / "interim"
 DEFAULT_OUTPUT_JSON = PROCESSED_DIR / "actions.json"
 DEFAULT_MODEL_PATH = PROCESSED_DIR / "clf.joblib"
+LOGS_DIR = ROOT / "logs"
+PROFILE_DIR = LOGS_DIR / "profiles"
+BENCHMARK_BASELINE = ROOT / "benchmarks" / "baseline.json"
 
 
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-RAW_DIR.mkdir(parents=True, exist_ok=True)
+def ensure_dirs():
+    """Create the data directories. Call from entry points, not at import."""
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    INTERIM_DIR.mkdir(parents=True, exist_ok=True)
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
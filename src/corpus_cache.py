@@ -0,0 +1,288 @@
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import INTERIM_DIR
+from ami_loader import Meeting, Utterance, ROLES, iter_utterances, stream_meeting
+from utils import atomic_open, atomic_write_json, file_sha1, iter_meeting_files
+
+#Columnar, memory-mapped cache of parsed transcripts
+#
+# One shard per transcript, laid out as
+#   header | offsets int64[n+1] | speaker ids int32[n] (padded) | [start, end] float64[2n] | UTF-8 blob
+# Shards are opened with mmap and read through memoryview casts, so rows a
+# stage skips are never decoded into Python objects. A manifest records the
+# source size/mtime/sha1 per transcript; `sync` re-encodes only the
+# transcripts whose content changed.
+
+CACHE_VERSION = 2
+_MAGIC = b"MICORP01"
+_HEADER = struct.Struct("<8sQI4x")  # magic, rows, flags
+_HAS_TIMES = 1
+
+
+def cache_dir_for(input_dir: Path) -> Path:
+    """Cache location for one transcripts folder."""
+    key = hashlib.sha1(str(input_dir.resolve()).encode("utf-8")).hexdigest()[:12]
+    return INTERIM_DIR / "corpus" / key
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def write_shard(path: Path, utterances: Iterator[Utterance]) -> Dict[str, object]:
+    """Encode utterances into a shard file; returns its manifest entry fields."""
+    offsets = array("q", [0])
+    speaker_ids = array("i")
+    times = array("d")
+    speakers: Dict[str, int] = {}
+    blob = bytearray()
+    has_times = False
+
+    for utt in utterances:
+        blob += utt.text.encode("utf-8")
+        offsets.append(len(blob))
+        speaker_ids.append(speakers.setdefault(utt.speaker, len(speakers)))
+        start = utt.start if utt.start is not None else float("nan")
+        end = utt.end if utt.end is not None else float("nan")
+        has_times = has_times or utt.start is not None or utt.end is not None
+        times.extend((start, end))
+
+    rows = len(speaker_ids)
+    with atomic_open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, rows, _HAS_TIMES if has_times else 0))
+        f.write(offsets.tobytes())
+        spk = speaker_ids.tobytes()
+        f.write(spk + b"\0" * (_pad8(len(spk)) - len(spk)))
+        if has_times:
+            f.write(times.tobytes())
+        f.write(blob)
+    return {"rows": rows, "speakers": list(speakers)}
+
+
+class Shard:
+    """Read-only, zero-copy view of one cached transcript."""
+
+    def __init__(self, path: Path, name: str, speakers: List[str]):
+        self.name = name
+        self.speakers = speakers
+        self._file = path.open("rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        buf = memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+        magic, rows, flags = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a corpus shard: {path}")
+        self.rows = rows
+        pos = _HEADER.size
+        self.offsets = buf[pos:pos + 8 * (rows + 1)].cast("q")
+        pos += 8 * (rows + 1)
+        self.speaker_ids = buf[pos:pos + 4 * rows].cast("i")
+        pos += _pad8(4 * rows)
+        if flags & _HAS_TIMES:
+            self.times = buf[pos:pos + 16 * rows].cast("d")
+            pos += 16 * rows
+        else:
+            self.times = None
+        self._blob = buf[pos:]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def text(self, i: int) -> str:
+        return str(self._blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def speaker(self, i: int) -> str:
+        return self.speakers[self.speaker_ids[i]]
+
+    def utterance(self, i: int) -> Utterance:
+        start = end = None
+        if self.times is not None:
+            start, end = self.times[2 * i], self.times[2 * i + 1]
+            start = None if start != start else start  # NaN -> None
+            end = None if end != end else end
+        return Utterance(speaker=self.speaker(i), text=self.text(i), start=start, end=end)
+
+    def __iter__(self) -> Iterator[Utterance]:
+        for i in range(self.rows):
+            yield self.utterance(i)
+
+    def iter_texts(self) -> Iterator[str]:
+        blob, off = self._blob, self.offsets
+        for i in range(self.rows):
+            yield str(blob[off[i]:off[i + 1]], "utf-8")
+
+    def close(self):
+        # views must be released before the mapping can be closed
+        for view in (self.offsets, self.speaker_ids, self.times, self._blob):
+            if view is not None:
+                view.release()
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "Shard":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass
+class SyncStats:
+    encoded: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+class CorpusCache:
+    """
+    Cache of every transcript in one input folder.
+
+    cache = CorpusCache(input_dir); cache.sync()
+    for meeting in cache.iter_meetings(): ...
+    """
+
+    def __init__(self, input_dir: Path, cache_dir: Optional[Path] = None):
+        self.input_dir = Path(input_dir)
+        self.cache_dir = Path(cache_dir) if cache_dir else cache_dir_for(self.input_dir)
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.meetings: Dict[str, dict] = {}
+        if self.manifest_path.exists():
+            try:
+                data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+                if data.get("version") == CACHE_VERSION:
+                    self.meetings = data.get("meetings", {})
+            except (OSError, ValueError):
+                self.meetings = {}
+
+    def _shard_path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}.shard"
+
+    def sync(self) -> SyncStats:
+        """Bring the cache up to date, re-encoding only changed transcripts."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        stats = SyncStats()
+        seen = set()
+        dirty = False
+
+        for p in iter_meeting_files(self.input_dir):
+            name = p.stem
+            seen.add(name)
+            st = p.stat()
+            entry = self.meetings.get(name)
+            shard = self._shard_path(name)
+            if entry and shard.exists():
+                if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                    stats.reused.append(name)
+                    continue
+                digest = file_sha1(p)
+                if entry["sha1"] == digest:
+                    # touched but not changed: just refresh the stamp
+                    entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+                    dirty = True
+                    stats.reused.append(name)
+                    continue
+            else:
+                digest = file_sha1(p)
+
+            info = write_shard(shard, iter_utterances(p))
+            self.meetings[name] = {
+                "source": p.name,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha1": digest,
+                **info,
+            }
+            stats.encoded.append(name)
+            dirty = True
+
+        for name in sorted(set(self.meetings) - seen):
+            self._shard_path(name).unlink(missing_ok=True)
+            del self.meetings[name]
+            stats.removed.append(name)
+            dirty = True
+
+        if not dirty:
+            return stats
+        atomic_write_json(self.manifest_path, {"version": CACHE_VERSION, "meetings": self.meetings}, indent=2)
+        return stats
+
+    def open(self, name: str) -> Shard:
+        entry = self.meetings[name]
+        return Shard(self._shard_path(name), name, entry["speakers"])
+
+    def iter_meetings(self, roles_path: Optional[Path] = None) -> Iterator[Meeting]:
+        """
+        Meetings in file order, utterances decoded from the shards.
+        Each meeting's utterances are only valid until the next one is requested.
+        """
+        roles_path = roles_path or self.input_dir / "roles.csv"
+        for name in sorted(self.meetings, key=lambda n: self.meetings[n]["source"]):
+            with self.open(name) as shard:
+                yield Meeting(
+                    name=name,
+                    utterances=shard,
+                    roles=ROLES.roles_for(roles_path, name),
+                )
+
+
+def meeting_names(input_dir: Path, use_cache: bool = True) -> List[str]:
+    """Meeting names in the order iter_meetings yields them (syncs the cache)."""
+    input_dir = Path(input_dir)
+    if not use_cache:
+        return [p.stem for p in iter_meeting_files(input_dir)]
+    cache = CorpusCache(input_dir)
+    cache.sync()
+    return sorted(cache.meetings, key=lambda n: cache.meetings[n]["source"])
+
+
+def meeting_digests(input_dir: Path, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Content SHA-1 per meeting, in iter_meetings order. With the cache this
+    only stats unchanged transcripts instead of re-reading them.
+    """
+    input_dir = Path(input_dir)
+    if not use_cache:
+        return {p.stem: file_sha1(p) for p in iter_meeting_files(input_dir)}
+    cache = CorpusCache(input_dir)
+    cache.sync()
+    names = sorted(cache.meetings, key=lambda n: cache.meetings[n]["source"])
+    return {name: cache.meetings[name]["sha1"] for name in names}
+
+
+@contextmanager
+def open_meeting(input_dir: Path, name: str, cache: Optional[CorpusCache] = None) -> Iterator[Meeting]:
+    """One meeting by name, from `cache` if given, else from its transcript."""
+    input_dir = Path(input_dir)
+    roles_path = input_dir / "roles.csv"
+    if cache is None:
+        yield stream_meeting(input_dir / f"{name}.txt", roles_path)
+        return
+    with cache.open(name) as shard:
+        yield Meeting(name=name, utterances=shard, roles=ROLES.roles_for(roles_path, name))
+
+
+def iter_meetings(input_dir: Path, use_cache: bool = True) -> Iterator[Meeting]:
+    """
+    Every meeting in input_dir, via the corpus cache when enabled,
+    otherwise parsed straight from the transcripts.
+    """
+    input_dir = Path(input_dir)
+    if not use_cache:
+        for p in iter_meeting_files(input_dir):
+            yield stream_meeting(p, input_dir / "roles.csv")
+        return
+    cache = CorpusCache(input_dir)
+    cache.sync()
+    yield from cache.iter_meetings()
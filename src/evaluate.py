@@ -1,30 +1,247 @@
 from __future__ import annotations
 import json
+import math
+import re
+from collections import defaultdict
 from pathlib import Path
-import pandas as pd
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import typer
+from rich import print
+
 from config import PROCESSED_DIR
+from action_io import find_actions_file, iter_actions
+
+#Fuzzy, blocked evaluation of predicted actions against gold
+#
+# Predictions only compete for gold items in the same block (meeting +
+# assignee by default, or meeting only), so the cost grows with the block
+# sizes rather than with pred x gold. Inside a block, an inverted index
+# over each gold item's rarest features (a prefix filter) yields the only
+# pairs that can reach the threshold. Each pair gets a Jaccard similarity
+# over content tokens (--sim token) or character 3-grams (--sim char). A
+# one-to-one assignment (Hungarian, greedy for very large blocks) then keeps
+# the matches at or above --threshold. Matched pairs also score the
+# deadline: deadline_iso when both sides have one, else the normalized
+# deadline_text.
+
+app = typer.Typer()
 
 PRED = PROCESSED_DIR / "actions.json"
 GOLD = PROCESSED_DIR / "gold.json"
 
+SIMILARITIES = ("token", "char")
+BLOCKINGS = ("meeting+assignee", "meeting")
+
+# dense assignment up to this many candidate cells per block, greedy above
+HUNGARIAN_MAX_CELLS = 4_000_000
+
+STOPWORDS = frozenset("""
+a an the to of and or for on in at by with from up
+i we you he she they it this that these those me us our your my
+can could would will shall should please let let's lets need needs must
+be is are was were do does did have has just so okay ok um uh yeah well
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
 def normalize(s: str) -> str:
     return " ".join(s.lower().split())
-#  creating action.json file
-def main():
-    if not PRED.exists() or not GOLD.exists():
+
+
+def features(text: Optional[str], sim: str = "token") -> FrozenSet[str]:
+    """Content tokens, or character 3-grams of the normalized text."""
+    text = normalize(text or "")
+    if sim == "char":
+        padded = f" {text} "
+        return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+    words = _WORD_RE.findall(text)
+    content = frozenset(w for w in words if w not in STOPWORDS)
+    return content or frozenset(words)
+
+
+def block_key(action: dict, blocking: str) -> Tuple[str, str]:
+    meeting = action.get("meeting") or ""
+    if blocking == "meeting":
+        return meeting, ""
+    return meeting, normalize(action.get("assignee") or "")
+
+
+def deadline_ok(pred: dict, gold: dict) -> bool:
+    if pred.get("deadline_iso") and gold.get("deadline_iso"):
+        return pred["deadline_iso"] == gold["deadline_iso"]
+    return normalize(pred.get("deadline_text") or "") == normalize(gold.get("deadline_text") or "")
+
+
+def match_block(
+    preds: List[FrozenSet[str]],
+    golds: List[FrozenSet[str]],
+    threshold: float,
+) -> List[Tuple[int, int, float]]:
+    """One-to-one (pred, gold, similarity) matches with similarity >= threshold."""
+    # prefix filter: with features ordered rarest first, two sets with
+    # Jaccard >= t must share a feature within the first |x| - ceil(t|x|) + 1
+    # of each, so only those prefixes are indexed and probed
+    freq: Dict[str, int] = defaultdict(int)
+    for group in (golds, preds):
+        for x in group:
+            for f in x:
+                freq[f] += 1
+
+    def prefix(x: FrozenSet[str]) -> List[str]:
+        keep = len(x) - math.ceil(threshold * len(x) - 1e-9) + 1
+        return sorted(x, key=lambda f: (freq[f], f))[:keep]
+
+    index: Dict[str, List[int]] = defaultdict(list)
+    for j, g in enumerate(golds):
+        for f in prefix(g):
+            index[f].append(j)
+
+    pairs: List[Tuple[int, int, float]] = []
+    for i, p in enumerate(preds):
+        if not p:
+            continue
+        lo, hi = threshold * len(p) - 1e-9, len(p) / threshold + 1e-9 if threshold else float("inf")
+        cands = {j for f in prefix(p) for j in index.get(f, ())}
+        for j in cands:
+            if not lo <= len(golds[j]) <= hi:  # Jaccard <= min/max size
+                continue
+            inter = len(p & golds[j])
+            s = inter / (len(p) + len(golds[j]) - inter)
+            if s >= threshold and inter:
+                pairs.append((i, j, s))
+    if not pairs:
+        return []
+
+    rows = sorted({i for i, _, _ in pairs})
+    cols = sorted({j for _, j, _ in pairs})
+    if len(rows) == 1 or len(cols) == 1 or len(rows) * len(cols) > HUNGARIAN_MAX_CELLS:
+        # greedy: best similarity first
+        used_p, used_g, out = set(), set(), []
+        for i, j, s in sorted(pairs, key=lambda t: -t[2]):
+            if i not in used_p and j not in used_g:
+                used_p.add(i)
+                used_g.add(j)
+                out.append((i, j, s))
+        return out
+
+    import numpy as np
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError as e:
+        raise RuntimeError("One-to-one matching needs scipy: pip install scipy") from e
+
+    r_at = {i: k for k, i in enumerate(rows)}
+    c_at = {j: k for k, j in enumerate(cols)}
+    sim = np.zeros((len(rows), len(cols)))
+    for i, j, s in pairs:
+        sim[r_at[i], c_at[j]] = s
+    r, c = linear_sum_assignment(sim, maximize=True)
+    return [(rows[a], cols[b], float(sim[a, b])) for a, b in zip(r, c) if sim[a, b] >= threshold]
+
+
+class Score:
+    __slots__ = ("tp", "fp", "fn", "deadline_hits")
+
+    def __init__(self):
+        self.tp = self.fp = self.fn = self.deadline_hits = 0
+
+    def add(self, other: "Score"):
+        self.tp += other.tp
+        self.fp += other.fp
+        self.fn += other.fn
+        self.deadline_hits += other.deadline_hits
+
+    def report(self) -> dict:
+        prec = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        rec = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        f1 = 2 * prec * rec / (prec + rec) if prec + rec else 0.0
+        return {
+            "tp": self.tp, "fp": self.fp, "fn": self.fn,
+            "precision": round(prec, 4), "recall": round(rec, 4), "f1": round(f1, 4),
+            "deadline_acc": round(self.deadline_hits / self.tp, 4) if self.tp else None,
+        }
+
+
+def evaluate(
+    pred: List[dict],
+    gold: List[dict],
+    sim: str = "token",
+    threshold: float = 0.5,
+    blocking: str = "meeting+assignee",
+) -> dict:
+    """Overall and per-meeting precision / recall / F1 and deadline accuracy."""
+    blocks: Dict[Tuple[str, str], Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+    for i, a in enumerate(pred):
+        blocks[block_key(a, blocking)][0].append(i)
+    for j, a in enumerate(gold):
+        blocks[block_key(a, blocking)][1].append(j)
+
+    per_meeting: Dict[str, Score] = defaultdict(Score)
+    for (meeting, _), (p_ids, g_ids) in blocks.items():
+        score = per_meeting[meeting]
+        matches = []
+        if p_ids and g_ids:
+            matches = match_block([features(pred[i].get("action_item"), sim) for i in p_ids],
+                                  [features(gold[j].get("action_item"), sim) for j in g_ids], threshold)
+        score.tp += len(matches)
+        score.fp += len(p_ids) - len(matches)
+        score.fn += len(g_ids) - len(matches)
+        score.deadline_hits += sum(deadline_ok(pred[p_ids[a]], gold[g_ids[b]]) for a, b, _ in matches)
+
+    total = Score()
+    for s in per_meeting.values():
+        total.add(s)
+    return {
+        "settings": {"sim": sim, "threshold": threshold, "blocking": blocking},
+        "predictions": len(pred),
+        "gold": len(gold),
+        "overall": total.report(),
+        "meetings": {m: per_meeting[m].report() for m in sorted(per_meeting)},
+    }
+
+
+@app.command()
+def main(
+    pred: str = typer.Option(str(PRED), "--pred", help="Predicted actions (.json/.jsonl/.parquet)"),
+    gold: str = typer.Option(str(GOLD), "--gold", help="Gold actions, same fields"),
+    sim: str = typer.Option("token", "--sim", help="token (content-word Jaccard) or char (3-gram Jaccard)"),
+    threshold: float = typer.Option(0.5, "--threshold", help="Minimum similarity for a match"),
+    blocking: str = typer.Option("meeting+assignee", "--block", help="meeting+assignee or meeting"),
+    show: int = typer.Option(10, "--show", help="Worst meetings to list"),
+    out: Optional[str] = typer.Option(None, "--out", help="Write the full report (with per-meeting scores) as JSON"),
+):
+    """Fuzzy precision / recall / F1 of predictions against gold, overall and per meeting."""
+    if sim not in SIMILARITIES:
+        raise typer.BadParameter(f"expected one of {SIMILARITIES}", param_hint="--sim")
+    if blocking not in BLOCKINGS:
+        raise typer.BadParameter(f"expected one of {BLOCKINGS}", param_hint="--block")
+    pred_file, gold_file = find_actions_file(Path(pred)), find_actions_file(Path(gold))
+    if pred_file is None or gold_file is None:
         print("Missing predictions or gold. Create data/processed/gold.json first.")
-        return                      
-    pred = pd.read_json(PRED)
-    gold = pd.read_json(GOLD)
-    pred["key"] = pred["assignee"].fillna("").map(normalize) + " | " + pred["action_item"].fillna("").map(normalize)
-    gold["key"] = gold["assignee"].fillna("").map(normalize) + " | " + gold["action_item"].fillna("").map(normalize)
-    tp = len(set(pred["key"]) & set(gold["key"]))
-    fp = len(set(pred["key"]) - set(gold["key"]))
-    fn = len(set(gold["key"]) - set(pred["key"]))
-    prec = tp / (tp + fp) if tp + fp else 0.0
-    rec = tp / (tp + fn) if tp + fn else 0.0
-    f1 = 2 * prec * rec / (prec + rec) if prec + rec else 0.0
-    print(f"Precision: {prec:.3f}\nRecall:    {rec:.3f}\nF1:        {f1:.3f}")
+        return
+
+    report = evaluate(list(iter_actions(pred_file)), list(iter_actions(gold_file)), sim, threshold, blocking)
+    o = report["overall"]
+    print(f"Predictions: {report['predictions']}  Gold: {report['gold']}  "
+          f"(matched {o['tp']}, {sim} similarity >= {threshold}, blocks: {blocking})")
+    print(f"Precision: {o['precision']:.3f}\nRecall:    {o['recall']:.3f}\nF1:        {o['f1']:.3f}")
+    if o["deadline_acc"] is not None:
+        print(f"Deadline:  {o['deadline_acc']:.3f} (of matched actions)")
+
+    meetings = report["meetings"]
+    if show and len(meetings) > 1:
+        print(f"\n{'meeting':20} {'P':>6} {'R':>6} {'F1':>6} {'deadl':>6} {'tp':>5} {'fp':>5} {'fn':>5}")
+        for m in sorted(meetings, key=lambda m: (meetings[m]["f1"], m))[:show]:
+            r = meetings[m]
+            dl = f"{r['deadline_acc']:.3f}" if r["deadline_acc"] is not None else "-"
+            print(f"{m[:20]:20} {r['precision']:6.3f} {r['recall']:6.3f} {r['f1']:6.3f} {dl:>6} "
+                  f"{r['tp']:5} {r['fp']:5} {r['fn']:5}")
+    if out:
+        Path(out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report -> {out}")
+
 
 if __name__ == "__main__":
-    main()
+    app()
@@ -1,72 +1,62 @@
 from __future__ import annotations
-import json
+from datetime import date
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
-import pandas as pd
 import typer
 from rich import print
 
 
  # in this file i had to use utt roles and the parsed for the firt fucntion 
  
-from config import RAW_DIR, DEFAULT_OUTPUT_JSON, PROCESSED_DIR
-from ami_loader import load_meeting, Utterance
-from action_rules import extract_task_and_deadline
-from temporal import normalize_deadline
-from coref_simple import resolve_pronouns
-from utils import iter_meeting_files
+from config import RAW_DIR, DEFAULT_OUTPUT_JSON, ensure_dirs
+from ami_loader import Meeting
+from temporal import reference_date
+from pipeline import ActionPipeline, DeadlineNormalizer, RulesDetector
+from incremental import run_incremental, stage_version, roles_digest
+import profiling
 
 app = typer.Typer()
 
-def choose_assignee(utt: Utterance, roles: dict[str, str], parsed: dict, last_addr: Optional[str]) -> tuple[str, str]:
-    if parsed.get("assignee_name"):
-        nm = parsed["assignee_name"]
-        if nm in roles.keys():
-            return nm, roles.get(nm, "")
-        return nm, ""
-    pron = resolve_pronouns(utt.text, utt.speaker, last_addr)
-    if pron["i"]:
-        return utt.speaker, roles.get(utt.speaker, "")
-    if pron["you"] and pron["you"] in roles:
-        return pron["you"], roles.get(pron["you"], "")
-    return utt.speaker, roles.get(utt.speaker, "")
+
+def rules_pipeline(ref: date) -> ActionPipeline:
+    """Rules-only detection, ISO deadlines against `ref`."""
+    return ActionPipeline(detector=RulesDetector(), normalizer=DeadlineNormalizer(ref))
+
+
+def extract_meeting(meeting: Meeting, ref: date) -> list[dict]:
+    """Rule-based actions for one meeting."""
+    return rules_pipeline(ref)(meeting)
 
 
 @app.command()
 def main(
     input_dir: str = typer.Option(str(RAW_DIR), "--input-dir", "--input_dir"),
-    out_json: str = typer.Option(str(DEFAULT_OUTPUT_JSON), "--out-json", "--out_json")
+    out_json: str = typer.Option(str(DEFAULT_OUTPUT_JSON), "--out-json", "--out_json"),
+    out_format: Optional[str] = typer.Option(None, "--out-format", "--out_format"),
+    ref_date: Optional[str] = typer.Option(None, "--ref-date", "--ref_date"),
+    corpus_cache: bool = typer.Option(True, "--corpus-cache/--no-corpus-cache"),
+    workers: int = typer.Option(1, "--workers"),
+    full: bool = typer.Option(False, "--full", help="Ignore the manifest and reprocess every meeting"),
+    profile: bool = typer.Option(False, "--profile", help="Write a per-stage timing/memory report to logs/profiles"),
+    profile_dump: Optional[str] = typer.Option(None, "--profile-dump", help="Also dump 'cprofile' stats or a 'flame' graph"),
 ):
 
     input_path = Path(input_dir)
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dirs()
 
-    results = []
-    for p in iter_meeting_files(input_path):
-        meeting = load_meeting(p, Path(input_dir) / "roles.csv")
-        last_addressed: Optional[str] = None
-        for utt in meeting.utterances:
-            parsed = extract_task_and_deadline(utt.text)
-            if not parsed:
-                continue
-            assignee, role = choose_assignee(utt, meeting.roles, parsed, last_addressed)
-            deadline_iso = normalize_deadline(parsed.get("deadline_raw"), ref=datetime.now())
-            toks = utt.text.split()
-            if toks and toks[0].rstrip(",").isalpha() and toks[0].istitle():
-                last_addressed = toks[0].rstrip(",")
-            results.append({
-                "meeting": meeting.name,
-                "speaker": utt.speaker,
-                "speaker_role": meeting.roles.get(utt.speaker, ""),
-                "assignee": assignee,
-                "assignee_role": role,
-                "action_item": parsed.get("task") or "",
-                "deadline_text": parsed.get("deadline_raw"),
-                "deadline_iso": deadline_iso
-            })
-    Path(out_json).write_text(json.dumps(results, indent=2), encoding="utf-8")
-    print(f"[green]Wrote {len(results)} actions -> {out_json}")
+    # one reference date for the whole run keeps parallel output identical
+    ref = reference_date(ref_date)
+    version = stage_version(
+        ["extract", "pipeline", "action_rules", "temporal", "coref_simple"],
+        roles=roles_digest(input_path),
+    )
+    # only new/changed meetings are processed; the rest come from the manifest
+    with profiling.session("extract", profile, profile_dump):
+        count, done, reused = run_incremental(
+            rules_pipeline(ref), input_path, Path(out_json), out_format,
+            version, ref, use_cache=corpus_cache, workers=workers, full=full,
+        )
+    print(f"[green]Wrote {count} actions -> {out_json} ({done} meetings processed, {reused} unchanged)")
 
 if __name__ == "__main__":
     app()
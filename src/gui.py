@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import json
 import subprocess
 import sys
 from pathlib import Path
 from threading import Thread
 from config import ROOT, RAW_DIR, DEFAULT_OUTPUT_JSON
+from action_io import find_actions_file, read_page
+
+# the output pane only shows the first page of a large actions file
+ACTIONS_PAGE = 200
 
 
 class App:
@@ -79,16 +82,18 @@ class App:
         video_path = filedialog.askopenfilename(filetypes=[("MP4 files", "*.mp4")])
         if not video_path:
             return
+        # passed by path: the transcript cache hashes the file in place, no copy into the repo
         name = Path(video_path).name
-        dest = ROOT / name
-        if Path(video_path) != dest:
-            dest.write_bytes(Path(video_path).read_bytes())
         bat = ROOT / "scripts" / "process_video.bat"
         if not bat.exists():
             self.write("Error: process_video.bat not found!")
             return
+        # the pipeline queues the video to the resident transcription worker
+        import asr_worker
+
+        asr_worker.ensure_worker(wait=False)
         self.write(f"Processing video: {name} ...")
-        self.run_subprocess([str(bat), name], ROOT)
+        self.run_subprocess([str(bat), str(Path(video_path).resolve())], ROOT)
         self.write("Video processing complete.")
         self.show_actions()
 
@@ -104,25 +109,27 @@ class App:
     def show_actions(self):
         self.output.delete("1.0", "end")
         self.write("Loading action items...")
-        path = Path(DEFAULT_OUTPUT_JSON)
-        if not path.exists():
-            self.write(f"Actions file not found: {path}")
+        path = find_actions_file(Path(DEFAULT_OUTPUT_JSON))
+        if path is None:
+            self.write(f"Actions file not found: {DEFAULT_OUTPUT_JSON}")
             return
         try:
-            data = json.loads(path.read_text())
+            data, total = read_page(path, 0, ACTIONS_PAGE)
         except Exception as e:
-            self.write(f"Failed to read JSON: {e}")
+            self.write(f"Failed to read {path.name}: {e}")
             return
         if not data:
             self.write("No action items found.")
             return
-        self.write(f"Loaded {len(data)} action items:\n")
+        self.write(f"Loaded {total} action items:\n")
         for i, item in enumerate(data, 1):
             self.write(f"{i}. [{item.get('meeting')} | {item.get('speaker')}]")
             self.write(f"   action: {item.get('action_item')}")
             if item.get("deadline_text"):
                 self.write(f"   deadline: {item.get('deadline_text')} ({item.get('deadline_iso')})")
             self.write("")
+        if total > len(data):
+            self.write(f"Showing the first {len(data)} of {total}. Full list: {path}")
         self.write("Action items loaded successfully. Select next action.")
 
     def show_transcript(self):
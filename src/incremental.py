@@ -0,0 +1,131 @@
+from __future__ import annotations
+import hashlib
+import json
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import profiling
+from corpus_cache import meeting_digests
+from parallel import map_meetings
+from action_io import open_sink
+from utils import atomic_write_json, code_fingerprint, file_sha1
+
+#Content-hash manifest for incremental extract / infer_ml runs
+#
+# Stored next to the output (actions.json -> actions.manifest.json):
+#   {"version": 1,
+#    "meetings": {"ES2002a": {"sha1": .., "version": .., "ref_date": .., "actions": [..]}}}
+# `version` stamps the code, model, roles and options that produced a
+# meeting's actions. A re-run only processes meetings whose transcript
+# hash or version changed (or whose ref_date matters and changed), then
+# rewrites the output from the manifest in file order, so the result is
+# identical to a full rebuild.
+
+MANIFEST_VERSION = 1
+
+_SRC = Path(__file__).resolve().parent
+
+
+def manifest_path_for(out_path: Path) -> Path:
+    return Path(out_path).with_suffix(".manifest.json")
+
+
+def stage_version(modules: List[str], **params) -> str:
+    """Version stamp from the stage's source modules plus its options."""
+    code = code_fingerprint(*(_SRC / f"{m}.py" for m in modules))
+    opts = json.dumps(params, sort_keys=True, default=str)
+    return f"{code}:{hashlib.sha1(opts.encode('utf-8')).hexdigest()[:16]}"
+
+
+def roles_digest(input_dir: Path) -> str:
+    p = Path(input_dir) / "roles.csv"
+    return file_sha1(p) if p.exists() else ""
+
+
+class RunManifest:
+    """Per-meeting record of what produced the actions in one output file."""
+
+    def __init__(self, path: Path, meetings: Optional[Dict[str, dict]] = None):
+        self.path = Path(path)
+        self.meetings: Dict[str, dict] = meetings or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "RunManifest":
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("meetings", {}))
+
+    def is_fresh(self, name: str, sha1: str, version: str, ref_date: Optional[str]) -> bool:
+        entry = self.meetings.get(name)
+        if entry is None:
+            return False
+        if entry.get("sha1") != sha1 or entry.get("version") != version:
+            return False
+        return ref_date is None or entry.get("ref_date") == ref_date
+
+    def actions(self, name: str) -> List[dict]:
+        return self.meetings[name]["actions"]
+
+    def record(self, name: str, sha1: str, version: str, ref_date: Optional[str], actions: List[dict]):
+        self.meetings[name] = {"sha1": sha1, "version": version, "ref_date": ref_date, "actions": actions}
+
+    def retain(self, names):
+        """Forget meetings whose transcript is gone."""
+        keep = set(names)
+        self.meetings = {n: e for n, e in self.meetings.items() if n in keep}
+
+    def save(self):
+        atomic_write_json(self.path, {"version": MANIFEST_VERSION, "meetings": self.meetings})
+
+
+def run_incremental(
+    fn: Callable,
+    input_dir: Path,
+    out_path: Path,
+    out_format: Optional[str],
+    version: str,
+    ref: date,
+    ref_sensitive: bool = True,
+    use_cache: bool = True,
+    workers: int = 1,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    full: bool = False,
+) -> tuple[int, int, int]:
+    """
+    Run fn over new/changed meetings only and write the merged output.
+    ref_sensitive: whether fn's output depends on the reference date.
+    Returns (actions written, meetings processed, meetings reused).
+    """
+    input_dir = Path(input_dir)
+    out_path = Path(out_path)
+    with profiling.stage("manifest"):
+        manifest = RunManifest(manifest_path_for(out_path)) if full else RunManifest.load(manifest_path_for(out_path))
+    with profiling.stage("hash"):
+        digests = meeting_digests(input_dir, use_cache=use_cache)
+    ref_key = ref.isoformat() if ref_sensitive else None
+
+    stale = [n for n, sha1 in digests.items() if not manifest.is_fresh(n, sha1, version, ref_key)]
+    fresh = map_meetings(fn, input_dir, use_cache, workers,
+                         initializer=initializer, initargs=initargs, names=stale)
+    stale_set = set(stale)
+
+    # stale meetings come back from map_meetings in file order, so they
+    # interleave with the reused ones as the output is streamed
+    with open_sink(out_path, out_format) as sink:
+        for name, sha1 in digests.items():
+            if name in stale_set:
+                actions = next(fresh)
+                manifest.record(name, sha1, version, ref.isoformat(), actions)
+            with profiling.stage("sink", len(manifest.actions(name))):
+                sink.write(manifest.actions(name))
+    with profiling.stage("manifest"):
+        manifest.retain(digests)
+        manifest.save()
+    return sink.count, len(stale), len(digests) - len(stale)
@@ -1,50 +1,45 @@
 from __future__ import annotations
-import json
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
 
 import typer
-import joblib
 from rich import print
 
-from config import RAW_DIR, DEFAULT_OUTPUT_JSON, DEFAULT_MODEL_PATH
-from ami_loader import load_meeting, Utterance
-from action_rules import extract_task_and_deadline
-from temporal import normalize_deadline
-from coref_simple import resolve_pronouns
-from utils import iter_meeting_files
+from config import RAW_DIR, DEFAULT_OUTPUT_JSON, DEFAULT_MODEL_PATH, ensure_dirs
+from ami_loader import Meeting
+from temporal import reference_date
+from pipeline import ActionPipeline, CascadeDetector, MLDetector, PreScreen, DEFAULT_BATCH_SIZE, DEFAULT_THRESHOLD, get_model, load_model, model_digest
+from incremental import run_incremental, stage_version, roles_digest
+import profiling
 
 app = typer.Typer()
 
 MIN_TASK_WORDS = 4  # simple quality filter
 
 
-def choose_assignee(
-    utt: Utterance,
-    roles: dict[str, str],
-    parsed: dict,
-    last_addr: Optional[str],
-) -> tuple[str, str]:
+def ml_pipeline(
+    model_path: str,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_task_words: int = MIN_TASK_WORDS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    screen: Optional[PreScreen] = None,
+) -> ActionPipeline:
     """
-    Simple heuristic to choose who owns the action.
+    ML detection (rules if the model is missing or fails), rules parsing.
+    With a screen, only the utterances it keeps are scored (cascade).
+    No normalizer: the output carries deadline_text only, no deadline_iso.
     """
-    # Name explicitly extracted by the rules
-    if parsed.get("assignee_name"):
-        nm = parsed["assignee_name"]
-        if nm in roles.keys():
-            return nm, roles.get(nm, "")
-        return nm, ""
+    detector = MLDetector(model_path, threshold)
+    return ActionPipeline(
+        detector=CascadeDetector(screen, detector) if screen is not None else detector,
+        min_task_words=min_task_words,
+        batch_size=batch_size,
+    )
 
-    # Fallback to pronoun resolution
-    pron = resolve_pronouns(utt.text, utt.speaker, last_addr)
-    if pron["i"]:
-        return utt.speaker, roles.get(utt.speaker, "")
-    if pron["you"] and pron["you"] in roles:
-        return pron["you"], roles.get(pron["you"], "")
 
-    # Default: speaker owns it
-    return utt.speaker, roles.get(utt.speaker, "")
+def infer_meeting(meeting: Meeting, model_path: str = str(DEFAULT_MODEL_PATH), **options) -> list[dict]:
+    """ML (or rules-only) actions for one meeting."""
+    return ml_pipeline(model_path, **options)(meeting)
 
 
 @app.command()
@@ -52,88 +47,56 @@ def main(
     input_dir: str = typer.Option(str(RAW_DIR), "--input-dir", "--input_dir"),
     model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
     out_json: str = typer.Option(str(DEFAULT_OUTPUT_JSON), "--out-json", "--out_json"),
+    out_format: Optional[str] = typer.Option(None, "--out-format", "--out_format"),
+    ref_date: Optional[str] = typer.Option(None, "--ref-date", "--ref_date"),
+    corpus_cache: bool = typer.Option(True, "--corpus-cache/--no-corpus-cache"),
+    workers: int = typer.Option(1, "--workers"),
+    threshold: float = typer.Option(DEFAULT_THRESHOLD, "--threshold"),
+    min_task_words: int = typer.Option(MIN_TASK_WORDS, "--min-task-words", "--min_task_words"),
+    batch_size: int = typer.Option(DEFAULT_BATCH_SIZE, "--batch-size", "--batch_size"),
+    cascade: bool = typer.Option(False, "--cascade/--no-cascade", help="Screen out obvious non-actions before ML scoring"),
+    cascade_min_words: int = typer.Option(MIN_TASK_WORDS, "--cascade-min-words", help="cascade: words needed without a rules trigger"),
+    cascade_lexicon: bool = typer.Option(False, "--cascade-lexicon/--no-cascade-lexicon", help="cascade: also need an action word without a trigger"),
+    full: bool = typer.Option(False, "--full", help="Ignore the manifest and reprocess every meeting"),
+    profile: bool = typer.Option(False, "--profile", help="Write a per-stage timing/memory report to logs/profiles"),
+    profile_dump: Optional[str] = typer.Option(None, "--profile-dump", help="Also dump 'cprofile' stats or a 'flame' graph"),
 ):
-    # Try to load the classifier, else fall back to rules only
-    try:
-        clf = joblib.load(model_path)
-        print(f"[green]Loaded ML model -> {model_path}")
-    except Exception as e:
-        clf = None
-        print(f"[yellow]Model not loaded ({e}). Falling back to rules only.")
-
-    results: list[dict] = []
-
-    for p in iter_meeting_files(Path(input_dir)):
-        meeting = load_meeting(p, Path(input_dir) / "roles.csv")
-        last_addressed: Optional[str] = None
-
-        for utt in meeting.utterances:
-            text = utt.text.strip()
-            if not text:
-                continue
-
-            # 1) Decide if this utterance is an action
-            if clf is not None:
-
-
-                try:
-                    proba = clf.predict_proba([text])[0][1]
-                    # a slightly lower threshold keeps recall reasonable
-                    is_action = proba >= 0.40
-                except Exception:
-                    is_action = bool(extract_task_and_deadline(text))
+    ensure_dirs()
+    with profiling.session("infer_ml", profile, profile_dump):
+        # Try to load the classifier, else fall back to rules only
+        with profiling.stage("model_load"):
+            err = load_model(model_path)
+        if err is None:
+            print(f"[green]Loaded ML model -> {model_path} ({type(get_model(model_path)).__name__})")
+        else:
+            print(f"[yellow]Model not loaded ({err}). Falling back to rules only.")
+
+        ref = reference_date(ref_date)
+        screen = PreScreen(cascade_min_words, cascade_lexicon) if cascade else None
+        version = stage_version(
+            ["infer_ml", "pipeline", "action_rules", "temporal", "coref_simple"],
+            model=model_digest(model_path) if err is None else None,
+            roles=roles_digest(Path(input_dir)),
+            threshold=threshold,
+            min_task_words=min_task_words,
+            cascade=screen.settings() if screen is not None else None,
+        )
+        # only new/changed meetings are processed; the output has no deadline_iso,
+        # so a different reference date does not invalidate anything
+        pipeline = ml_pipeline(model_path, threshold, min_task_words, batch_size, screen)
+        count, done, reused = run_incremental(
+            pipeline,
+            Path(input_dir), Path(out_json), out_format, version, ref, ref_sensitive=False,
+            use_cache=corpus_cache, workers=workers,
+            initializer=load_model, initargs=(model_path,), full=full,
+        )
+        if screen is not None:
+            screened, kept = pipeline.counts["screened"], pipeline.counts["kept"]
+            if screened:
+                print(f"[cyan]Cascade: {screened - kept} of {screened} utterances screened out before ML scoring[/cyan]")
             else:
-                is_action = bool(extract_task_and_deadline(text))
-
-            if not is_action:
-                continue
-
-            # 2) Parse out task and deadline (rules)
-            parsed = extract_task_and_deadline(text)
-            if not parsed:
-                parsed = {
-                    "task": text,
-                    "deadline_raw": None,
-                    "assignee_name": None,
-                }
-
-            task = (parsed.get("task") or "").strip()
-            if not task:
-                continue
-
-            # simple quality filter – avoid very short fragments
-            if len(task.split()) < MIN_TASK_WORDS:
-                continue
-
-            # 3) Assignee + role
-            assignee, role = choose_assignee(utt, meeting.roles, parsed, last_addressed)
-
-            # 4) Deadline – keep only text in output, still normalize internally if needed
-            deadline_text = parsed.get("deadline_raw")
-            if deadline_text:
-                _ = normalize_deadline(deadline_text, ref=datetime.now())
-                # we ignore the ISO value in the JSON on purpose
-
-            # 5) Track last addressed name (for “you” resolution)
-            toks = text.split()
-            if toks and toks[0].rstrip(",").isalpha() and toks[0].istitle():
-                last_addressed = toks[0].rstrip(",")
-
-            # 6) Store result – NO deadline_iso in output
-            results.append(
-                {
-                    "meeting": meeting.name,
-                    "speaker": utt.speaker,
-                    "speaker_role": meeting.roles.get(utt.speaker, ""),
-                    "assignee": assignee,
-                    "assignee_role": role,
-                    "action_item": task,
-                    "deadline_text": deadline_text,
-                }
-            )
-
-    Path(out_json).write_text(json.dumps(results, indent=2), encoding="utf-8")
-    print(f"[green]Wrote {len(results)} actions (ML+rules) -> {out_json}")
+                print("[cyan]Cascade: nothing to screen, every meeting was reused[/cyan]")
+    print(f"[green]Wrote {count} actions (ML+rules) -> {out_json} ({done} meetings processed, {reused} unchanged)")
 
 
 if __name__ == "__main__":
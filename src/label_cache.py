@@ -0,0 +1,103 @@
+from __future__ import annotations
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import INTERIM_DIR
+from action_rules import extract_many, rules_fingerprint
+from utils import atomic_open
+
+#Persistent weak-label store for training
+#
+# The rules label of an utterance only depends on its text and on the
+# rules code, so labels are kept across runs in
+#   data/interim/labels/<rules fingerprint>.npy
+# a sorted uint64 array of [text hash, label] rows (8-byte BLAKE2b of the
+# stripped text). Lookups are a vectorised searchsorted over the
+# memory-mapped file; only texts that are not in it go through the rules,
+# and `save` merges them in atomically. Editing action_rules.py changes the
+# fingerprint, so every text is relabeled once under the new rules and the
+# stores of older rule versions are removed.
+
+LABELS_DIR = INTERIM_DIR / "labels"
+FLUSH_AT = 1_000_000  # new labels held in memory before they are merged to disk
+
+
+def text_key(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LabelCache:
+    """Rules labels by text hash for one rules version."""
+
+    def __init__(self, root: Path = LABELS_DIR, version: Optional[str] = None):
+        self.root = Path(root)
+        self.version = version or rules_fingerprint()
+        self.path = self.root / f"{self.version}.npy"
+        try:
+            table = np.load(self.path, mmap_mode="r")
+        except (OSError, ValueError):
+            table = np.zeros((0, 2), dtype=np.uint64)
+        self.keys = table[:, 0]
+        self.values = table[:, 1]
+        self.new: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def labels(self, texts: List[str]) -> List[int]:
+        """Rules label (0/1) per stripped text; unseen texts are labeled and remembered."""
+        if not texts:
+            return []
+        keys = [text_key(t) for t in texts]
+        q = np.fromiter(keys, dtype=np.uint64, count=len(keys))
+        pos = np.searchsorted(self.keys, q)
+        found = np.zeros(len(keys), dtype=bool)
+        out = np.zeros(len(keys), dtype=np.int64)
+        if self.keys.size:
+            clipped = np.minimum(pos, self.keys.size - 1)
+            found = self.keys[clipped] == q
+            out[found] = self.values[clipped[found]]
+        labels = out.tolist()
+        todo = []
+        for i in np.flatnonzero(~found).tolist():
+            label = self.new.get(keys[i])
+            if label is None:
+                todo.append(i)
+            else:
+                labels[i] = label
+        for i, parsed in zip(todo, extract_many([texts[i] for i in todo])):
+            labels[i] = self.new[keys[i]] = int(parsed is not None)
+        self.misses += len(todo)
+        self.hits += len(texts) - len(todo)
+        if len(self.new) >= FLUSH_AT:
+            self.save()
+        return labels
+
+    def save(self):
+        """Merge this run's new labels into the store (and drop other rule versions)."""
+        if not self.new:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        added = np.array(list(self.new.items()), dtype=np.uint64).reshape(-1, 2)
+        table = np.concatenate([np.column_stack([self.keys, self.values]), added])
+        table = table[np.argsort(table[:, 0], kind="stable")]
+        # let go of the old memory map before replacing the file (Windows)
+        self.keys, self.values = table[:, 0], table[:, 1]
+        self.new = {}
+        with atomic_open(self.path, "wb") as f:
+            np.save(f, table)
+        for old in self.root.glob("*.npy"):
+            if old != self.path:
+                old.unlink(missing_ok=True)
+
+
+class CachedRulesDetector:
+    """RulesDetector through a LabelCache: same labels, no parse for known texts."""
+
+    def __init__(self, cache: LabelCache):
+        self.cache = cache
+
+    def detect(self, batch):
+        batch.is_action = [bool(label) for label in self.cache.labels(batch.texts)]
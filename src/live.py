@@ -0,0 +1,413 @@
+from __future__ import annotations
+import hashlib
+import json
+import queue
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import typer
+from rich import print
+from rich.markup import escape
+
+from config import RAW_DIR, PROCESSED_DIR, LOGS_DIR, DEFAULT_MODEL_PATH, ensure_dirs
+from ami_loader import ROLES, Meeting, Utterance, parse_line
+from action_io import JsonlSink, format_for
+from temporal import reference_date
+from pipeline import ActionPipeline, Assigner, Batch, DeadlineNormalizer, DEFAULT_THRESHOLD, get_model, load_model
+from extract import rules_pipeline
+from infer_ml import MIN_TASK_WORDS, ml_pipeline
+from utils import atomic_write_json
+import profiling
+
+#Live meeting mode (python src/live.py data/raw/AMI/standup.txt)
+#
+# Extracts actions while a meeting is still going. Utterances come from
+# transcripts that are still being written (one file per meeting; a
+# directory is watched for new .txt files) or from stdin ("-"), as
+# transcript lines or ASR segments, one JSON object per line with
+# "start", "end", "text" and optionally "speaker".
+#
+# Each meeting keeps its own state: the read offset into its transcript,
+# the Assigner with its last addressed name, and the utterances waiting to
+# be processed. Waiting utterances go through detect -> parse -> assign ->
+# normalize once --max-batch of them are queued or the oldest has waited
+# --max-wait seconds. Their actions are appended to a JSONL file, which a
+# restart keeps adding to (--overwrite starts it afresh). Nothing is
+# re-read or re-scored, so a meeting's actions are the ones a batch run
+# over the finished transcript produces. The one difference from infer_ml
+# is that live output also carries deadline_iso.
+#
+# Latency runs from when an utterance reached us to when its action was
+# written. An utterance reaches us at the transcript's mtime when its line
+# is read, or when its stdin line arrives. The p50/p95/max per meeting are
+# kept in --metrics (rewritten about once a second) and printed at exit.
+
+LIVE_OUTPUT = PROCESSED_DIR / "live_actions.jsonl"
+LIVE_METRICS = LOGS_DIR / "live_metrics.json"
+POLL = 0.1
+MAX_WAIT = 0.25  # seconds an utterance may wait for more to batch with
+MAX_BATCH = 64
+METRICS_EVERY = 1.0
+
+app = typer.Typer()
+
+
+class LatencyMeter:
+    """Utterance -> action latencies, in seconds."""
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = array("d")
+
+    def add(self, seconds: float):
+        self.values.append(seconds)
+
+    def summary(self) -> dict:
+        lat = sorted(self.values)
+        return {
+            "actions": len(lat),
+            "p50_ms": round(profiling.percentile(lat, 50) * 1e3, 2),
+            "p95_ms": round(profiling.percentile(lat, 95) * 1e3, 2),
+            "max_ms": round(lat[-1] * 1e3, 2) if lat else 0.0,
+        }
+
+
+class LiveMeeting:
+    """State of one meeting in progress."""
+
+    def __init__(self, name: str, roles: Dict[str, str]):
+        self.name = name
+        self.assigner = Assigner(roles)
+        self.pending: List[Utterance] = []
+        self.arrived: List[float] = []  # perf_counter() per pending utterance
+        self.utterances = 0
+        self.latency = LatencyMeter()
+
+
+class LiveExtractor:
+    """
+    Runs `pipeline` incrementally over any number of live meetings and
+    appends their actions to `sink`.
+    """
+
+    def __init__(
+        self,
+        pipeline: ActionPipeline,
+        sink: JsonlSink,
+        roles_path: Path,
+        max_batch: int = MAX_BATCH,
+        max_wait: float = MAX_WAIT,
+        on_action=None,
+    ):
+        self.pipeline = pipeline
+        self.sink = sink
+        self.roles_path = Path(roles_path)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.on_action = on_action
+        self.meetings: Dict[str, LiveMeeting] = {}
+        self.latency = LatencyMeter()
+
+    def meeting(self, name: str) -> LiveMeeting:
+        m = self.meetings.get(name)
+        if m is None:
+            m = self.meetings[name] = LiveMeeting(name, ROLES.roles_for(self.roles_path, name))
+        return m
+
+    def reset(self, name: str):
+        """Forget a meeting's state; its next utterances start it afresh."""
+        self.meetings.pop(name, None)
+
+    def push(self, name: str, utterances: List[Utterance], arrived: Optional[float] = None) -> int:
+        """Queue new utterances of meeting `name`; returns how many actions were written."""
+        m = self.meeting(name)
+        arrived = perf_counter() if arrived is None else arrived
+        m.pending.extend(utterances)
+        m.arrived.extend([arrived] * len(utterances))
+        return self.flush(m) if len(m.pending) >= self.max_batch else 0
+
+    def due(self) -> int:
+        """Flush the meetings whose oldest waiting utterance has waited max_wait."""
+        now = perf_counter()
+        return sum(self.flush(m) for m in list(self.meetings.values())
+                   if m.pending and now - m.arrived[0] >= self.max_wait)
+
+    def flush_all(self) -> int:
+        return sum(self.flush(m) for m in list(self.meetings.values()))
+
+    def flush(self, m: LiveMeeting) -> int:
+        if not m.pending:
+            return 0
+        utts, arrived = m.pending, m.arrived
+        m.pending, m.arrived = [], []
+        # roles.csv may be edited during the meeting (ROLES re-reads it only if it changed)
+        roles = m.assigner.roles = ROLES.roles_for(self.roles_path, m.name)
+        actions: List[dict] = []
+        sources: List[int] = []
+        offset = 0
+        for batch in self.pipeline.batches(Meeting(m.name, utts, roles)):
+            for i, (utt, text, hit, parsed) in enumerate(zip(batch.utterances, batch.texts, batch.is_action, batch.parsed)):
+                if not hit:
+                    continue
+                action = self.pipeline.assign(m.name, roles, m.assigner, utt, text, parsed)
+                if action is None:
+                    continue
+                self.pipeline.normalize(action)
+                actions.append(action)
+                sources.append(offset + i)
+            offset += len(batch.texts)
+        self.sink.write(actions)
+
+        done = perf_counter()
+        m.utterances += len(utts)
+        for i in sources:
+            m.latency.add(done - arrived[i])
+            self.latency.add(done - arrived[i])
+        prof = profiling.active()
+        if prof is not None:
+            prof.latency([done - a for a in arrived])
+        if self.on_action is not None:
+            for action in actions:
+                self.on_action(action)
+        return len(actions)
+
+    def metrics(self) -> dict:
+        return {
+            "updated": time.time(),
+            "settings": {"max_batch": self.max_batch, "max_wait_s": self.max_wait},
+            "overall": {"meetings": len(self.meetings),
+                        "utterances": sum(m.utterances for m in self.meetings.values()),
+                        **self.latency.summary()},
+            "meetings": {name: {"utterances": m.utterances, **m.latency.summary()}
+                         for name, m in sorted(self.meetings.items())},
+        }
+
+
+class TranscriptTail:
+    """Complete lines appended to a transcript since the last read."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.offset = 0
+        self.partial = b""
+        self.ident: Optional[Tuple[int, int]] = None
+        self.seen = hashlib.sha1()  # the bytes consumed so far
+        self.since = perf_counter()  # nothing in the file reached us before we started watching it
+
+    def _still_prefix(self) -> bool:
+        """Does the file still start with the bytes consumed so far?"""
+        h, left = hashlib.sha1(), self.offset
+        with self.path.open("rb") as f:
+            while left:
+                chunk = f.read(min(left, 1 << 20))
+                if not chunk:
+                    return False
+                h.update(chunk)
+                left -= len(chunk)
+        return h.digest() == self.seen.digest()
+
+    def read(self) -> Tuple[List[Utterance], float, bool]:
+        """(new utterances, when they reached us as a perf_counter() value, whether the file was rewritten)."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return [], 0.0, False
+        restarted = False
+        ident = (st.st_dev, st.st_ino)
+        if self.ident is not None and (ident != self.ident or st.st_size < self.offset):
+            # replaced (atomic writers) or truncated: carry on if what we read is still its start
+            if not self._still_prefix():
+                self.offset, self.partial, self.seen, restarted = 0, b"", hashlib.sha1(), True
+        self.ident = ident
+        if st.st_size <= self.offset:
+            return [], 0.0, restarted
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        self.seen.update(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()  # an unfinished last line waits for its newline
+        now = perf_counter()
+        arrived = max(self.since, now - max(0.0, time.time() - st.st_mtime))
+        return self._parse(lines), arrived, restarted
+
+    def rest(self) -> List[Utterance]:
+        """The unfinished last line, once the writer is done."""
+        lines, self.partial = [self.partial], b""
+        return self._parse(lines)
+
+    @staticmethod
+    def _parse(lines: List[bytes]) -> List[Utterance]:
+        utts = (parse_line(line.decode("utf-8", "replace")) for line in lines)
+        return [u for u in utts if u is not None]
+
+
+def parse_segment(line: str) -> Optional[Utterance]:
+    """An ASR segment as JSON ({"start", "end", "text"[, "speaker"]}) or a transcript line."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return parse_line(line)
+    try:
+        seg = json.loads(line)
+    except ValueError:
+        seg = None
+    if not isinstance(seg, dict):
+        print(f"[yellow]Skipping malformed segment: {escape(line[:80])}[/yellow]")
+        return None
+    text = (seg.get("text") or "").strip()
+    if not text:
+        return None
+    return Utterance(speaker=seg.get("speaker") or "UNK", text=text, start=seg.get("start"), end=seg.get("end"))
+
+
+def _read_stdin(lines: queue.Queue):
+    for line in sys.stdin:
+        lines.put((line, perf_counter()))
+    lines.put(None)
+
+
+def _transcripts(paths: List[Path]) -> List[Path]:
+    found: List[Path] = []
+    for p in paths:
+        found.extend(sorted(p.glob("*.txt")) if p.is_dir() else [p])
+    return found
+
+
+def warm_up(pipeline: ActionPipeline):
+    """Pay for lazy imports and first calls (model, dateparser) before the meeting rather than on its first actions."""
+    batch = Batch.of([Utterance(speaker="UNK", text="Can you send the report by the end of next month?")])
+    pipeline.detector.detect(batch)
+    pipeline.parser.parse(batch)
+    if pipeline.normalizer is not None:
+        pipeline.normalizer.normalize("the end of next month")
+
+
+def _print_action(action: dict):
+    deadline = action.get("deadline_iso") or action.get("deadline_text")
+    print(f"[cyan]{action['meeting']}[/cyan] {action['assignee']}: {action['action_item']}"
+          + (f" [yellow]({deadline})[/yellow]" if deadline else ""))
+
+
+@app.command()
+def main(
+    sources: List[str] = typer.Argument(..., help="Transcripts or directories of transcripts to follow; '-' reads stdin"),
+    meeting: str = typer.Option("live", "--meeting", help="Meeting name for stdin input"),
+    out_jsonl: str = typer.Option(str(LIVE_OUTPUT), "--out-jsonl", "--out_jsonl"),
+    metrics_out: str = typer.Option(str(LIVE_METRICS), "--metrics", help="Latency metrics JSON, rewritten as it changes"),
+    roles_path: str = typer.Option(str(RAW_DIR / "roles.csv"), "--roles"),
+    model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
+    rules_only: bool = typer.Option(False, "--rules-only", help="Rules detector (as extract.py) instead of the ML model"),
+    threshold: float = typer.Option(DEFAULT_THRESHOLD, "--threshold"),
+    min_task_words: int = typer.Option(MIN_TASK_WORDS, "--min-task-words", "--min_task_words"),
+    ref_date: Optional[str] = typer.Option(None, "--ref-date", "--ref_date"),
+    max_batch: int = typer.Option(MAX_BATCH, "--max-batch", help="Process as soon as this many utterances are waiting"),
+    max_wait: float = typer.Option(MAX_WAIT, "--max-wait", help="Longest an utterance waits for others to batch with (s)"),
+    poll: float = typer.Option(POLL, "--poll", help="How often transcripts are checked for new lines (s)"),
+    from_end: bool = typer.Option(False, "--from-end", help="Skip what existing transcripts already contain (use when resuming)"),
+    overwrite: bool = typer.Option(False, "--overwrite", help="Replace the output file instead of appending to it"),
+    idle_timeout: float = typer.Option(0.0, "--idle-timeout", help="Stop after this many seconds without new utterances (0: run until Ctrl+C)"),
+    quiet: bool = typer.Option(False, "--quiet", help="Do not print actions as they are found"),
+    profile: bool = typer.Option(False, "--profile", help="Write a per-stage timing/memory report to logs/profiles"),
+    profile_dump: Optional[str] = typer.Option(None, "--profile-dump", help="Also dump 'cprofile' stats or a 'flame' graph"),
+):
+    if format_for(Path(out_jsonl)) != "jsonl":
+        raise typer.BadParameter("live output is appended line by line; use a .jsonl path", param_hint="--out-jsonl")
+    ensure_dirs()
+    ref = reference_date(ref_date)
+    if rules_only:
+        pipeline = rules_pipeline(ref)
+    else:
+        err = load_model(model_path)
+        if err is None:
+            print(f"[green]Loaded ML model -> {model_path} ({type(get_model(model_path)).__name__})")
+        else:
+            print(f"[yellow]Model not loaded ({err}). Falling back to rules only.")
+        pipeline = ml_pipeline(model_path, threshold, min_task_words)
+        pipeline.normalizer = DeadlineNormalizer(ref)
+    warm_up(pipeline)
+
+    paths = [Path(s) for s in sources if s != "-"]
+    lines: Optional[queue.Queue] = None
+    if "-" in sources:
+        lines = queue.Queue()
+        threading.Thread(target=_read_stdin, args=(lines,), daemon=True).start()
+    tails: Dict[Path, TranscriptTail] = {}
+    if from_end:
+        for path in _transcripts(paths):
+            tail = tails[path] = TranscriptTail(path)
+            tail.read()
+
+    metrics_path = Path(metrics_out)
+    with profiling.session("live", profile, profile_dump) as prof, JsonlSink(Path(out_jsonl), append=not overwrite) as sink:
+        live = LiveExtractor(pipeline, sink, Path(roles_path), max_batch, max_wait,
+                             on_action=None if quiet else _print_action)
+        print(f"[cyan]Following {', '.join(sources)} -> {out_jsonl} (Ctrl+C to stop)[/cyan]")
+        last_input = last_metrics = perf_counter()
+        try:
+            while True:
+                got = False
+                for path in _transcripts(paths):
+                    tail = tails.get(path)
+                    if tail is None:
+                        tail = tails[path] = TranscriptTail(path)
+                    utts, arrived, restarted = tail.read()
+                    if restarted:
+                        print(f"[yellow]{path.name} was rewritten; reading it from the start[/yellow]")
+                        live.reset(path.stem)
+                    if utts:
+                        got = True
+                        live.push(path.stem, utts, arrived)
+                stdin_open = lines is not None
+                while lines is not None:
+                    try:
+                        item = lines.get(timeout=0 if got else poll)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        lines = None
+                        break
+                    utt = parse_segment(item[0])
+                    if utt is not None:
+                        got = True
+                        live.push(meeting, [utt], item[1])
+                live.due()
+
+                now = perf_counter()
+                if got:
+                    last_input = now
+                if now - last_metrics >= METRICS_EVERY:
+                    atomic_write_json(metrics_path, live.metrics(), indent=2)
+                    last_metrics = now
+                if (idle_timeout and now - last_input >= idle_timeout) or (not paths and lines is None):
+                    break
+                if not got and not stdin_open:
+                    time.sleep(poll)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # the writers are done: their last lines count even without a newline
+            for path, tail in tails.items():
+                rest = tail.rest()
+                if rest:
+                    live.push(path.stem, rest)
+            live.flush_all()
+            metrics = live.metrics()
+            atomic_write_json(metrics_path, metrics, indent=2)
+        if prof is not None:
+            prof.extra["live"] = metrics["overall"]
+
+    o = metrics["overall"]
+    print(f"[green]Wrote {o['actions']} actions from {o['utterances']} utterances in {o['meetings']} meetings -> {out_jsonl}")
+    print(f"[cyan]Utterance -> action latency: p50 {o['p50_ms']:.1f} ms, p95 {o['p95_ms']:.1f} ms, max {o['max_ms']:.1f} ms "
+          f"(metrics -> {metrics_path})[/cyan]")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,250 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import typer
+from rich import print
+
+from config import DEFAULT_MODEL_PATH
+from action_rules import rules_fingerprint
+from corpus_cache import meeting_digests
+from utils import atomic_write_json, code_fingerprint
+
+#Registry of trained models
+#
+# Lives next to the served model (data/processed/models/ for clf.joblib):
+#   registry.json   {"version": 1, "active": key, "pinned": bool,
+#                    "history": [promoted keys], "models": {key: info}}
+#   <key>/clf.joblib, <key>/clf.compact/
+# The key hashes what determines the model: the transcripts' content, the
+# rules version, the training code, the sklearn version and the trainer's
+# hyperparameters. train_ml looks the key up first; a hit only (re)promotes
+# the stored model, so re-running the pipeline on unchanged data is free.
+#
+# Promotion hard-links (or copies) the entry over the served files: the
+# compact artifact first, then clf.joblib with os.replace, so a reader sees
+# either the old pair or a new compact that infer_ml ignores until the new
+# joblib lands. `rollback` re-promotes the previous model and pins it, so
+# later training runs register new models without replacing it.
+
+REGISTRY_VERSION = 1
+KEEP = 5  # models kept besides the active one
+
+_SRC = Path(__file__).resolve().parent
+
+app = typer.Typer()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ModelRegistry:
+    """Trained models for one served model path."""
+
+    def __init__(self, model_path: Path = DEFAULT_MODEL_PATH):
+        self.model_path = Path(model_path)
+        self.root = self.model_path.parent / "models"
+        self.index = self.root / "registry.json"
+        try:
+            data = json.loads(self.index.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != REGISTRY_VERSION:
+            data = {}
+        self.active: Optional[str] = data.get("active")
+        self.pinned: bool = data.get("pinned", False)
+        self.history: List[str] = data.get("history", [])
+        self.models: Dict[str, dict] = data.get("models", {})
+
+    # -- keys ---------------------------------------------------------------
+
+    def describe(self, input_dir: Path, use_cache: bool, params: dict) -> dict:
+        """Everything the trained model depends on."""
+        digests = meeting_digests(Path(input_dir), use_cache=use_cache)
+        corpus = hashlib.sha1(json.dumps(sorted(digests.items())).encode("utf-8")).hexdigest()[:16]
+        try:
+            sklearn = metadata.version("scikit-learn")
+        except metadata.PackageNotFoundError:
+            sklearn = None
+        return {
+            "corpus": corpus,
+            "meetings": len(digests),
+            "rules": rules_fingerprint(),
+            "code": code_fingerprint(*(_SRC / f"{m}.py" for m in ("train_ml", "pipeline", "compact_model"))),
+            "sklearn": sklearn,
+            "params": params,
+        }
+
+    @staticmethod
+    def key_for(info: dict) -> str:
+        return hashlib.sha1(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def get(self, key: str) -> Optional[dict]:
+        if key in self.models and (self.root / key / self.model_path.name).exists():
+            return self.models[key]
+        return None
+
+    # -- training -----------------------------------------------------------
+
+    def staging(self, key: str) -> Path:
+        """Empty directory to train into; returns the model path inside it."""
+        tmp = self.root / f"{key}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        return tmp / self.model_path.name
+
+    def commit(self, key: str, info: dict) -> bool:
+        """Register the model trained into staging(key). False if none was written."""
+        tmp = self.root / f"{key}.tmp"
+        if not (tmp / self.model_path.name).exists():
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        final = self.root / key
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        self.models[key] = {**info, "created": _now()}
+        self.save()
+        return True
+
+    # -- serving ------------------------------------------------------------
+
+    def is_served(self, key: str) -> bool:
+        """Whether the served model file is this entry's (same inode or size/mtime)."""
+        try:
+            a = (self.root / key / self.model_path.name).stat()
+            b = self.model_path.stat()
+        except OSError:
+            return False
+        return (a.st_ino, a.st_dev) == (b.st_ino, b.st_dev) or (a.st_size, a.st_mtime_ns) == (b.st_size, b.st_mtime_ns)
+
+    def promote(self, key: str, pin: bool = False):
+        """Serve model `key` at model_path (compact artifact first, then the joblib)."""
+        from compact_model import compact_path_for
+
+        if self.get(key) is None:
+            raise KeyError(f"no model {key!r} in {self.root}")
+        entry = self.root / key
+        compact, served_compact = compact_path_for(entry / self.model_path.name), compact_path_for(self.model_path)
+        tmp_dir = served_compact.with_name(served_compact.name + ".tmp")
+        old_dir = served_compact.with_name(served_compact.name + ".old")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if served_compact.exists():
+            os.replace(served_compact, old_dir)
+        if compact.exists():
+            shutil.copytree(compact, tmp_dir, copy_function=_link_or_copy)
+            os.replace(tmp_dir, served_compact)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        tmp = self.model_path.with_name(self.model_path.name + ".tmp")
+        tmp.unlink(missing_ok=True)
+        _link_or_copy(str(entry / self.model_path.name), str(tmp))
+        os.replace(tmp, self.model_path)
+
+        self.active, self.pinned = key, pin
+        if not self.history or self.history[-1] != key:
+            self.history.append(key)
+        self.prune()
+        self.save()
+
+    def use(self, key: str) -> bool:
+        """
+        Serve `key` after a training run or cache hit, unless a rollback
+        pinned another model. Returns whether `key` is now served.
+        """
+        if self.pinned and self.active != key:
+            print(f"[yellow]Registry: model {self.active} is pinned (rollback); {key} is registered but not served. "
+                  f"Use `python src/model_registry.py promote {key}` to serve it.[/yellow]")
+            return False
+        if self.active == key and self.is_served(key):
+            return True
+        self.promote(key, pin=self.pinned)
+        print(f"[green]Registry: promoted model {key} -> {self.model_path}[/green]")
+        return True
+
+    def rollback(self, to: Optional[str] = None) -> str:
+        """Serve the previously promoted model (or `to`) and pin it."""
+        if to is None:
+            earlier = [k for k in self.history[:-1] if k != self.active and self.get(k) is not None]
+            if not earlier:
+                raise KeyError("no earlier model to roll back to")
+            to = earlier[-1]
+            # drop the rolled-back model from the history so repeated rollbacks walk back
+            self.history = self.history[:len(self.history) - 1 - self.history[::-1].index(to)]
+        self.promote(to, pin=True)
+        return to
+
+    def prune(self, keep: int = KEEP):
+        """Delete the oldest models beyond `keep`, never the active one."""
+        old = sorted((k for k in self.models if k != self.active), key=lambda k: self.models[k].get("created", ""))
+        for key in old[:max(0, len(old) - keep)]:
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            del self.models[key]
+        self.history = [k for k in self.history if k in self.models]
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = {"version": REGISTRY_VERSION, "active": self.active, "pinned": self.pinned,
+                "history": self.history, "models": self.models}
+        atomic_write_json(self.index, data, indent=2)
+
+
+@app.command("list")
+def list_models(model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path")):
+    """Registered models, newest first."""
+    reg = ModelRegistry(Path(model_path))
+    if not reg.models:
+        print(f"No models registered under {reg.root}")
+        return
+    for key, info in sorted(reg.models.items(), key=lambda kv: kv[1].get("created", ""), reverse=True):
+        tag = " [green]active[/green]" + (" (pinned)" if reg.pinned else "") if key == reg.active else ""
+        params = ", ".join(f"{k}={v}" for k, v in info.get("params", {}).items())
+        print(f"{key}  {info.get('created', '?')}  meetings={info.get('meetings')}  rules={info.get('rules')}  {params}{tag}")
+
+
+@app.command()
+def promote(
+    key: str = typer.Argument(..., help="Model key from `list`."),
+    model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
+):
+    """Serve a registered model and clear any rollback pin."""
+    reg = ModelRegistry(Path(model_path))
+    try:
+        reg.promote(key)
+    except KeyError as e:
+        print(f"[red]{e}[/red]")
+        raise typer.Exit(code=1)
+    print(f"[green]Promoted model {key} -> {reg.model_path}[/green]")
+
+
+@app.command()
+def rollback(
+    to: Optional[str] = typer.Option(None, "--to", help="Model key; default is the previously promoted one."),
+    model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
+):
+    """Serve the previous model and pin it until the next `promote`."""
+    reg = ModelRegistry(Path(model_path))
+    try:
+        key = reg.rollback(to)
+    except KeyError as e:
+        print(f"[red]{e}[/red]")
+        raise typer.Exit(code=1)
+    print(f"[green]Rolled back to model {key} (pinned) -> {reg.model_path}[/green]")
+
+
+if __name__ == "__main__":
+    app()
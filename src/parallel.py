@@ -0,0 +1,107 @@
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, TypeVar
+
+import profiling
+from ami_loader import Meeting
+from corpus_cache import CorpusCache, iter_meetings, meeting_names, open_meeting
+
+#Fan meetings out over a process pool
+# Meetings are independent, so each worker opens its own meetings by name
+# (from the corpus cache when enabled) and results come back in file order,
+# which keeps the output identical to a serial run. Counters the function
+# keeps (fn.counts, e.g. the cascade's screened/kept) are sent back with
+# each result and added to the caller's fn, so they add up as in a serial run.
+
+T = TypeVar("T")
+
+# per-worker state, set up once by _init_worker
+_WORKER: dict = {}
+
+
+def _init_worker(fn, input_dir: Path, use_cache: bool, initializer, initargs):
+    _WORKER["fn"] = fn
+    _WORKER["input_dir"] = input_dir
+    _WORKER["cache"] = CorpusCache(input_dir) if use_cache else None
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _counts_of(fn) -> Optional[Counter]:
+    return getattr(getattr(fn, "fn", fn), "counts", None)
+
+
+def _run(name: str):
+    with open_meeting(_WORKER["input_dir"], name, _WORKER["cache"]) as meeting:
+        result = _WORKER["fn"](meeting)
+    counts = _counts_of(_WORKER["fn"])
+    if not counts:
+        return result, None
+    shipped = dict(counts)
+    counts.clear()
+    return result, shipped
+
+
+class _Profiled:
+    """Runs fn with stage recording on in the worker; returns (result, stats)."""
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+
+    def __call__(self, meeting: Meeting):
+        profiling.enable_in_worker()
+        result = self.fn(meeting)
+        return result, profiling.active().drain()
+
+
+def map_meetings(
+    fn: Callable[[Meeting], T],
+    input_dir: Path,
+    use_cache: bool = True,
+    workers: int = 1,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    names: Optional[List[str]] = None,
+) -> Iterator[T]:
+    """
+    Yield fn(meeting) for every meeting in input_dir (or just `names`),
+    in file order.
+
+    With workers > 1, fn runs in a process pool; fn and initializer must be
+    module-level functions (or partials of them). The initializer runs once
+    per worker, e.g. to load a model; in serial mode it is not called and fn
+    uses the caller's own state.
+    """
+    input_dir = Path(input_dir)
+    if workers <= 1 and names is None:
+        for meeting in iter_meetings(input_dir, use_cache=use_cache):
+            yield fn(meeting)
+        return
+
+    if names is None:
+        names = meeting_names(input_dir, use_cache=use_cache)
+    if workers <= 1:
+        cache = CorpusCache(input_dir) if use_cache else None
+        for name in names:
+            with open_meeting(input_dir, name, cache) as meeting:
+                yield fn(meeting)
+        return
+    if not names:
+        return
+    # under --profile, workers send their stage stats back with each result
+    prof = profiling.active()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(names)),
+        initializer=_init_worker,
+        initargs=(_Profiled(fn) if prof else fn, input_dir, use_cache, initializer, initargs),
+    ) as pool:
+        counts = _counts_of(fn)
+        for result, shipped in pool.map(_run, names):
+            if shipped and counts is not None:
+                counts.update(shipped)
+            if prof is not None:
+                result, stats = result
+                prof.merge(stats)
+            yield result
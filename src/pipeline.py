@@ -0,0 +1,471 @@
+from __future__ import annotations
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import profiling
+from ami_loader import Meeting, Utterance
+from action_rules import extract_many, has_trigger
+from temporal import normalize_deadline
+from coref_simple import resolve_pronouns
+from utils import file_sha1
+
+#Staged action pipeline shared by extract, infer_ml and train_ml
+#
+#   load -> detect -> parse -> assign -> normalize deadline -> sink
+#
+# Loading (iter_meetings / map_meetings, corpus cache, workers) and the
+# sink (action_io, incremental manifest) sit around ActionPipeline, which
+# runs the middle stages on batches of one meeting's utterances. Every
+# stage is an object with one method, so a different detector, parser or
+# normalizer can be dropped in. Adjacent stages fuse where that saves work:
+# the rules detector parses as it detects (one extract_many call), and
+# assign + normalize run as a single pass because the addressee state is
+# sequential within a meeting.
+#
+# Under --profile each stage is timed per batch, and every utterance gets a
+# latency: its share of the batch's load/detect/parse time plus its own
+# assign/normalize time.
+
+T = TypeVar("T")
+
+DEFAULT_BATCH_SIZE = 4096  # utterances per detect/parse call
+DEFAULT_THRESHOLD = 0.40
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Lists of `size` items (the whole input if size <= 0)."""
+    if size <= 0:
+        yield list(items)
+        return
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@dataclass(slots=True)
+class Batch:
+    """Consecutive utterances of one meeting, annotated stage by stage."""
+    utterances: List[Utterance]
+    texts: List[str]
+    is_action: List[bool] = field(default_factory=list)
+    parsed: Optional[List[Optional[dict]]] = None
+    scores: Optional[List[float]] = None
+    cost: float = 0.0  # seconds spent loading/detecting/parsing (profiling only)
+
+    @classmethod
+    def of(cls, utterances: List[Utterance]) -> "Batch":
+        return cls(utterances, [u.text.strip() for u in utterances])
+
+
+# ---------------------------------------------------------------------------
+# Detect
+# ---------------------------------------------------------------------------
+
+class RulesDetector:
+    """Action if the rules find a trigger. Fused with parsing."""
+
+    def detect(self, batch: Batch):
+        batch.parsed = extract_many(batch.texts)
+        batch.is_action = [p is not None for p in batch.parsed]
+
+
+# classifiers loaded in this process, by path (None = could not load)
+_MODELS: Dict[str, object] = {}
+
+
+def _compact_for(model_path: Path) -> Optional[Path]:
+    """The compact artifact to use for model_path, if there is a current one."""
+    from compact_model import compact_path_for
+
+    if model_path.is_dir():
+        return model_path
+    compact = compact_path_for(model_path)
+    try:
+        source = json.loads((compact / "meta.json").read_text(encoding="utf-8")).get("source") or {}
+    except (OSError, ValueError):
+        return None
+    if not model_path.exists():
+        return compact
+    # only if it was exported from this very joblib file
+    st = model_path.stat()
+    if source.get("size") == st.st_size and source.get("mtime_ns") == st.st_mtime_ns:
+        return compact
+    return None
+
+
+def load_model(model_path: str) -> Optional[str]:
+    """
+    Load the classifier at model_path into this process: the compact
+    NumPy artifact next to it when it is current, else the joblib pipeline.
+    Returns None on success, else the reason we fall back to rules only.
+    """
+    _MODELS[model_path] = None
+    # joblib/sklearn are only imported when there is no compact artifact
+    try:
+        compact = _compact_for(Path(model_path))
+        if compact is not None:
+            from compact_model import CompactModel
+
+            _MODELS[model_path] = CompactModel.load(compact)
+            return None
+        if not Path(model_path).exists():
+            raise FileNotFoundError(model_path)
+        import joblib
+
+        _MODELS[model_path] = joblib.load(model_path)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def get_model(model_path: str):
+    if model_path not in _MODELS:
+        load_model(model_path)
+    return _MODELS[model_path]
+
+
+def model_digest(model_path: str) -> str:
+    """Identity of the loaded model, for run manifests."""
+    fingerprint = getattr(get_model(model_path), "fingerprint", None)
+    return fingerprint or file_sha1(Path(model_path))
+
+
+def score_texts(clf, texts: List[str]) -> Optional[List[float]]:
+    """P(action) for a batch of texts in one pipeline call; None if scoring fails."""
+    if clf is None or not texts:
+        return None
+    try:
+        return [float(p) for p in clf.predict_proba(texts)[:, 1]]
+    except Exception:
+        return None
+
+
+class MLDetector:
+    """
+    P(action) >= threshold from the classifier at model_path, loaded once
+    per process. Batches it cannot score fall back to the rules.
+    """
+
+    def __init__(self, model_path: str, threshold: float = DEFAULT_THRESHOLD):
+        self.model_path = str(model_path)
+        self.threshold = threshold
+
+    def detect(self, batch: Batch):
+        idx = [i for i, t in enumerate(batch.texts) if t]
+        probas = score_texts(get_model(self.model_path), [batch.texts[i] for i in idx])
+        if probas is None:
+            RulesDetector().detect(batch)
+            return
+        batch.scores = [0.0] * len(batch.texts)
+        batch.is_action = [False] * len(batch.texts)
+        for i, p in zip(idx, probas):
+            batch.scores[i] = p
+            # a slightly lower threshold keeps recall reasonable
+            batch.is_action[i] = p >= self.threshold
+
+
+# Cascade: a cheap screen in front of another detector
+
+# AMI backchannels and fillers; an utterance made only of these is never an action
+BACKCHANNELS = frozenset("""
+yeah yes yep yup ok okay mm mmm mm-hmm mhm hmm hm uh uh-huh um uhm ah oh right sure
+cool alright no nope well so good great fine fair nice wow huh thanks thank you true
+""".split())
+
+# words that often carry a request or commitment without a rules trigger
+ACTION_LEXICON = frozenset("""
+need needs needed must should will 'll gonna going have has got todo action deadline task
+send sends prepare check make finish update write email mail call schedule review look
+bring remember ask fix test try sort organise organize draft book share present
+tomorrow today tonight monday tuesday wednesday thursday friday week
+""".split())
+
+_WORD_RE = re.compile(r"[a-z']+(?:-[a-z']+)*")
+
+
+class PreScreen:
+    """
+    Cheap first cascade stage: keeps an utterance if the rules have a
+    trigger in it, else only if it is more than backchannels, has at least
+    `min_words` words and, with `lexicon`, an action-ish word.
+    Utterances without a trigger come out of the pipeline as their own
+    text, so the length cut alone loses no actions while min_words <= the
+    pipeline's min_task_words.
+    """
+
+    def __init__(self, min_words: int = 4, lexicon: bool = False):
+        self.min_words = min_words
+        self.lexicon = lexicon
+
+    def keep(self, text: str) -> bool:
+        lower = text.lower()
+        if has_trigger(lower):
+            return True
+        if len(text.split()) < self.min_words:
+            return False
+        words = _WORD_RE.findall(lower)
+        if all(w in BACKCHANNELS for w in words):
+            return False
+        return not self.lexicon or any(w in ACTION_LEXICON for w in words)
+
+    def settings(self) -> dict:
+        return {"min_words": self.min_words, "lexicon": self.lexicon}
+
+
+class CascadeDetector:
+    """
+    Runs `detector` on the utterances `screen` keeps; the rest are non-actions.
+    counts["screened"] / counts["kept"] add up the utterances seen and passed on.
+    """
+
+    def __init__(self, screen: PreScreen, detector):
+        self.screen = screen
+        self.detector = detector
+        self.counts: Counter = Counter()
+
+    def detect(self, batch: Batch):
+        n = len(batch.texts)
+        with profiling.stage("screen", n):
+            idx = [i for i, t in enumerate(batch.texts) if t and self.screen.keep(t)]
+        self.counts["screened"] += n
+        self.counts["kept"] += len(idx)
+        batch.is_action = [False] * n
+        if not idx:
+            return
+        sub = Batch([batch.utterances[i] for i in idx], [batch.texts[i] for i in idx])
+        with profiling.stage("score", len(idx)):
+            self.detector.detect(sub)
+        if sub.scores is not None:
+            batch.scores = [0.0] * n
+        if sub.parsed is not None:  # the inner detector fell back to the rules
+            batch.parsed = [None] * n
+        for j, i in enumerate(idx):
+            batch.is_action[i] = sub.is_action[j]
+            if sub.scores is not None:
+                batch.scores[i] = sub.scores[j]
+            if sub.parsed is not None:
+                batch.parsed[i] = sub.parsed[j]
+
+
+# ---------------------------------------------------------------------------
+# Parse
+# ---------------------------------------------------------------------------
+
+class RulesParser:
+    """Task / deadline / addressee from the rules, for detected utterances only."""
+
+    def parse(self, batch: Batch):
+        if batch.parsed is not None:  # already done by a fused detector
+            return
+        idx = [i for i, hit in enumerate(batch.is_action) if hit]
+        batch.parsed = [None] * len(batch.texts)
+        for i, p in zip(idx, extract_many([batch.texts[i] for i in idx])):
+            batch.parsed[i] = p
+
+
+# ---------------------------------------------------------------------------
+# Assign + normalize
+# ---------------------------------------------------------------------------
+
+def choose_assignee(
+    utt: Utterance,
+    roles: Dict[str, str],
+    parsed: dict,
+    last_addr: Optional[str],
+) -> Tuple[str, str]:
+    """
+    Simple heuristic to choose who owns the action.
+    """
+    # Name explicitly extracted by the rules
+    if parsed.get("assignee_name"):
+        nm = parsed["assignee_name"]
+        if nm in roles.keys():
+            return nm, roles.get(nm, "")
+        return nm, ""
+
+    # Fallback to pronoun resolution
+    pron = resolve_pronouns(utt.text, utt.speaker, last_addr)
+    if pron["i"]:
+        return utt.speaker, roles.get(utt.speaker, "")
+    if pron["you"] and pron["you"] in roles:
+        return pron["you"], roles.get(pron["you"], "")
+
+    # Default: speaker owns it
+    return utt.speaker, roles.get(utt.speaker, "")
+
+
+class Assigner:
+    """choose_assignee plus the running "last addressed" name of one meeting."""
+
+    def __init__(self, roles: Dict[str, str]):
+        self.roles = roles
+        self.last_addressed: Optional[str] = None
+
+    def assign(self, utt: Utterance, text: str, parsed: dict) -> Tuple[str, str]:
+        assignee, role = choose_assignee(utt, self.roles, parsed, self.last_addressed)
+        # track the last addressed name (for "you" resolution)
+        toks = text.split()
+        if toks and toks[0].rstrip(",").isalpha() and toks[0].istitle():
+            self.last_addressed = toks[0].rstrip(",")
+        return assignee, role
+
+
+class DeadlineNormalizer:
+    """deadline_raw -> ISO date against a fixed reference date."""
+
+    def __init__(self, ref: date):
+        self.ref = ref
+
+    def normalize(self, deadline_raw: Optional[str]) -> Optional[str]:
+        return normalize_deadline(deadline_raw, ref=self.ref)
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+class ActionPipeline:
+    """
+    detect -> parse -> assign -> normalize for one meeting at a time.
+
+    Instances are plain picklable objects, so one can be handed to
+    map_meetings / run_incremental as the per-meeting function.
+    normalizer=None leaves deadline_iso out of the actions entirely.
+    """
+
+    def __init__(
+        self,
+        detector=None,
+        parser=None,
+        normalizer: Optional[DeadlineNormalizer] = None,
+        min_task_words: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.detector = detector if detector is not None else RulesDetector()
+        self.parser = parser if parser is not None else RulesParser()
+        self.normalizer = normalizer
+        self.min_task_words = min_task_words
+        self.batch_size = batch_size
+
+    @property
+    def counts(self) -> Optional[Counter]:
+        """The detector's counters (the cascade's), if it keeps any."""
+        return getattr(self.detector, "counts", None)
+
+    def batches(self, meeting: Meeting) -> Iterator[Batch]:
+        """Detected and parsed batches of a meeting."""
+        prof = profiling.active()
+        if prof is None:
+            for utts in batched(meeting.utterances, self.batch_size):
+                batch = Batch.of(utts)
+                self.detector.detect(batch)
+                self.parser.parse(batch)
+                yield batch
+            return
+
+        source = batched(meeting.utterances, self.batch_size)
+        while True:
+            start = perf_counter()
+            with prof.stage("load"):
+                utts = next(source, None)
+                if utts is not None:
+                    batch = Batch.of(utts)
+            if utts is None:
+                return
+            prof.utterances += len(utts)
+            with prof.stage("detect", len(utts)):
+                self.detector.detect(batch)
+            with prof.stage("parse", len(utts)):
+                self.parser.parse(batch)
+            batch.cost = perf_counter() - start
+            yield batch
+
+    def assign(
+        self,
+        meeting: str,
+        roles: Dict[str, str],
+        assigner: Assigner,
+        utt: Utterance,
+        text: str,
+        parsed: Optional[dict],
+    ) -> Optional[dict]:
+        """The action for one detected utterance, without deadline_iso; None if its task is too short."""
+        if not parsed:
+            # detector says action but the rules found no trigger
+            parsed = {"task": text, "deadline_raw": None, "assignee_name": None}
+
+        task = (parsed.get("task") or "").strip()
+        if not task or len(task.split()) < self.min_task_words:
+            return None
+
+        assignee, role = assigner.assign(utt, text, parsed)
+        return {
+            "meeting": meeting,
+            "speaker": utt.speaker,
+            "speaker_role": roles.get(utt.speaker, ""),
+            "assignee": assignee,
+            "assignee_role": role,
+            "action_item": task,
+            "deadline_text": parsed.get("deadline_raw"),
+        }
+
+    def normalize(self, action: dict):
+        if self.normalizer is not None:
+            action["deadline_iso"] = self.normalizer.normalize(action["deadline_text"])
+
+    def __call__(self, meeting: Meeting) -> List[dict]:
+        results: List[dict] = []
+        assigner = Assigner(meeting.roles)
+        prof = profiling.active()
+        for batch in self.batches(meeting):
+            if prof is not None:
+                latency = [batch.cost / len(batch.texts)] * len(batch.texts)
+                assign_s = normalize_s = 0.0
+            for i, (utt, text, hit, parsed) in enumerate(zip(batch.utterances, batch.texts, batch.is_action, batch.parsed)):
+                if not hit:
+                    continue
+                if prof is not None:
+                    t0 = perf_counter()
+                action = self.assign(meeting.name, meeting.roles, assigner, utt, text, parsed)
+                if action is None:
+                    continue
+                if prof is not None:
+                    t1 = perf_counter()
+                self.normalize(action)
+                results.append(action)
+                if prof is not None:
+                    t2 = perf_counter()
+                    assign_s += t1 - t0
+                    normalize_s += t2 - t1
+                    latency[i] += t2 - t0
+            if prof is not None:
+                prof.add("assign", assign_s, assign_s, len(batch.texts))
+                if self.normalizer is not None:
+                    prof.add("normalize", normalize_s, normalize_s, len(batch.texts))
+                prof.latency(latency)
+        return results
+
+
+def labeled_utterances(meetings: Iterable[Meeting], detector=None, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[str, int]]:
+    """(text, label) for every utterance, labeled by `detector` (weak labels from the rules by default)."""
+    detector = detector if detector is not None else RulesDetector()
+    for meeting in meetings:
+        for utts in batched(meeting.utterances, batch_size):
+            batch = Batch.of(utts)
+            with profiling.stage("detect", len(utts)):
+                detector.detect(batch)
+            if profiling.active() is not None:
+                profiling.active().utterances += len(utts)
+            for utt, hit in zip(batch.utterances, batch.is_action):
+                yield utt.text, int(hit)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import PROFILE_DIR
+
+#Per-stage profiling for the entry points (--profile)
+#
+# Stages call `stage(name, items)` (or `add`) on the active profiler; when
+# profiling is off `active()` is None and the hot paths skip all timing.
+# The report records wall/CPU seconds, calls, items and items/sec per
+# stage, per-utterance latency percentiles and the tracemalloc peak, and
+# is written to logs/profiles/<entry>.json. `dump` adds either a cProfile
+# file (<entry>.prof, open with snakeviz / pstats) or a sampled flamegraph
+# in collapsed-stack format (<entry>.collapsed, for flamegraph.pl or
+# speedscope). Worker processes ship their stage stats back through
+# map_meetings; cProfile and the sampler only see the main process.
+
+DUMPS = ("cprofile", "flame")
+
+_ACTIVE: Optional["Profiler"] = None
+
+
+def active() -> Optional["Profiler"]:
+    return _ACTIVE
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, round(q / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+class Profiler:
+    """Accumulates per-stage wall/CPU time, item counts and utterance latencies."""
+
+    def __init__(self):
+        # name -> [wall s, cpu s, calls, items], in first-seen order
+        self.stages: Dict[str, List[float]] = {}
+        self.latencies = array("d")
+        self.utterances = 0
+        self.worker_peak = 0
+        self.extra: dict = {}  # merged into the report as-is
+
+    def add(self, name: str, wall: float, cpu: float = 0.0, items: int = 0):
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = [0.0, 0.0, 0, 0]
+        s[0] += wall
+        s[1] += cpu
+        s[2] += 1
+        s[3] += items
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[None]:
+        w, c = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - w, time.process_time() - c, items)
+
+    def latency(self, values):
+        """Per-utterance latencies in seconds."""
+        self.latencies.extend(values)
+
+    def drain(self) -> dict:
+        """Picklable snapshot of everything recorded so far, then reset."""
+        import tracemalloc
+
+        snap = {"stages": self.stages, "latencies": self.latencies, "utterances": self.utterances,
+                "peak": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0}
+        self.stages, self.latencies, self.utterances = {}, array("d"), 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        return snap
+
+    def merge(self, snap: dict):
+        for name, (wall, cpu, calls, items) in snap["stages"].items():
+            s = self.stages.setdefault(name, [0.0, 0.0, 0, 0])
+            s[0] += wall
+            s[1] += cpu
+            s[2] += calls
+            s[3] += items
+        self.latencies.extend(snap["latencies"])
+        self.utterances += snap["utterances"]
+        self.worker_peak = max(self.worker_peak, snap["peak"])
+
+    def report(self, entry: str, wall: float, cpu: float, peak_bytes: int) -> dict:
+        lat = sorted(self.latencies)
+        stages = {}
+        for name, (s_wall, s_cpu, calls, items) in self.stages.items():
+            stages[name] = {
+                "wall_s": round(s_wall, 6),
+                "cpu_s": round(s_cpu, 6),
+                "calls": int(calls),
+                "items": int(items),
+                "items_per_s": round(items / s_wall, 1) if s_wall > 0 and items else None,
+                "share": round(s_wall / wall, 4) if wall > 0 else None,
+            }
+        latency = {f"p{q}": round(percentile(lat, q) * 1e6, 2) for q in (50, 90, 99)}
+        latency["max"] = round(lat[-1] * 1e6, 2) if lat else 0.0
+        return {
+            "entry": entry,
+            "pid": os.getpid(),
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "utterances": self.utterances,
+            "utterances_per_s": round(self.utterances / wall, 1) if wall > 0 and self.utterances else None,
+            "latency_us": latency,
+            "peak_mem_mb": round(peak_bytes / 2**20, 2),
+            "worker_peak_mem_mb": round(self.worker_peak / 2**20, 2),
+            "stages": stages,
+            **self.extra,
+        }
+
+
+def stage(name: str, items: int = 0):
+    """Time a block under the active profiler (no-op when profiling is off)."""
+    prof = _ACTIVE
+    if prof is None:
+        return _NULL
+    return prof.stage(name, items)
+
+
+class _Null:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+class Sampler:
+    """Samples the main thread's stack every `interval` s into collapsed stacks."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._ident = threading.main_thread().ident
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, out_path: Path):
+        self._stop.set()
+        self._thread.join()
+        with out_path.open("w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def enable_in_worker():
+    """Turn on stage recording in a pool worker (no report, no tracemalloc peak dump)."""
+    global _ACTIVE
+    if _ACTIVE is None:
+        import tracemalloc
+
+        _ACTIVE = Profiler()
+        tracemalloc.start()
+
+
+@contextmanager
+def session(entry: str, enabled: bool, dump: Optional[str] = None, out_dir: Path = PROFILE_DIR) -> Iterator[Optional[Profiler]]:
+    """
+    Profile the enclosed run of `entry` when enabled and write the report
+    (plus the optional cProfile / flamegraph dump) to out_dir.
+    """
+    global _ACTIVE
+    if not enabled:
+        yield None
+        return
+    if dump is not None and dump not in DUMPS:
+        raise ValueError(f"Unknown profile dump {dump!r}, expected one of {DUMPS}")
+    import tracemalloc
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prof = _ACTIVE = Profiler()
+    cprof = sampler = None
+    if dump == "cprofile":
+        import cProfile
+
+        cprof = cProfile.Profile()
+    elif dump == "flame":
+        sampler = Sampler()
+
+    tracemalloc.start()
+    w, c = time.perf_counter(), time.process_time()
+    if cprof is not None:
+        cprof.enable()
+    if sampler is not None:
+        sampler.start()
+    try:
+        yield prof
+    finally:
+        if cprof is not None:
+            cprof.disable()
+        wall, cpu = time.perf_counter() - w, time.process_time() - c
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        _ACTIVE = None
+        report_path = out_dir / f"{entry}.json"
+        report_path.write_text(json.dumps(prof.report(entry, wall, cpu, peak), indent=2), encoding="utf-8")
+        print(f"[profile] {entry}: {wall:.2f}s wall, report -> {report_path}")
+        if cprof is not None:
+            cprof.dump_stats(str(out_dir / f"{entry}.prof"))
+            print(f"[profile] cProfile stats -> {out_dir / f'{entry}.prof'}")
+        if sampler is not None:
+            sampler.stop(out_dir / f"{entry}.collapsed")
+            print(f"[profile] flamegraph stacks -> {out_dir / f'{entry}.collapsed'}")
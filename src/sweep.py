@@ -0,0 +1,320 @@
+from __future__ import annotations
+import hashlib
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import typer
+from rich import print
+
+from config import RAW_DIR, INTERIM_DIR, LOGS_DIR, DEFAULT_MODEL_PATH
+from action_io import find_actions_file, iter_actions
+from action_rules import rules_fingerprint
+from corpus_cache import iter_meetings, meeting_digests
+from evaluate import GOLD, features, normalize
+from incremental import stage_version
+from infer_ml import MIN_TASK_WORDS
+from pipeline import Batch, RulesDetector, DEFAULT_BATCH_SIZE, DEFAULT_THRESHOLD, batched, get_model, load_model, model_digest, score_texts
+from utils import atomic_open, file_sha1
+
+#Threshold sweep and PR curves from cached scores (python src/sweep.py)
+#
+# One pass over the corpus records, per utterance:
+#   ml      P(action) from the model (NaN when no model could be loaded)
+#   rules   whether the rules find an action
+#   words   length of the task the pipeline would emit for it
+#   gold    whether a gold action was said in it
+# in data/interim/scores/<key>.npz, keyed by the corpus, gold file, model,
+# rules and code. Gold actions are placed on the utterance of the same
+# meeting (and speaker, if the gold has one) that contains most of the
+# action's content words, one utterance per action.
+#
+# Later runs with the same inputs skip straight to the sweep: each curve is
+# one argsort plus cumulative sums, so P/R/F1 at every distinct score (and
+# at any grid of thresholds, by searchsorted) costs about one sort. Curves
+# cover the rules (a single point, as extract.py emits them), the ML
+# detector (as infer_ml emits it, after --min-task-words) and rules | ML.
+# The numbers are utterance-level detection metrics; evaluate.py scores
+# one chosen run's actions end to end.
+
+SCORES_DIR = INTERIM_DIR / "scores"
+KEEP = 5  # cached score files kept
+MATCH = 0.5  # share of a gold action's content words the utterance must contain
+
+app = typer.Typer()
+
+
+def _gold_index(gold_file: Optional[Path]) -> Dict[str, Dict[str, List[frozenset]]]:
+    """meeting -> speaker ("" = any) -> content words of each gold action."""
+    index: Dict[str, Dict[str, List[frozenset]]] = defaultdict(lambda: defaultdict(list))
+    if gold_file is not None:
+        for a in iter_actions(gold_file):
+            index[a.get("meeting") or ""][normalize(a.get("speaker") or "")].append(features(a.get("action_item")))
+    return index
+
+
+def gold_labels(speakers: List[str], texts: List[str], golds: Dict[str, List[frozenset]], match: float = MATCH) -> Tuple[np.ndarray, int]:
+    """
+    Which utterances of one meeting carry a gold action, and how many gold
+    actions found no utterance. Best containment wins, one utterance per action.
+    """
+    labels = np.zeros(len(texts), dtype=bool)
+    pairs = []
+    for speaker, actions in golds.items():
+        index: Dict[str, List[int]] = defaultdict(list)
+        for j, g in enumerate(actions):
+            for f in g:
+                index[f].append(j)
+        for i, (s, text) in enumerate(zip(speakers, texts)):
+            if speaker and normalize(s) != speaker:
+                continue
+            shared: Dict[int, int] = defaultdict(int)
+            for f in features(text):
+                for j in index.get(f, ()):
+                    shared[j] += 1
+            for j, n in shared.items():
+                c = n / len(actions[j])
+                if c >= match:
+                    pairs.append((-c, i, speaker, j))
+    used_u, used_g = set(), set()
+    for _, i, speaker, j in sorted(pairs):
+        if i not in used_u and (speaker, j) not in used_g:
+            used_u.add(i)
+            used_g.add((speaker, j))
+            labels[i] = True
+    return labels, sum(len(a) for a in golds.values()) - len(used_g)
+
+
+def score_corpus(input_dir: Path, model_path: str, gold_file: Optional[Path], use_cache: bool = True,
+                 batch_size: int = DEFAULT_BATCH_SIZE, match: float = MATCH) -> Dict[str, np.ndarray]:
+    """The per-utterance arrays described above, in corpus order."""
+    clf = get_model(model_path)
+    gold = _gold_index(gold_file)
+    ml: List[np.ndarray] = []
+    rules: List[np.ndarray] = []
+    words: List[np.ndarray] = []
+    labels: List[np.ndarray] = []
+    unmatched = 0
+    for meeting in iter_meetings(input_dir, use_cache=use_cache):
+        speakers: List[str] = []
+        texts: List[str] = []
+        for utts in batched(meeting.utterances, batch_size):
+            batch = Batch.of(utts)
+            RulesDetector().detect(batch)
+            # same inputs as MLDetector: empty texts are not scored
+            idx = [i for i, t in enumerate(batch.texts) if t]
+            scores = np.full(len(utts), np.nan if clf is None else 0.0)
+            probas = score_texts(clf, [batch.texts[i] for i in idx])
+            if probas is not None:
+                scores[idx] = probas
+            ml.append(scores)
+            rules.append(np.array(batch.is_action, dtype=bool))
+            # what the pipeline keeps as the task: the parsed one, else the whole text
+            words.append(np.array([len(((p.get("task") or "") if p else t).split())
+                                   for p, t in zip(batch.parsed, batch.texts)], dtype=np.int32))
+            speakers.extend(u.speaker for u in utts)
+            texts.extend(batch.texts)
+        lab, missed = gold_labels(speakers, texts, gold.pop(meeting.name, {}), match)
+        labels.append(lab)
+        unmatched += missed
+    # gold actions of meetings that are not in the corpus
+    unmatched += sum(len(a) for g in gold.values() for a in g.values())
+
+    def cat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    return {"ml": cat(ml, np.float64), "rules": cat(rules, bool), "words": cat(words, np.int32),
+            "gold": cat(labels, bool), "unmatched": np.array(unmatched)}
+
+
+def cache_key(input_dir: Path, model_path: str, model_ok: bool, gold_file: Optional[Path], use_cache: bool, match: float) -> str:
+    digests = meeting_digests(input_dir, use_cache=use_cache)
+    version = stage_version(
+        ["sweep", "pipeline", "evaluate"],
+        corpus=hashlib.sha1(json.dumps(sorted(digests.items())).encode("utf-8")).hexdigest(),
+        gold=file_sha1(gold_file) if gold_file is not None else None,
+        model=model_digest(model_path) if model_ok else None,
+        rules=rules_fingerprint(),
+        match=match,
+    )
+    return hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+
+
+def load_scores(path: Path) -> Optional[Dict[str, np.ndarray]]:
+    try:
+        with np.load(path) as f:
+            return {k: f[k] for k in f.files}
+    except (OSError, ValueError):
+        return None
+
+
+def save_scores(path: Path, arrays: Dict[str, np.ndarray]):
+    with atomic_open(path, "wb") as f:
+        np.savez(f, **arrays)
+    old = sorted(path.parent.glob("*.npz"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for p in old[KEEP:]:
+        p.unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------------------------
+
+def emitted_scores(arrays: Dict[str, np.ndarray], min_task_words: int = MIN_TASK_WORDS) -> np.ndarray:
+    """ML scores of the utterances infer_ml would turn into actions above a threshold (NaN: never)."""
+    return np.where(arrays["words"] >= max(min_task_words, 1), arrays["ml"], np.nan)
+
+
+class Curve:
+    """
+    P/R/F1 of `base | (score >= t)` for every threshold t, from one sort.
+    Utterances with a NaN score are only predicted through `base`.
+    """
+
+    def __init__(self, scores: np.ndarray, gold: np.ndarray, positives: int, base: Optional[np.ndarray] = None):
+        base = np.zeros(gold.size, dtype=bool) if base is None else base
+        self.positives = positives
+        self.base_tp = int(np.count_nonzero(base & gold))
+        self.base_fp = int(np.count_nonzero(base & ~gold))
+        rest = ~base & ~np.isnan(scores)
+        order = np.argsort(-scores[rest], kind="stable")
+        self.desc = scores[rest][order]
+        hit = gold[rest][order]
+        # tp / fp among the k highest scores, k = 0..n
+        self.cum_tp = np.concatenate([[0], np.cumsum(hit)])
+        self.cum_fp = np.arange(self.cum_tp.size) - self.cum_tp
+
+    def _metrics(self, k: np.ndarray) -> Dict[str, np.ndarray]:
+        tp = self.base_tp + self.cum_tp[k]
+        fp = self.base_fp + self.cum_fp[k]
+        precision = np.divide(tp, tp + fp, out=np.zeros(k.size), where=tp + fp > 0)
+        recall = tp / self.positives if self.positives else np.zeros(k.size)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(k.size), where=precision + recall > 0)
+        return {"tp": tp, "fp": fp, "precision": precision, "recall": recall, "f1": f1}
+
+    def at(self, thresholds: np.ndarray) -> Dict[str, np.ndarray]:
+        """Metrics at each threshold (predict score >= t)."""
+        k = np.searchsorted(-self.desc, -np.asarray(thresholds, dtype=self.desc.dtype), side="right")
+        return {"threshold": np.asarray(thresholds), **self._metrics(k)}
+
+    def full(self) -> Dict[str, np.ndarray]:
+        """Metrics at every distinct score, highest first."""
+        if not self.desc.size:
+            k = np.zeros(0, dtype=np.int64)
+        else:
+            # k = how many scores are >= each distinct score
+            k = np.concatenate([np.flatnonzero(np.diff(self.desc)), [self.desc.size - 1]]) + 1
+        return {"threshold": self.desc[k - 1], **self._metrics(k)}
+
+    def best(self) -> Optional[dict]:
+        """The operating point with the highest F1 (the highest threshold among ties)."""
+        m = self.full()
+        if not m["f1"].size:
+            return None
+        # equal F1s can differ in the last bit (tp/fp pairs in the same ratio)
+        i = int(np.flatnonzero(m["f1"] >= m["f1"].max() - 1e-12)[0])
+        return {key: float(v[i]) if key in ("threshold", "precision", "recall", "f1") else int(v[i]) for key, v in m.items()}
+
+    def average_precision(self) -> float:
+        """Area under the step PR curve, the always-predicted base included."""
+        base = point(self.base_tp, self.base_fp, self.positives)
+        m = self.full()
+        steps = np.diff(np.concatenate([[base["recall"]], m["recall"]]))
+        return float(base["precision"] * base["recall"] + np.sum(steps * m["precision"]))
+
+
+def point(tp: int, fp: int, positives: int, threshold: Optional[float] = None) -> dict:
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / positives if positives else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"threshold": threshold, "tp": tp, "fp": fp, "precision": precision, "recall": recall, "f1": f1}
+
+
+def _row(name: str, p: Optional[dict], ap: Optional[float] = None):
+    if p is None:
+        print(f"{name:18}{'-':>10}")
+        return
+    t = "-" if p["threshold"] is None else f"{p['threshold']:.4f}"
+    ap_s = "-" if ap is None else f"{ap:.3f}"
+    print(f"{name:18}{t:>10}{p['precision']:8.3f}{p['recall']:8.3f}{p['f1']:8.3f}{ap_s:>8}")
+
+
+@app.command()
+def main(
+    input_dir: str = typer.Option(str(RAW_DIR), "--input-dir", "--input_dir"),
+    gold_path: str = typer.Option(str(GOLD), "--gold", help="Gold actions (.json/.jsonl/.parquet)"),
+    model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
+    corpus_cache: bool = typer.Option(True, "--corpus-cache/--no-corpus-cache"),
+    min_task_words: int = typer.Option(MIN_TASK_WORDS, "--min-task-words", "--min_task_words", help="As in infer_ml"),
+    threshold: float = typer.Option(DEFAULT_THRESHOLD, "--threshold", help="Current ML threshold, reported for reference"),
+    points: int = typer.Option(1001, "--points", help="Evenly spaced thresholds in [0, 1] saved per curve"),
+    match: float = typer.Option(MATCH, "--match", help="Share of a gold action's content words an utterance must contain"),
+    batch_size: int = typer.Option(DEFAULT_BATCH_SIZE, "--batch-size", "--batch_size"),
+    rescore: bool = typer.Option(False, "--rescore", help="Ignore cached scores"),
+    out: str = typer.Option(str(LOGS_DIR / "sweep.json"), "--out", help="JSON report with the curves"),
+):
+    """Score the corpus once, then P/R/F1 at every threshold for rules, ML and rules | ML."""
+    gold_file = find_actions_file(Path(gold_path))
+    if gold_file is None:
+        print("[yellow]Missing gold. Create data/processed/gold.json first (e.g. synth.py --gold).[/yellow]")
+        raise typer.Exit(code=1)
+    err = load_model(model_path)
+    if err is not None:
+        print(f"[yellow]Model not loaded ({err}). Only the rules are swept.[/yellow]")
+
+    key = cache_key(Path(input_dir), model_path, err is None, gold_file, corpus_cache, match)
+    path = SCORES_DIR / f"{key}.npz"
+    arrays = None if rescore else load_scores(path)
+    if arrays is None:
+        start = time.perf_counter()
+        arrays = score_corpus(Path(input_dir), model_path, gold_file, corpus_cache, batch_size, match)
+        save_scores(path, arrays)
+        print(f"[cyan]Scored {arrays['gold'].size} utterances in {time.perf_counter() - start:.1f}s -> {path}[/cyan]")
+    else:
+        print(f"[cyan]Using cached scores for {arrays['gold'].size} utterances ({path})[/cyan]")
+
+    ml, gold, words = arrays["ml"], arrays["gold"], arrays["words"]
+    positives = int(np.count_nonzero(gold)) + int(arrays["unmatched"])
+    if not positives:
+        print("[yellow]No gold action matched an utterance; check --gold and --input-dir.[/yellow]")
+        raise typer.Exit(code=1)
+    # extract.py keeps every parsed rules action with a task
+    rules = arrays["rules"] & (words >= 1)
+    emitted = emitted_scores(arrays, min_task_words)
+
+    start = time.perf_counter()
+    grid = np.linspace(0.0, 1.0, points)
+    rules_point = point(int(np.count_nonzero(rules & gold)), int(np.count_nonzero(rules & ~gold)), positives)
+    curves: Dict[str, Curve] = {}
+    if not np.isnan(ml).all():
+        curves["ml"] = Curve(emitted, gold, positives)
+        curves["rules|ml"] = Curve(emitted, gold, positives, base=rules)
+    report_curves = {name: {k: v.tolist() for k, v in c.at(grid).items()} for name, c in curves.items()}
+    best = {name: c.best() for name, c in curves.items()}
+    ap = {name: c.average_precision() for name, c in curves.items()}
+    elapsed = time.perf_counter() - start
+
+    print(f"Utterances: {gold.size}  gold actions: {positives} ({int(arrays['unmatched'])} not placed on an utterance)")
+    print(f"{'':18}{'threshold':>10}{'P':>8}{'R':>8}{'F1':>8}{'AP':>8}")
+    _row("rules", rules_point)
+    for name, c in curves.items():
+        now = {k: float(v[0]) if k in ("threshold", "precision", "recall", "f1") else int(v[0])
+               for k, v in c.at(np.array([threshold])).items()}
+        _row(f"{name} @ current", now)
+        _row(f"{name} best", best[name], ap[name])
+    print(f"[cyan]Sweep: {len(curves)} curves x {points} thresholds (+ every distinct score) in {elapsed * 1000:.1f} ms[/cyan]")
+
+    out_path = Path(out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    report = {"input_dir": str(input_dir), "gold": str(gold_file), "model": model_path if err is None else None,
+              "utterances": int(gold.size), "positives": positives, "min_task_words": min_task_words,
+              "rules": rules_point, "best": best, "average_precision": ap, "curves": report_curves}
+    out_path.write_text(json.dumps(report), encoding="utf-8")
+    print(f"[green]Report -> {out_path}[/green]")
+
+
+if __name__ == "__main__":
+    app()
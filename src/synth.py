@@ -0,0 +1,263 @@
+from __future__ import annotations
+import csv
+import random
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import typer
+from rich import print
+
+from action_io import open_sink
+
+#Deterministic synthetic AMI-style corpus
+#
+# Writes `SPEAKER: text` transcripts (optionally with `[start-end]` timings)
+# plus a roles.csv with a meeting column, at any size from a handful of
+# utterances to millions. Each meeting has four named participants in the
+# AMI roles; utterances mix backchannels, design talk and action items
+# addressed by name or pronoun, with deadline phrases and disfluencies
+# ("um", repeats, restarts) at controllable rates. The planted action items
+# can be written as a gold file (same fields as actions.json) for
+# evaluation. Everything is driven by one seed, so the same arguments give
+# byte-identical output.
+
+app = typer.Typer()
+
+AMI_ROLE_NAMES = ["Project Manager", "Industrial Designer", "User Interface", "Marketing Expert"]
+
+NAMES = ["Anna", "John", "Sarah", "Mike", "Laura", "David", "Emma", "James", "Sofia", "Peter",
+         "Maria", "Tom", "Julia", "Mark", "Nina", "Paul", "Clara", "Alex", "Ruth", "Ben"]
+
+BACKCHANNELS = ["Yeah.", "Okay.", "Mm-hmm.", "Right.", "Uh-huh.", "Sure.", "Yep.", "Hmm.", "Okay, yeah.", "Cool."]
+
+TOPICS = ["the remote control", "the battery", "the button layout", "the casing", "the scroll wheel",
+          "the LCD screen", "the voice recognition", "the kinetic battery", "the rubber material",
+          "the colour scheme", "the target group", "the production cost", "the logo", "the prototype"]
+
+STATEMENTS = [
+    "I think {topic} is too expensive",
+    "so {topic} could be a bit smaller",
+    "well {topic} was the main point from the survey",
+    "I'm not sure about {topic} to be honest",
+    "the younger users really liked {topic}",
+    "we talked about {topic} last time",
+    "{topic} should look fancy but still be simple",
+    "the problem with {topic} is the weight",
+    "maybe we can drop {topic} altogether",
+    "according to the market research {topic} matters a lot",
+]
+
+VERBS = ["send", "update", "finalize", "draft", "review", "check", "prepare", "email", "share", "look into"]
+OBJECTS = ["the report", "the budget sheet", "the design document", "the meeting notes", "the cost figures",
+           "the user survey", "the prototype drawings", "the slides", "the component list", "the evaluation criteria"]
+
+# deadline phrases the rules pick up, from easy to awkward
+DEADLINES = ["by Friday", "tomorrow", "today", "by next Tuesday", "within 2 days", "within a week",
+             "in the next two days", "by end of the week", "by Monday morning", "next week", "by EOD",
+             "tonight", "next meeting", "by the end of the month"]
+
+# (template, who owns it): "name" = the addressed participant, "speaker" = the one talking
+ACTION_TEMPLATES: List[Tuple[str, str]] = [
+    ("{name}, can you {verb} {obj}{deadline}?", "name"),
+    ("{name} can you {verb} {obj}{deadline}?", "name"),
+    ("Can you, {name}, {verb} {obj}{deadline}?", "name"),
+    ("{name}, please {verb} {obj}{deadline}.", "name"),
+    ("I will {verb} {obj}{deadline}.", "speaker"),
+    ("Okay so I will {verb} {obj}{deadline}.", "speaker"),
+    ("We need to {verb} {obj}{deadline}.", "speaker"),
+    ("Let's {verb} {obj}{deadline}.", "speaker"),
+    ("{name}, could you {verb} {obj}{deadline}?", "name"),
+    ("I think we should {verb} {obj}{deadline}.", "speaker"),
+]
+
+FILLERS = ["um", "uh", "you know", "like", "I mean"]
+
+
+def _disfluent(rng: random.Random, text: str, rate: float) -> str:
+    """Insert fillers, a repeated word or a restart into roughly `rate` of utterances."""
+    if rng.random() >= rate:
+        return text
+    words = text.split(" ")
+    kind = rng.random()
+    i = rng.randrange(len(words))
+    if kind < 0.5:
+        words.insert(i, rng.choice(FILLERS))
+    elif kind < 0.8:
+        words.insert(i, words[i])
+    else:
+        words = ["I", "mean", "uh,"] + words if i == 0 else words[:i] + ["-", "I", "mean"] + words[i:]
+    return " ".join(words)
+
+
+def _action(rng: random.Random, speaker: str, others: List[str], deadline_rate: float) -> Tuple[str, str, Optional[str], str]:
+    """(utterance, assignee, deadline phrase, task) for one planted action item."""
+    template, owner = rng.choice(ACTION_TEMPLATES)
+    name = rng.choice(others)
+    deadline = rng.choice(DEADLINES) if rng.random() < deadline_rate else None
+    verb, obj = rng.choice(VERBS), rng.choice(OBJECTS)
+    text = template.format(name=name, verb=verb, obj=obj, deadline=f" {deadline}" if deadline else "")
+    return text, name if owner == "name" else speaker, deadline, f"{verb} {obj}"
+
+
+def iter_synthetic_meeting(
+    rng: random.Random,
+    name: str,
+    participants: List[str],
+    utterances: int,
+    action_rate: float = 0.08,
+    deadline_rate: float = 0.6,
+    disfluency_rate: float = 0.15,
+) -> Iterator[Tuple[str, str, float, float, Optional[dict]]]:
+    """(speaker, text, start, end, gold action or None) for one meeting."""
+    t = rng.uniform(0.0, 3.0)
+    speaker = rng.choice(participants)
+    for _ in range(utterances):
+        # AMI turns: the same speaker often keeps the floor
+        if rng.random() < 0.6:
+            speaker = rng.choice(participants)
+        others = [p for p in participants if p != speaker]
+        gold = None
+        r = rng.random()
+        if r < action_rate:
+            text, assignee, deadline, task = _action(rng, speaker, others, deadline_rate)
+            gold = {"meeting": name, "speaker": speaker, "assignee": assignee,
+                    "action_item": task, "deadline_text": deadline}
+        elif r < action_rate + 0.35:
+            text = rng.choice(BACKCHANNELS)
+        else:
+            text = rng.choice(STATEMENTS).format(topic=rng.choice(TOPICS))
+            text = text[0].upper() + text[1:] + rng.choice([".", ".", "?", "..."])
+        text = _disfluent(rng, text, disfluency_rate)
+        dur = 0.4 + 0.28 * text.count(" ")
+        yield speaker, text, t, t + dur, gold
+        t += dur + rng.uniform(0.05, 1.5)
+
+
+def synthetic_texts(n: int, action_rate: float = 0.3, seed: int = 0) -> List[str]:
+    """n utterance texts from one long synthetic meeting (no files)."""
+    rng = random.Random(seed)
+    participants = rng.sample(NAMES, 4)
+    return [text for _, text, _, _, _ in iter_synthetic_meeting(rng, "synth", participants, n, action_rate=action_rate)]
+
+
+def generate_corpus(
+    out_dir: Path,
+    utterances: int = 10_000,
+    per_meeting: int = 500,
+    action_rate: float = 0.08,
+    deadline_rate: float = 0.6,
+    disfluency_rate: float = 0.15,
+    timings: bool = False,
+    seed: int = 0,
+    gold_path: Optional[Path] = None,
+) -> dict:
+    """
+    Write ceil(utterances / per_meeting) transcripts plus roles.csv to
+    out_dir (and the planted actions to gold_path). Transcripts and gold
+    are streamed meeting by meeting.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    meetings = max(1, -(-utterances // per_meeting))
+    width = max(4, len(str(meetings - 1)))
+    stats = {"meetings": 0, "utterances": 0, "actions": 0}
+    roles_rows = []
+    gold = open_sink(gold_path) if gold_path else None
+    try:
+        remaining = utterances
+        for m in range(meetings):
+            name = f"SY{m:0{width}d}"
+            participants = rng.sample(NAMES, 4)
+            roles_rows += [(p, role, name) for p, role in zip(participants, AMI_ROLE_NAMES)]
+            n = min(per_meeting, remaining)
+            remaining -= n
+            actions = []
+            with (out_dir / f"{name}.txt").open("w", encoding="utf-8") as f:
+                for spk, text, start, end, g in iter_synthetic_meeting(
+                    rng, name, participants, n, action_rate, deadline_rate, disfluency_rate
+                ):
+                    if timings:
+                        f.write(f"[{start:.2f}-{end:.2f}] ")
+                    f.write(f"{spk}: {text}\n")
+                    if g is not None:
+                        actions.append(g)
+            if gold is not None:
+                gold.write(actions)
+            stats["meetings"] += 1
+            stats["utterances"] += n
+            stats["actions"] += len(actions)
+    except BaseException:
+        if gold is not None:
+            gold.abort()
+        raise
+    if gold is not None:
+        gold.close()
+    with (out_dir / "roles.csv").open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["speaker", "role", "meeting"])
+        w.writerows(roles_rows)
+    return stats
+
+
+def write_synthetic_nxt(root: Path, meetings: int, words_per_speaker: int, seed: int = 0):
+    """AMI-shaped NXT tree (words, segments, meetings.xml) for benchmarking."""
+    rng = random.Random(seed)
+    vocab = ["okay", "so", "we", "need", "to", "the", "remote", "um", "can", "you", "send", "design",
+             "by", "Friday", "yeah", "I", "think", "battery", "button", "should", "be", "yellow"]
+    (root / "words").mkdir(parents=True, exist_ok=True)
+    (root / "segments").mkdir(parents=True, exist_ok=True)
+    (root / "corpusResources").mkdir(parents=True, exist_ok=True)
+    meta = ['<?xml version="1.0"?>\n<nite:root xmlns:nite="http://nite.sourceforge.net/">']
+    for m in range(meetings):
+        name = f"SY{m:04d}a"
+        meta.append(f'<meeting observation="{name}">')
+        for agent, role in zip("ABCD", ("PM", "ID", "UI", "ME")):
+            meta.append(f'<speaker nxt_agent="{agent}" role="{role}"/>')
+            t = rng.uniform(0, 5)
+            words = [f'<?xml version="1.0"?>\n<nite:root xmlns:nite="http://nite.sourceforge.net/">']
+            segs = [f'<?xml version="1.0"?>\n<nite:root xmlns:nite="http://nite.sourceforge.net/">']
+            i = 0
+            while i < words_per_speaker:
+                n = min(rng.randint(2, 18), words_per_speaker - i)
+                seg_start = t
+                for j in range(n):
+                    words.append(f'<w nite:id="{name}.{agent}.words{i + j}" starttime="{t:.2f}" endtime="{t + 0.3:.2f}">{rng.choice(vocab)}</w>')
+                    t += 0.35
+                words.append(f'<w nite:id="{name}.{agent}.words{i + n}" punc="true" starttime="{t:.2f}" endtime="{t:.2f}">.</w>')
+                href = f"{name}.{agent}.words.xml#id({name}.{agent}.words{i})..id({name}.{agent}.words{i + n})"
+                segs.append(f'<segment starttime="{seg_start:.2f}" endtime="{t:.2f}"><nite:child href="{href}"/></segment>')
+                i += n + 1
+                t += rng.uniform(0.5, 8.0)
+            words.append("</nite:root>")
+            segs.append("</nite:root>")
+            (root / "words" / f"{name}.{agent}.words.xml").write_text("\n".join(words), encoding="utf-8")
+            (root / "segments" / f"{name}.{agent}.segments.xml").write_text("\n".join(segs), encoding="utf-8")
+        meta.append("</meeting>")
+    meta.append("</nite:root>")
+    (root / "corpusResources" / "meetings.xml").write_text("\n".join(meta), encoding="utf-8")
+
+
+@app.command()
+def main(
+    out_dir: str = typer.Option(..., "--out-dir", "--out_dir"),
+    utterances: int = typer.Option(10_000, "--utterances", help="Total utterances (10 .. 1,000,000+)."),
+    per_meeting: int = typer.Option(500, "--per-meeting", "--per_meeting"),
+    action_rate: float = typer.Option(0.08, "--action-rate", "--action_rate"),
+    deadline_rate: float = typer.Option(0.6, "--deadline-rate", "--deadline_rate", help="Share of actions with a deadline."),
+    disfluency_rate: float = typer.Option(0.15, "--disfluency-rate", "--disfluency_rate"),
+    timings: bool = typer.Option(False, "--timings", help="Prefix lines with start-end timings in seconds."),
+    seed: int = typer.Option(0, "--seed"),
+    gold: Optional[str] = typer.Option(None, "--gold", help="Also write the planted actions (e.g. gold.json)."),
+):
+    """Write a deterministic AMI-style corpus (transcripts + roles.csv)."""
+    stats = generate_corpus(
+        Path(out_dir), utterances, per_meeting, action_rate, deadline_rate, disfluency_rate,
+        timings, seed, Path(gold) if gold else None,
+    )
+    print(f"[green]Wrote {stats['meetings']} meetings, {stats['utterances']:,} utterances "
+          f"({stats['actions']:,} planted actions) -> {out_dir}")
+
+
+if __name__ == "__main__":
+    app()
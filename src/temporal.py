@@ -1,25 +1,133 @@
 from __future__ import annotations
-from datetime import datetime
-from typing import Optional
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Union
 
-import dateparser
+# Phrases produced by action_rules.DEADLINE_PATTERNS are resolved here
+# directly; dateparser is only used for whatever these rules cannot handle.
 
+_WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
 
-def normalize_deadline(raw: Optional[str], ref: datetime) -> Optional[str]:
+_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "couple of": 2,
+    "few": 3, "a few": 3, "a couple of": 2,
+}
+
+_UNIT_DAYS = {"day": 1, "days": 1, "week": 7, "weeks": 7}
+
+_SAME_DAY = {
+    "today", "tonight", "eod", "end of day", "end of the day", "end of today",
+    "close of business", "cob", "this afternoon", "this evening",
+}
+
+_END_OF_WEEK = {"end of the week", "end of week", "end of this week", "eow"}
+
+_PREFIX_RE = re.compile(r"^(?:by|before|until|till|on)\s+")
+_PART_OF_DAY_RE = re.compile(r"\s+(?:morning|afternoon|evening|night|eod)$")
+_RELATIVE_RE = re.compile(
+    r"^(?:within|in the next|in|over the next)\s+(\d+|[a-z]+(?: [a-z]+)?(?: of)?)\s+(days?|weeks?)$"
+)
+
+
+def normalize_phrase(raw: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return " ".join(raw.lower().split()).strip(" .,!?;:")
+
+
+def _next_weekday(ref: date, weekday: int) -> date:
+    # same weekday means next week, as dateparser does with "future"
+    days_ahead = (weekday - ref.weekday()) % 7 or 7
+    return ref + timedelta(days=days_ahead)
+
+
+def _resolve_builtin(phrase: str, ref: date) -> Optional[date]:
     """
-    Convert vague deadlines like 'Friday', 'next week', 'tomorrow'
-    into ISO date strings (YYYY-MM-DD) relative to ref.
+    Resolve the relative phrases our rules actually produce.
+    Returns None when the phrase is not one of them.
     """
-    if not raw:
-        return None
+    phrase = _PREFIX_RE.sub("", phrase)
+    if phrase.startswith("the end of"):
+        phrase = phrase[4:]
+    phrase = _PART_OF_DAY_RE.sub("", phrase)
+
+    if phrase in _SAME_DAY:
+        return ref
+    if phrase == "tomorrow":
+        return ref + timedelta(days=1)
+    if phrase in _END_OF_WEEK:
+        return ref + timedelta(days=(4 - ref.weekday()) % 7)
+    if phrase == "next week":
+        return ref + timedelta(days=7)
+
+    words = phrase.split(" ")
+    if len(words) == 2 and words[0] in ("next", "this", "coming"):
+        words = words[1:]
+    if len(words) == 1 and words[0] in _WEEKDAYS:
+        return _next_weekday(ref, _WEEKDAYS[words[0]])
+
+    m = _RELATIVE_RE.match(phrase)
+    if m:
+        qty = m.group(1)
+        n = int(qty) if qty.isdigit() else _NUMBERS.get(qty)
+        if n is not None:
+            return ref + timedelta(days=n * _UNIT_DAYS[m.group(2)])
+    return None
+
+
+def _parse_with_dateparser(phrase: str, ref: date) -> Optional[date]:
+    import dateparser  # slow to import, only needed for the fallback
 
     dt = dateparser.parse(
-        raw,
+        phrase,
         settings={
-            "RELATIVE_BASE": ref,
+            "RELATIVE_BASE": datetime.combine(ref, datetime.min.time()),
             "PREFER_DATES_FROM": "future",
         },
     )
-    if not dt:
+    return dt.date() if dt else None
+
+
+@lru_cache(maxsize=8192)
+def _resolve(phrase: str, ref: date) -> Optional[str]:
+    d = _resolve_builtin(phrase, ref)
+    if d is None:
+        d = _parse_with_dateparser(phrase, ref)
+    return d.isoformat() if d else None
+
+
+def reference_date(value: Optional[str] = None) -> date:
+    """
+    Reference date for one meeting: an ISO date (YYYY-MM-DD) if given,
+    else today. Compute it once per meeting, not per utterance.
+    """
+    if value:
+        return date.fromisoformat(value)
+    return date.today()
+
+
+def normalize_deadline(raw: Optional[str], ref: Union[date, datetime]) -> Optional[str]:
+    """
+    Convert vague deadlines like 'Friday', 'next week', 'tomorrow'
+    into ISO date strings (YYYY-MM-DD) relative to ref.
+
+    Resolution is per day, so results are cached on
+    (normalized phrase, reference date).
+    """
+    if not raw:
+        return None
+    phrase = normalize_phrase(raw)
+    if not phrase:
         return None
-    return dt.date().isoformat()
+    if isinstance(ref, datetime):
+        ref = ref.date()
+    return _resolve(phrase, ref)
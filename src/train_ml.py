@@ -1,40 +1,146 @@
 from __future__ import annotations
+import zlib
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 import typer
 from rich import print
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import classification_report
-import joblib
-
-from config import RAW_DIR, DEFAULT_MODEL_PATH
-from ami_loader import load_meeting
-from action_rules import extract_task_and_deadline
-from utils import iter_meeting_files
+
+from config import RAW_DIR, DEFAULT_MODEL_PATH, ensure_dirs
+from corpus_cache import iter_meetings
+from pipeline import labeled_utterances
+from utils import atomic_open
+import profiling
 
 app = typer.Typer()
 
+TRAINERS = ("tfidf", "hashing")
+
+# hashing trainer defaults
+N_FEATURES = 2 ** 20
+CHUNK_SIZE = 10_000
+EPOCHS = 3
+HOLDOUT_PCT = 20
+
 
 @app.command()
 def main(
     input_dir: str = typer.Option(str(RAW_DIR), "--input-dir", "--input_dir"),
     model_path: str = typer.Option(str(DEFAULT_MODEL_PATH), "--model-path", "--model_path"),
+    corpus_cache: bool = typer.Option(True, "--corpus-cache/--no-corpus-cache"),
+    label_cache: bool = typer.Option(True, "--label-cache/--no-label-cache", help="Reuse weak labels from data/interim/labels"),
+    trainer: str = typer.Option("tfidf", "--trainer", help="tfidf (in memory) or hashing (streaming, flat memory)"),
+    epochs: int = typer.Option(EPOCHS, "--epochs", help="hashing: passes over the corpus"),
+    chunk_size: int = typer.Option(CHUNK_SIZE, "--chunk-size", "--chunk_size", help="hashing: utterances per partial_fit"),
+    n_features: int = typer.Option(N_FEATURES, "--n-features", "--n_features", help="hashing: feature space size"),
+    export_compact: bool = typer.Option(True, "--export-compact/--no-export-compact", help="Also write the sklearn-free <model>.compact artifact"),
+    prune_tol: float = typer.Option(0.0, "--prune-tol", help="compact: drop features with |weight| <= this (0 = exact)"),
+    registry: bool = typer.Option(True, "--registry/--no-registry", help="Reuse a registered model trained on the same data and settings"),
+    force: bool = typer.Option(False, "--force", help="Retrain even if the registry has this model"),
+    profile: bool = typer.Option(False, "--profile", help="Write a per-stage timing/memory report to logs/profiles"),
+    profile_dump: Optional[str] = typer.Option(None, "--profile-dump", help="Also dump 'cprofile' stats or a 'flame' graph"),
 ):
-    input_path = Path(input_dir)
+    if trainer not in TRAINERS:
+        raise typer.BadParameter(f"expected one of {TRAINERS}", param_hint="--trainer")
+    params = {"trainer": trainer, "export_compact": export_compact, "prune_tol": prune_tol}
+    if trainer == "hashing":
+        params.update(epochs=epochs, chunk_size=chunk_size, n_features=n_features)
+    with profiling.session("train_ml", profile, profile_dump):
+        reg = key = info = None
+        target = model_path
+        if registry:
+            from model_registry import ModelRegistry
+
+            with profiling.stage("registry"):
+                reg = ModelRegistry(Path(model_path))
+                info = reg.describe(Path(input_dir), corpus_cache, params)
+                key = reg.key_for(info)
+                hit = not force and reg.get(key) is not None
+                if hit:
+                    print(f"[green]Training data and settings unchanged: model {key} is already registered[/green]")
+                    reg.use(key)
+            if hit:
+                return
+            target = str(reg.staging(key))
+
+        if trainer == "hashing":
+            train_hashing(Path(input_dir), target, corpus_cache, epochs, chunk_size, n_features,
+                          export_compact=export_compact, prune_tol=prune_tol, label_cache=label_cache)
+        else:
+            train(Path(input_dir), target, corpus_cache, export_compact=export_compact, prune_tol=prune_tol,
+                  label_cache=label_cache)
+
+        if reg is not None:
+            with profiling.stage("registry"):
+                if reg.commit(key, info):
+                    print(f"[green]Registered model {key}[/green]")
+                    reg.use(key)
+
+
+def weak_labeler(label_cache: bool):
+    """(detector, store) for labeled_utterances: the rules, through the label store if enabled."""
+    if not label_cache:
+        return None, None
+    from label_cache import CachedRulesDetector, LabelCache
+
+    store = LabelCache()
+    return CachedRulesDetector(store), store
+
+
+def _save_labels(store):
+    if store is None:
+        return
+    with profiling.stage("save labels", len(store.new)):
+        store.save()
+    print(f"[cyan]Weak labels: {store.hits} cached, {store.misses} computed (rules {store.version})[/cyan]")
+
+
+def save_model(clf, model_path: str, export_compact: bool = True, prune_tol: float = 0.0, check_texts: Optional[List[str]] = None):
+    """joblib dump, plus the compact artifact checked against sklearn on check_texts."""
+    import joblib
+
+    ensure_dirs()
+    with profiling.stage("save"):
+        # write aside and swap in, so a reader (or a registry hard link) never sees a partial file
+        with atomic_open(Path(model_path), "wb") as f:
+            joblib.dump(clf, f)
+    print(f"[green]Saved model -> {model_path}[/green]")
+    if not export_compact:
+        return
+    from compact_model import CompactModel, compact_path_for, export_compact as export, max_deviation
+
+    out = compact_path_for(model_path)
+    with profiling.stage("export"):
+        try:
+            meta = export(clf, out, prune_tol=prune_tol, source=Path(model_path))
+        except ValueError as e:
+            print(f"[yellow]Compact export skipped: {e}[/yellow]")
+            return
+        dev = max_deviation(clf, CompactModel.load(out), check_texts or [])
+    print(f"[green]Saved compact model -> {out} ({meta['kept']} features kept, {meta['pruned']} pruned, "
+          f"max |dp| {dev:.2e} on {len(check_texts or [])} texts)[/green]")
 
+
+def train(
+    input_path: Path,
+    model_path: str,
+    corpus_cache: bool = True,
+    export_compact: bool = True,
+    prune_tol: float = 0.0,
+    label_cache: bool = True,
+):
+    """Fit TF-IDF + logistic regression on rule-labeled utterances and save it."""
     X: List[str] = []
     y: List[int] = []
 
-    for p in iter_meeting_files(input_path):   
-        meeting = load_meeting(p, input_path / "roles.csv")
-        for utt in meeting.utterances:
-            X.append(utt.text)
-            label = 1 if extract_task_and_deadline(utt.text) else 0
+    # weak labels: the rules detector stage of the action pipeline
+    detector, store = weak_labeler(label_cache)
+    with profiling.stage("load+label"):
+        for text, label in labeled_utterances(iter_meetings(input_path, use_cache=corpus_cache), detector):
+            X.append(text)
             y.append(label)
+    _save_labels(store)
 
     if not X:
         print("[yellow]No data found. Put transcripts in data/raw/AMI.[/yellow]")
@@ -48,6 +154,14 @@ def main(
         print("[yellow]Not enough class variety. Skipping ML training, rules-only mode.[/yellow]")
         return
 
+    # sklearn is only worth importing once we know there is something to fit
+    with profiling.stage("import"):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import Pipeline
+        from sklearn.metrics import classification_report
+
     try:
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
@@ -66,14 +180,113 @@ def main(
         ]
     )
 
-    clf.fit(X_train, y_train)
+    with profiling.stage("fit", len(X_train)):
+        clf.fit(X_train, y_train)
 
     if do_report and X_test:
-        y_pred = clf.predict(X_test)
+        with profiling.stage("evaluate", len(X_test)):
+            y_pred = clf.predict(X_test)
         print(classification_report(y_test, y_pred))
 
-    joblib.dump(clf, model_path)
-    print(f"[green]Saved model -> {model_path}[/green]")
+    save_model(clf, model_path, export_compact, prune_tol, X_test or X_train[:5000])
+
+
+def is_holdout(text: str, pct: int = HOLDOUT_PCT) -> bool:
+    """
+    Stable train/held-out split by text hash: the same utterance always
+    lands on the same side, in every pass and every run.
+    """
+    return zlib.crc32(text.encode("utf-8")) % 100 < pct
+
+
+def _chunks(pairs: Iterator[Tuple[str, int]], size: int) -> Iterator[Tuple[List[str], List[int]]]:
+    while True:
+        chunk = list(islice(pairs, size))
+        if not chunk:
+            return
+        texts, labels = zip(*chunk)
+        yield list(texts), list(labels)
+
+
+def _labeled_stream(input_path: Path, corpus_cache: bool, holdout: bool, detector=None) -> Iterator[Tuple[str, int]]:
+    """One side of the split, re-read from the corpus on every call."""
+    for text, label in labeled_utterances(iter_meetings(input_path, use_cache=corpus_cache), detector):
+        if is_holdout(text) == holdout:
+            yield text, label
+
+
+def train_hashing(
+    input_path: Path,
+    model_path: str,
+    corpus_cache: bool = True,
+    epochs: int = EPOCHS,
+    chunk_size: int = CHUNK_SIZE,
+    n_features: int = N_FEATURES,
+    export_compact: bool = True,
+    prune_tol: float = 0.0,
+    label_cache: bool = True,
+):
+    """
+    Out-of-core trainer: HashingVectorizer + SGD logistic regression fitted
+    with partial_fit on chunks of the corpus, over several passes. Nothing
+    grows with corpus size: the vectorizer is stateless, the model is a
+    fixed n_features weight vector, and the corpus is streamed per pass.
+    Scores on the held-out stream (a fixed 20% by text hash) after each pass.
+    """
+    with profiling.stage("import"):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.pipeline import Pipeline
+        import numpy as np
+
+    vec = HashingVectorizer(ngram_range=(1, 2), n_features=n_features, alternate_sign=False)
+    sgd = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    counts = np.zeros(2)
+    fitted = False
+    check: List[str] = []
+    # later passes find every label in the store
+    detector, store = weak_labeler(label_cache)
+
+    for epoch in range(1, epochs + 1):
+        with profiling.stage("fit"):
+            for texts, labels in _chunks(_labeled_stream(input_path, corpus_cache, False, detector), chunk_size):
+                y = np.asarray(labels)
+                if epoch == 1:
+                    counts += np.bincount(y, minlength=2)
+                # "balanced" class weights from the label counts seen so far
+                weights = counts.sum() / (2 * np.maximum(counts, 1))
+                sgd.partial_fit(vec.transform(texts), y, classes=[0, 1], sample_weight=weights[y])
+                fitted = True
+        if not fitted:
+            print("[yellow]No data found. Put transcripts in data/raw/AMI.[/yellow]")
+            return
+        if epoch == 1:
+            print(f"[cyan]Training stream: {int(counts.sum())} utterances (pos={int(counts[1])}, neg={int(counts[0])})[/cyan]")
+            if counts.min() == 0:
+                print("[yellow]Not enough class variety. Skipping ML training, rules-only mode.[/yellow]")
+                return
+
+        with profiling.stage("evaluate"):
+            tp = fp = fn = n = 0
+            for texts, labels in _chunks(_labeled_stream(input_path, corpus_cache, True, detector), chunk_size):
+                pred = sgd.predict(vec.transform(texts))
+                if not check:
+                    check = texts
+                y = np.asarray(labels)
+                tp += int(((pred == 1) & (y == 1)).sum())
+                fp += int(((pred == 1) & (y == 0)).sum())
+                fn += int(((pred == 0) & (y == 1)).sum())
+                n += len(labels)
+        if epoch == 1:
+            _save_labels(store)
+        prec = tp / (tp + fp) if tp + fp else 0.0
+        rec = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * prec * rec / (prec + rec) if prec + rec else 0.0
+        print(f"epoch {epoch}: held-out n={n} precision={prec:.3f} recall={rec:.3f} f1={f1:.3f}")
+
+    # same predict_proba(texts) interface as the TF-IDF pipeline
+    clf = Pipeline([("hashing", vec), ("sgd", sgd)])
+    save_model(clf, model_path, export_compact, prune_tol, check)
 
 
 if __name__ == "__main__":
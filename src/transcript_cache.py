@@ -0,0 +1,80 @@
+from __future__ import annotations
+import filecmp
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from config import INTERIM_DIR
+from utils import atomic_open, atomic_write_json, file_sha1
+
+#Content-addressed transcript cache
+#
+# A transcript only depends on the media's bytes and on the transcriber
+# (model, language, chunking), so finished transcripts are kept in
+#   data/interim/transcripts/<key>.txt   (+ <key>.json: media, settings)
+# with key = hash(media SHA-1, transcriber settings, format). The SHA-1 is
+# streamed in 1 MB reads and remembered per path/size/mtime in hashes.json,
+# so an unchanged recording is not even re-read. asr_worker.transcribe
+# looks the key up before starting or contacting the worker, which makes a
+# re-run of the same recording skip decoding and ASR entirely; the worker
+# stores every transcript it produces.
+
+TRANSCRIPTS_DIR = INTERIM_DIR / "transcripts"
+FORMAT_VERSION = 1  # bump when write_transcript's output changes
+
+
+def _copy_into(src: Path, out: Path):
+    """Copy src over out via a temp file, so readers never see a partial transcript."""
+    with src.open("rb") as f, atomic_open(out, "wb") as dst:
+        shutil.copyfileobj(f, dst)
+
+
+class TranscriptCache:
+    """Transcripts by media content + transcriber settings."""
+
+    def __init__(self, root: Path = TRANSCRIPTS_DIR):
+        self.root = Path(root)
+        self.hashes = self.root / "hashes.json"
+
+    def media_digest(self, media: Path) -> str:
+        """SHA-1 of the media file, reused while its size and mtime are unchanged."""
+        media = Path(media).resolve()
+        st = media.stat()
+        try:
+            memo = json.loads(self.hashes.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            memo = {}
+        seen = memo.get(str(media))
+        if seen and seen.get("size") == st.st_size and seen.get("mtime_ns") == st.st_mtime_ns:
+            return seen["sha1"]
+        digest = file_sha1(media)
+        memo[str(media)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": digest}
+        self.root.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self.hashes, memo, indent=2)
+        return digest
+
+    @staticmethod
+    def key(media_sha1: str, settings: dict) -> str:
+        blob = json.dumps({"media": media_sha1, "settings": settings, "format": FORMAT_VERSION}, sort_keys=True)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:20]
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.txt"
+
+    def restore(self, key: str, out: Path) -> bool:
+        """Write the cached transcript to `out`; False on a miss. An identical `out` is left untouched."""
+        cached = self.path(key)
+        if not cached.exists():
+            return False
+        out = Path(out)
+        if out.exists() and filecmp.cmp(cached, out, shallow=False):
+            return True  # same bytes: keep its mtime, so the corpus cache sees no change
+        _copy_into(cached, out)
+        return True
+
+    def store(self, key: str, transcript: Path, meta: Optional[dict] = None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        _copy_into(Path(transcript), self.path(key))
+        atomic_write_json(self.root / f"{key}.json", meta or {}, indent=2)
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import typer
+from rich import print
+
+from config import RAW_DIR, LOGS_DIR
+from corpus_cache import iter_meetings
+from pipeline import labeled_utterances
+
+#Latency-aware model selection (python src/tune.py)
+#
+# Cross-validates a grid of action classifiers on the rules' weak labels
+# and measures what each one costs to serve:
+#   f1            mean F1 over stratified folds (weak labels, positive class)
+#   size_kb       joblib file; compact_kb for the NumPy artifact when exportable
+#   load_ms       joblib.load (sklearn already imported) / CompactModel.load
+#   p50/p99_us    one utterance at a time through the scorer infer_ml would use
+# Folds and final fits run in parallel (--n-jobs); load and latency are
+# measured serially afterwards so workers do not skew them. The report
+# marks the Pareto front (higher F1, lower size / load / p99) and picks the
+# best-F1 candidate within the optional budgets.
+
+app = typer.Typer()
+
+GRIDS = ("small", "full")
+
+
+def candidates(grid: str = "small") -> List[dict]:
+    """Vectorizer x classifier settings to try."""
+    ngrams = [(1, 1), (1, 2)] if grid == "small" else [(1, 1), (1, 2), (1, 3)]
+    vecs: List[dict] = []
+    for ng in ngrams:
+        for min_df in ([1, 2] if grid == "small" else [1, 2, 5]):
+            for max_features in ([None, 20_000] if grid == "small" else [None, 5_000, 50_000]):
+                vecs.append({"vectorizer": "tfidf", "ngram_range": ng, "min_df": min_df, "max_features": max_features})
+        for n_features in ([2 ** 18, 2 ** 20] if grid == "small" else [2 ** 16, 2 ** 18, 2 ** 20]):
+            vecs.append({"vectorizer": "hashing", "ngram_range": ng, "n_features": n_features})
+    return [{**v, "classifier": clf} for v in vecs for clf in ("logreg", "linear_svm")]
+
+
+def label(cand: dict) -> str:
+    v = cand["vectorizer"]
+    ng = "{}-{}".format(*cand["ngram_range"])
+    if v == "tfidf":
+        extra = f"df={cand['min_df']},max={cand['max_features'] or 'all'}"
+    else:
+        extra = f"2^{cand['n_features'].bit_length() - 1}"
+    return f"{v}({ng},{extra})+{cand['classifier']}"
+
+
+def build(cand: dict):
+    """Unfitted Pipeline with predict_proba, so infer_ml can serve it."""
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.svm import LinearSVC
+
+    ng = tuple(cand["ngram_range"])
+    if cand["vectorizer"] == "tfidf":
+        vec = TfidfVectorizer(ngram_range=ng, min_df=cand["min_df"], max_features=cand["max_features"])
+    else:
+        vec = HashingVectorizer(ngram_range=ng, n_features=cand["n_features"], alternate_sign=False)
+    if cand["classifier"] == "logreg":
+        model = LogisticRegression(max_iter=1000, class_weight="balanced")
+    else:
+        # Platt scaling on top of the SVM margin gives predict_proba
+        model = CalibratedClassifierCV(LinearSVC(class_weight="balanced"), method="sigmoid", cv=3, ensemble=False)
+    return Pipeline([(cand["vectorizer"], vec), (cand["classifier"], model)])
+
+
+def _fold(i: int, cand: dict, X: List[str], y: List[int], train_idx, test_idx) -> Tuple[int, float]:
+    from sklearn.metrics import f1_score
+
+    clf = build(cand)
+    clf.fit([X[j] for j in train_idx], [y[j] for j in train_idx])
+    pred = clf.predict([X[j] for j in test_idx])
+    return i, float(f1_score([y[j] for j in test_idx], pred, zero_division=0))
+
+
+def _fit(cand: dict, X: List[str], y: List[int]):
+    return build(cand).fit(X, y)
+
+
+def _best_ms(fn, runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def serving_costs(clf, texts: List[str], workdir: Path) -> dict:
+    """Artifact sizes, load times and single-utterance latency of a fitted pipeline."""
+    import joblib
+    import numpy as np
+    from compact_model import CompactModel, export_compact
+
+    path = workdir / "clf.joblib"
+    joblib.dump(clf, path)
+    costs = {"size_kb": round(path.stat().st_size / 1024, 1),
+             "load_ms": round(_best_ms(lambda: joblib.load(path)), 2),
+             "compact_kb": None, "compact_load_ms": None}
+    scorer, costs["scorer"] = clf, "sklearn"
+    try:
+        export_compact(clf, workdir / "clf.compact")
+    except ValueError:
+        pass  # e.g. the calibrated SVM: served through joblib
+    else:
+        compact = workdir / "clf.compact"
+        costs["compact_kb"] = round(sum(p.stat().st_size for p in compact.iterdir()) / 1024, 1)
+        costs["compact_load_ms"] = round(_best_ms(lambda: CompactModel.load(compact)), 2)
+        scorer, costs["scorer"] = CompactModel.load(compact), "compact"
+
+    scorer.predict_proba(texts[:10])  # warm up
+    lat = []
+    for t in texts:
+        start = time.perf_counter()
+        scorer.predict_proba([t])
+        lat.append(time.perf_counter() - start)
+    costs["p50_us"] = round(float(np.percentile(lat, 50)) * 1e6, 1)
+    costs["p99_us"] = round(float(np.percentile(lat, 99)) * 1e6, 1)
+    return costs
+
+
+def served_size(r: dict) -> float:
+    return r["compact_kb"] if r["compact_kb"] is not None else r["size_kb"]
+
+
+def served_load(r: dict) -> float:
+    return r["compact_load_ms"] if r["compact_load_ms"] is not None else r["load_ms"]
+
+
+def pareto(rows: List[dict]) -> List[bool]:
+    """Whether each row is on the front: higher f1, lower size / load / p99."""
+    def costs(r):
+        return (-r["f1"], served_size(r), served_load(r), r["p99_us"])
+
+    front = []
+    for r in rows:
+        a = costs(r)
+        front.append(not any(
+            all(x <= y for x, y in zip(costs(o), a)) and costs(o) != a for o in rows if o is not r
+        ))
+    return front
+
+
+@app.command()
+def main(
+    input_dir: str = typer.Option(str(RAW_DIR), "--input-dir", "--input_dir"),
+    corpus_cache: bool = typer.Option(True, "--corpus-cache/--no-corpus-cache"),
+    label_cache: bool = typer.Option(True, "--label-cache/--no-label-cache"),
+    grid: str = typer.Option("small", "--grid", help=" or ".join(f"{g} ({len(candidates(g))} candidates)" for g in GRIDS)),
+    folds: int = typer.Option(3, "--folds"),
+    n_jobs: int = typer.Option(-1, "--n-jobs", "--n_jobs", help="Parallel fits (-1 = all cores)"),
+    max_utterances: int = typer.Option(50_000, "--max-utterances", help="Sample size for the search (0 = all)"),
+    latency_sample: int = typer.Option(1000, "--latency-sample", help="Utterances scored one by one per candidate"),
+    latency_budget_us: Optional[float] = typer.Option(None, "--latency-budget-us", help="p99 budget for the pick"),
+    size_budget_kb: Optional[float] = typer.Option(None, "--size-budget-kb", help="Served artifact budget for the pick"),
+    seed: int = typer.Option(42, "--seed"),
+    out: str = typer.Option(str(LOGS_DIR / "tune.json"), "--out", help="JSON report"),
+    model_path: Optional[str] = typer.Option(None, "--model-path", "--model_path", help="Also save the pick here (joblib + compact)"),
+):
+    """Cross-validated search with a Pareto report of F1 vs size, load time and latency."""
+    if grid not in GRIDS:
+        raise typer.BadParameter(f"expected one of {GRIDS}", param_hint="--grid")
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    from train_ml import save_model, weak_labeler
+
+    detector, store = weak_labeler(label_cache)
+    data = list(labeled_utterances(iter_meetings(Path(input_dir), use_cache=corpus_cache), detector))
+    if store is not None:
+        store.save()
+    rng = random.Random(seed)
+    if max_utterances and len(data) > max_utterances:
+        data = rng.sample(data, max_utterances)
+    X = [t for t, _ in data]
+    y = [lab for _, lab in data]
+    # each training fold is split again (3-fold) to calibrate the SVM
+    if min(y.count(0), y.count(1)) < 3 * folds:
+        print("[yellow]Not enough labeled data of both classes to cross-validate.[/yellow]")
+        raise typer.Exit(code=1)
+    cands = candidates(grid)
+    print(f"[cyan]{len(cands)} candidates x {folds} folds on {len(X)} utterances (pos={sum(y)})[/cyan]")
+
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y))
+    start = time.perf_counter()
+    scores: Dict[int, List[float]] = {i: [] for i in range(len(cands))}
+    parallel = Parallel(n_jobs=n_jobs)
+    for i, f1 in parallel(delayed(_fold)(i, c, X, y, tr, te) for i, c in enumerate(cands) for tr, te in splits):
+        scores[i].append(f1)
+    fitted = parallel(delayed(_fit)(c, X, y) for c in cands)
+    print(f"[cyan]Search: {time.perf_counter() - start:.1f}s[/cyan]")
+
+    sample = rng.sample(X, min(latency_sample, len(X)))
+    rows = []
+    workdir = Path(tempfile.mkdtemp(prefix="tune-"))
+    try:
+        for i, (cand, clf) in enumerate(zip(cands, fitted)):
+            cell = workdir / str(i)
+            cell.mkdir()
+            rows.append({"candidate": label(cand), "params": cand,
+                         "f1": round(sum(scores[i]) / len(scores[i]), 4),
+                         **serving_costs(clf, sample, cell)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for r, on_front in zip(rows, pareto(rows)):
+        r["pareto"] = on_front
+    fits = [i for i, r in enumerate(rows)
+            if (latency_budget_us is None or r["p99_us"] <= latency_budget_us)
+            and (size_budget_kb is None or served_size(r) <= size_budget_kb)]
+    pick = max(fits, key=lambda i: (rows[i]["f1"], -rows[i]["p99_us"])) if fits else None
+
+    order = sorted(range(len(rows)), key=lambda i: (not rows[i]["pareto"], -rows[i]["f1"], rows[i]["p99_us"]))
+    print(f"{'':2}{'candidate':40}{'F1':>6}{'KB':>8}{'load ms':>8}{'p50 us':>8}{'p99 us':>8}")
+    for i in order:
+        r = rows[i]
+        tag = "*" if i == pick else ("P" if r["pareto"] else " ")
+        print(f"{tag:2}{r['candidate']:40}{r['f1']:6.3f}{served_size(r):8.1f}{served_load(r):8.2f}"
+              f"{r['p50_us']:8.1f}{r['p99_us']:8.1f}")
+    print("P = Pareto front, * = pick (best F1 within budgets). KB / load ms are for the served artifact:")
+    print("the compact one where the model exports, else joblib (see 'scorer' in the report).")
+
+    out_path = Path(out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    report = {"input_dir": str(input_dir), "utterances": len(X), "folds": folds, "grid": grid,
+              "budgets": {"p99_us": latency_budget_us, "size_kb": size_budget_kb},
+              "pick": rows[pick]["candidate"] if pick is not None else None,
+              "candidates": [rows[i] for i in order]}
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[green]Report -> {out_path}[/green]")
+
+    if pick is None:
+        print("[yellow]No candidate meets the budgets.[/yellow]")
+        return
+    print(f"[green]Pick: {rows[pick]['candidate']}[/green]")
+    if model_path:
+        save_model(fitted[pick], model_path, check_texts=sample)
+
+
+if __name__ == "__main__":
+    app()
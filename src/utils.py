@@ -1,5 +1,10 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable
+from typing import IO, Iterable, Iterator, Optional
 
 #Utility Functions for Data Processing
 #Author: Meriem Lmoubariki
@@ -13,6 +18,59 @@ def iter_meeting_files(input_dir: Path) -> Iterable[Path]:
         if p.name.lower() == "roles.csv":
             continue
         yield p
+
+
+def code_fingerprint(*paths: Path) -> str:
+    """
+    Short hash of the given source files. Used as a version stamp so caches
+    and manifests are invalidated when the code that produced them changes.
+    """
+    h = hashlib.sha1()
+    for p in paths:
+        h.update(Path(p).name.encode("utf-8"))
+        h.update(Path(p).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def file_sha1(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Hex SHA-1 of a file's content, read in chunks so large media files
+    never sit in memory.
+    """
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w") -> Iterator[IO]:
+    """
+    Write to a temp file next to path and swap it into place when the block
+    ends, so readers see the old file or the new one, never a partial one.
+    On an error the temp file is dropped and path is left as it was.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # per process and thread: the ASR worker's heartbeat thread and its main loop share worker.json
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open(mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(path: Path, text: str):
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+def atomic_write_json(path: Path, data, indent: Optional[int] = None):
+    atomic_write_text(path, json.dumps(data, indent=indent))
 # Updated 
 # Updated 
 # Updated 
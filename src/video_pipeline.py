@@ -1,107 +1,124 @@
 from __future__ import annotations
+import json
 import sys
 from pathlib import Path
 import subprocess
 
-from config import RAW_DIR, PROCESSED_DIR, DEFAULT_OUTPUT_JSON
+from config import RAW_DIR, DEFAULT_OUTPUT_JSON, PROFILE_DIR, ensure_dirs
+import asr_worker
+import profiling
 
 ROLES_CSV = RAW_DIR / "roles.csv"
 
 
-def ensure_dirs():
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-
-
 def ensure_roles_csv():
     if not ROLES_CSV.exists():
         ROLES_CSV.write_text("speaker,role\nUNK,Unknown\n", encoding="utf-8")
 
 
-def cleanup_previous_run():
+def cleanup_previous_run(out_txt: Path):
     """
-    Delete old transcript .txt files and old actions.json
-    so that each video run produces a fresh, clean output.
+    Delete the stale transcript of this video only, after a failed
+    transcription. Other transcripts and actions.json stay: infer_ml's
+    manifest re-processes just the meetings whose transcript changed.
     """
-    # Delete all old transcripts
-    for txt in RAW_DIR.glob("*.txt"):
-        try:
-            txt.unlink()
-            print(f"[cleanup] Deleted old transcript: {txt}")
-        except Exception as e:
-            print(f"[cleanup] Could not delete {txt}: {e}")
-
-    # Delete old actions.json
-    if DEFAULT_OUTPUT_JSON.exists():
+    if out_txt.exists():
         try:
-            DEFAULT_OUTPUT_JSON.unlink()
-            print(f"[cleanup] Deleted old actions: {DEFAULT_OUTPUT_JSON}")
+            out_txt.unlink()
+            print(f"[cleanup] Deleted old transcript: {out_txt}")
         except Exception as e:
-            print(f"[cleanup] Could not delete {DEFAULT_OUTPUT_JSON}: {e}")
+            print(f"[cleanup] Could not delete {out_txt}: {e}")
 
 
 def transcribe_with_whisper(video_path: Path, out_txt: Path):
-    try:
-        import whisper
-    except Exception:
-        print("ERROR: Whisper not installed. Run: pip install openai-whisper ffmpeg-python")
-        sys.exit(1)
-
-    print(f"[video] Loading Whisper model (small)…")
-    model = whisper.load_model("small")
-
-    print(f"[video] Transcribing: {video_path}")
-    # fp16=False for CPU on Windows
-    result = model.transcribe(str(video_path), language="en", fp16=False)
-    segments = result.get("segments", [])
-
-    with out_txt.open("w", encoding="utf-8") as f:
-        for seg in segments:
-            text = seg.get("text", "").strip()
-            if text:
-                # No speaker diarization → mark as UNK
-                f.write(f"UNK: {text}\n")
-
-    print(f"[video] Wrote transcript -> {out_txt}")
-
-
-def run_python(path: str):
+    """Transcribe through the resident worker (started here if none is running)."""
+    print(f"[video] Transcribing: {video_path} (queued to the transcription worker)")
+    with profiling.stage("asr_job"):
+        try:
+            result = asr_worker.transcribe(video_path, out_txt)
+        except asr_worker.TranscriptionError as e:
+            print(f"ERROR: {e}")
+            cleanup_previous_run(out_txt)
+            sys.exit(1)
+    prof = profiling.active()
+    stats = result.get("stats", {})
+    if prof is not None and stats:
+        # the model stays loaded in the worker, so its load time is not part of this run
+        prof.add("decode", stats["decode"])
+        prof.add("transcribe", stats["transcribe"], items=int(stats["audio_seconds"]))
+    if result.get("cached"):
+        print(f"[video] Wrote transcript -> {out_txt} (cached transcript of the same recording)")
+        return
+    print(f"[video] Wrote transcript -> {out_txt} ({result['seconds']:.1f}s in the worker, queued {result['queued_s']:.1f}s)")
+
+
+def run_python(path: str, args: list[str] | None = None):
     """Run an existing script like train_ml.py / infer_ml.py."""
-    cmd = [sys.executable, path]
+    cmd = [sys.executable, path, *(args or [])]
     print(f"[run] {' '.join(cmd)}")
-    p = subprocess.run(cmd, shell=False)
+    with profiling.stage(Path(path).stem):
+        p = subprocess.run(cmd, shell=False)
     if p.returncode != 0:
         print(f"[run] Command failed with code {p.returncode}: {cmd}")
         sys.exit(p.returncode)
 
 
+def _parse_args(argv: list[str]) -> tuple[list[str], bool, str | None]:
+    """Positional args, --profile and --profile-dump {cprofile,flame}."""
+    args, profile, dump = [], False, None
+    it = iter(argv)
+    for a in it:
+        if a == "--profile":
+            profile = True
+        elif a == "--profile-dump":
+            profile, dump = True, next(it, None)
+        else:
+            args.append(a)
+    return args, profile, dump
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python src\\video_pipeline.py path_to_video.mp4")
+    args, profile, dump = _parse_args(sys.argv[1:])
+    if not args:
+        print("Usage: python src\\video_pipeline.py path_to_video.mp4 [--profile] [--profile-dump cprofile|flame]")
         sys.exit(2)
 
-    video_path = Path(sys.argv[1])
+    video_path = Path(args[0])
     if not video_path.exists():
         print(f"Video not found: {video_path}")
         sys.exit(2)
 
     ensure_dirs()
     ensure_roles_csv()
-
-    # VERY IMPORTANT: wipe old transcripts and old actions
-    cleanup_previous_run()
+    child_reports = [PROFILE_DIR / "train_ml.json", PROFILE_DIR / "infer_ml.json"]
+    with profiling.session("video_pipeline", profile, dump) as prof:
+        if prof is not None:
+            for p in child_reports:
+                p.unlink(missing_ok=True)
+        run_video(video_path, profile)
+        if prof is not None:
+            # the training / inference subprocesses wrote their own reports
+            prof.extra["children"] = {
+                p.stem: json.loads(p.read_text(encoding="utf-8")) for p in child_reports if p.exists()
+            }
+
+
+def run_video(video_path: Path, profile: bool = False):
+    """Transcribe one video, retrain and re-run inference."""
+    child_args = ["--profile"] if profile else []
 
     # Transcript file name = video file name (without extension)
     out_txt = RAW_DIR / f"{video_path.stem}.txt"
 
-    # 1) Transcribe video to meeting transcript
+    # 1) Transcribe video to meeting transcript (the old one is replaced
+    #    atomically; an unchanged recording comes from the transcript cache)
     transcribe_with_whisper(video_path, out_txt)
 
     # 2) Train ML model (uses data/raw/AMI)
-    run_python("src/train_ml.py")
+    run_python("src/train_ml.py", child_args)
 
     # 3) Run ML+rules inference to write JSON
-    run_python("src/infer_ml.py")
+    run_python("src/infer_ml.py", child_args)
 
     print(f"[done] Video -> transcript -> actions JSON: {DEFAULT_OUTPUT_JSON}")
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the modules in src/ import each other by bare name, as the entry points do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
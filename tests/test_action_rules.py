@@ -0,0 +1,137 @@
+import random
+import re
+
+import pytest
+
+from action_rules import (
+    CLEAN_TRIGGERS,
+    _extract_assignee_name,
+    _extract_deadline,
+    extract_many,
+    extract_task_and_deadline,
+    find_action_spans,
+    has_trigger,
+)
+
+# The single-pass scan must give exactly what the per-rule path gives:
+# first trigger by str.find over CLEAN_TRIGGERS, every DEADLINE_PATTERNS
+# entry searched in order, and the assignee regexes of
+# _extract_assignee_name.
+
+
+def reference_extract(text):
+    if not text or not text.strip():
+        return None
+    original = text.strip()
+    lower = original.lower()
+    hits = [i for i in (lower.find(t) for t in CLEAN_TRIGGERS) if i != -1]
+    if not hits:
+        return None
+    task = original[min(hits):].strip()
+    end = re.search(r"[.?!]", task)
+    if end and end.end() < len(task):
+        task = task[:end.end()].strip()
+    if len(task.split()) < 3:
+        return None
+    return {"task": task, "deadline_raw": _extract_deadline(original), "assignee_name": _extract_assignee_name(original)}
+
+
+def reference_spans(text):
+    if not text or not text.strip():
+        return []
+    original = text.strip()
+    lower = original.lower()
+    base = len(text) - len(text.lstrip())
+    # every trigger occurrence; the longest one wins at a given offset
+    found = {}
+    for trig in CLEAN_TRIGGERS:
+        for m in re.finditer(f"(?={re.escape(trig)})", lower):
+            if len(trig) > len(found.get(m.start(), "")):
+                found[m.start()] = trig
+    spans, covered = [], 0
+    for pos in sorted(found):
+        if pos < covered:
+            continue
+        task = original[pos:].strip()
+        end = re.search(r"[.?!]", task)
+        if end and end.end() < len(task):
+            task = task[:end.end()].strip()
+        covered = pos + len(task)
+        if len(task.split()) < 3:
+            continue
+        spans.append({"start": base + pos, "end": base + pos + len(task), "trigger": original[pos:pos + len(found[pos])],
+                      "task": task, "deadline_raw": _extract_deadline(task)})
+    return spans
+
+
+FIXED = [
+    "",
+    "   ",
+    "yeah",
+    "okay okay okay.",
+    "We need today to finish this",          # "we need to" overlaps "today"
+    "I think we should go with the blue one by Friday.",  # "i think we should" contains "we should"
+    "Let's all meet again next Tuesday",     # "let's all" vs "let's"
+    "Jason, can you please send the slides by end of day?",
+    "Sue can you check the numbers within two days",
+    "Can you, Jason, update the budget in the next week",
+    "Oh can you put a sign up on all the spaces Jason?",
+    "Maria, please book the room tomorrow. And can you email Bob by Monday!",
+    "please please please do it",
+    "BY FRIDAY WE NEED TO SHIP THE PROTOTYPE",
+    "standby. we should nearby review the design tonight",  # "by" inside words is not a deadline
+    "Café, can you send the menu by Friday?",  # non-ASCII goes through the reference rules
+    "Zoë can you résumé the notes in the next meeting",
+    "  we should   finish it today  ",
+    "can you. can you do it. can you do it by tomorrow?",
+    "shall we, let us, can we, could you, you need to, you should, i will",
+]
+
+_PIECES = [
+    "we need to", "we should", "can you", "could you", "please", "let's all", "let's", "let us",
+    "i think we should", "i will", "you need to", "you should", "can we", "shall we",
+    "by Friday", "by end of day", "in the next two days", "within a week", "next Tuesday", "next meeting",
+    "tomorrow", "today", "tonight", "standby", "nearby", "nextdoor",
+    "Jason", "Sue", "Maria", "Bob", "ANNA", "anna", "Zoë", "Café",
+    "send", "the report", "update the slides", "review", "um", "uh", "yeah", "okay", "so", "it", "the budget",
+]
+_PUNCT = ["", "", "", ",", ".", "?", "!", " ,", ", "]
+
+
+def generated(n=4000, seed=482):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        words = []
+        for _ in range(rng.randint(0, 12)):
+            w = rng.choice(_PIECES)
+            if rng.random() < 0.2:
+                w = w.capitalize() if rng.random() < 0.5 else w.upper()
+            words.append(w + rng.choice(_PUNCT))
+        out.append(" " * rng.randint(0, 2) + " ".join(words) + " " * rng.randint(0, 2))
+    return out
+
+
+@pytest.mark.parametrize("text", FIXED)
+def test_fixed_sentences_match_the_reference(text):
+    assert extract_task_and_deadline(text) == reference_extract(text)
+    assert find_action_spans(text) == reference_spans(text)
+    assert has_trigger(text.lower()) == any(t in text.lower() for t in CLEAN_TRIGGERS)
+
+
+def test_generated_sentences_match_the_reference():
+    texts = generated()
+    assert sum(reference_extract(t) is not None for t in texts) > len(texts) // 4  # mostly actions are exercised
+    for text, got in zip(texts, extract_many(texts)):
+        assert got == reference_extract(text), text
+        assert find_action_spans(text) == reference_spans(text), text
+        assert has_trigger(text.lower()) == any(t in text.lower() for t in CLEAN_TRIGGERS), text
+
+
+def test_extract_many_handles_duplicates_and_empty_input():
+    assert extract_many([]) == []
+    texts = ["Jason, can you send the report by Friday?", "yeah", "", "Jason, can you send the report by Friday?"]
+    got = extract_many(texts)
+    assert got == [reference_extract(t) for t in texts]
+    got[0]["task"] = "changed"
+    assert got[3]["task"] == "can you send the report by Friday?"  # duplicates get their own copy
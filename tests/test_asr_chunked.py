@@ -0,0 +1,137 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from asr_chunked import ChunkedTranscriber, plan_chunks, stitch
+from asr_worker import SAMPLE_RATE as SR, Transcriber
+
+WORDS = 40
+WORD_SECONDS = 0.5
+GAP_SECONDS = 0.4
+
+
+def tone_audio(words: int = WORDS) -> np.ndarray:
+    """Word k is a WORD_SECONDS tone at 300 + 40k Hz, followed by GAP_SECONDS of silence."""
+    n = int(WORD_SECONDS * SR)
+    parts = []
+    for k in range(words):
+        parts.append(0.5 * np.sin(2 * np.pi * (300 + 40 * k) * np.arange(n) / SR))
+        parts.append(np.zeros(int(GAP_SECONDS * SR)))
+    return np.concatenate(parts).astype(np.float32)
+
+
+class ToneModel:
+    """
+    Deterministic stand-in for Whisper: one segment per tone burst, named
+    by its pitch. With `log`, windows starting on the first words finish
+    last and every window appends its first word when it is done.
+    """
+
+    def __init__(self, log: str = ""):
+        self.log = log
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+
+    def decode(self, media):
+        return tone_audio()
+
+    def transcribe_array(self, audio):
+        assert self.loaded
+        hop = 160
+        n = audio.size // hop
+        on = np.abs(audio[:n * hop]).reshape(n, hop).max(axis=1) > 0.1
+        edges = np.flatnonzero(np.diff(np.r_[0, on.astype(int), 0]))
+        segments = []
+        for a, b in zip(edges[::2], edges[1::2]):
+            x = audio[a * hop:b * hop]
+            pitch = np.count_nonzero(np.diff(np.signbit(x))) / 2 / (x.size / SR)
+            segments.append({"start": a * hop / SR, "end": b * hop / SR, "text": f"word{round((pitch - 300) / 40)}"})
+        if self.log:
+            first = segments[0]["text"] if segments else "-"
+            time.sleep(0.5 if first in ("word0", "word1") else 0.0)
+            with open(self.log, "a", encoding="utf-8") as f:
+                f.write(first + "\n")
+        return segments
+
+    def settings(self):
+        return {"asr": "tones"}
+
+
+def test_cuts_fall_in_silence_near_the_target():
+    audio = tone_audio()
+    plan = plan_chunks(audio, SR, chunk_seconds=10, overlap_seconds=1)
+    assert len(plan) > 2
+    assert plan[0][0] == 0 and plan[-1][1] == audio.size
+    for (_, end, _, w_end), (start, _, w_start, _) in zip(plan, plan[1:]):
+        assert end == start  # contiguous
+        assert w_end - end == start - w_start == SR  # one second of context either side
+    for i, (cut, _, _, _) in enumerate(plan[1:], 1):
+        assert abs(cut - plan[i - 1][0] - 10 * SR) <= 2.5 * SR  # within a quarter chunk of the target
+        assert np.abs(audio[cut - SR // 20:cut + SR // 20]).max() == 0  # in a pause
+
+
+def test_short_audio_is_one_chunk():
+    audio = tone_audio(3)
+    assert plan_chunks(audio, SR, chunk_seconds=10) == [(0, audio.size, 0, audio.size)]
+
+
+def test_stitch_keeps_overlap_text_once_in_absolute_time():
+    # chunks [0, 10) and [10, 20) s with 2 s of context; times are relative to each window
+    plan = [(0, 10 * SR, 0, 12 * SR), (10 * SR, 20 * SR, 8 * SR, 20 * SR)]
+    results = [
+        [{"start": 1.0, "end": 2.0, "text": "first"},
+         {"start": 9.0, "end": 10.4, "text": "at the cut"},
+         {"start": 10.5, "end": 11.5, "text": "in the right overlap"}],
+        [{"start": 1.0, "end": 2.4, "text": "at the cut"},   # 9-10.4 s: its midpoint is in chunk 0
+         {"start": 1.9, "end": 2.8, "text": "At  the cut"},  # heard again from this side of the cut
+         {"start": 2.5, "end": 3.5, "text": "in the right overlap"},
+         {"start": 6.0, "end": 7.0, "text": "last"}],
+    ]
+    assert stitch(plan, results, SR) == [
+        {"start": 1.0, "end": 2.0, "text": "first"},
+        {"start": 9.0, "end": 10.4, "text": "at the cut"},
+        {"start": 10.5, "end": 11.5, "text": "in the right overlap"},
+        {"start": 14.0, "end": 15.0, "text": "last"},
+    ]
+
+
+@pytest.fixture
+def chunked():
+    transcribers = []
+
+    def make(model, workers=3):
+        t = ChunkedTranscriber(model, workers, chunk_seconds=10, overlap_seconds=1)
+        transcribers.append(t)
+        return t
+
+    yield make
+    for t in transcribers:
+        t.close()
+
+
+def test_chunked_matches_whole_file(chunked):
+    media = Path("meeting.wav")
+    whole = Transcriber(ToneModel()).transcribe(media)
+    got = chunked(ToneModel()).transcribe(media)
+    assert [s["text"] for s in got] == [f"word{k}" for k in range(WORDS)] == [s["text"] for s in whole]
+    for a, b in zip(got, whole):
+        assert a["start"] == pytest.approx(b["start"], abs=0.011)
+        assert a["end"] == pytest.approx(b["end"], abs=0.011)
+    # absolute, not chunk-relative: the last word starts near the end of the audio
+    assert got[-1]["start"] == pytest.approx((WORDS - 1) * (WORD_SECONDS + GAP_SECONDS), abs=0.011)
+
+
+def test_output_order_survives_out_of_order_chunks(chunked, tmp_path):
+    log = tmp_path / "finished.txt"
+    transcriber = chunked(ToneModel(str(log)))
+    transcriber.load()
+    got = transcriber.transcribe(Path("meeting.wav"))
+    finished = log.read_text(encoding="utf-8").split()
+    assert transcriber.stats["chunks"] == len(finished) > 2
+    assert finished[-1] == "word0"  # the first chunk was the last to finish
+    assert [s["text"] for s in got] == [f"word{k}" for k in range(WORDS)]
+    assert all(a["start"] < b["start"] for a, b in zip(got, got[1:]))
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import asr_worker
+import transcript_cache
+from asr_worker import Spool, TranscriptionError, Worker
+from transcript_cache import TranscriptCache
+from utils import atomic_write_json
+
+
+class FakeTranscriber:
+    """Stands in for Whisper: fixed segments, counts its calls."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+
+    def settings(self):
+        return {"model": "fake", "chunked": False}
+
+    def transcribe(self, media):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("decoder exploded")
+        self.stats = {"decode": 0.0, "transcribe": 0.0, "audio_seconds": 3.0}
+        return [{"start": 0.0, "end": 2.0, "text": "Anna, can you send the report by Friday?"},
+                {"start": 2.0, "end": 3.0, "text": "  "}]
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(tmp_path / "queue")
+
+
+@pytest.fixture
+def media(tmp_path):
+    p = tmp_path / "standup.mp4"
+    p.write_bytes(b"not really a video")
+    return p
+
+
+def test_run_once_writes_transcript(spool, media, tmp_path):
+    out = tmp_path / "standup.txt"
+    job_id = spool.submit(media, out)
+    fake = FakeTranscriber()
+    assert Worker(spool, fake).run_once() == 1
+    result = spool.result(job_id)
+    assert result["status"] == "ok"
+    assert result["segments"] == 2
+    assert out.read_text(encoding="utf-8") == "[0.00-2.00] UNK: Anna, can you send the report by Friday?\n"
+    assert spool.state(job_id) == "done"
+    assert not list(spool.running.glob("*.json"))
+
+
+def test_failed_jobs_report_the_error(spool, media, tmp_path):
+    failing = spool.submit(media, tmp_path / "a.txt")
+    missing = spool.submit(tmp_path / "gone.mp4", tmp_path / "b.txt")
+    assert Worker(spool, FakeTranscriber(fail=True)).run_once() == 2
+    assert spool.result(failing)["status"] == "error"
+    assert "decoder exploded" in spool.result(failing)["error"]
+    assert "media not found" in spool.result(missing)["error"]
+    assert not (tmp_path / "a.txt").exists()
+
+
+def test_recover_requeues_only_jobs_of_dead_workers(spool, media, tmp_path):
+    spool.ensure()
+    orphan = spool.submit(media, tmp_path / "orphan.txt")
+    busy = spool.submit(media, tmp_path / "busy.txt")
+    for job_id, owner in ((orphan, _dead_pid()), (busy, os.getppid())):
+        job = asr_worker._read_json(spool.pending / f"{job_id}.json")
+        job["worker"] = owner
+        atomic_write_json(spool.running / f"{job_id}.json", job)
+        (spool.pending / f"{job_id}.json").unlink()
+
+    worker = Worker(spool, FakeTranscriber())
+    assert worker.recover() == 1
+    assert spool.state(orphan) == "pending"
+    assert spool.state(busy) == "running"  # its worker is still alive
+    assert worker.run_once() == 1
+    assert spool.result(orphan)["status"] == "ok"
+
+
+def test_serve_exits_when_another_worker_holds_the_lock(spool):
+    spool.ensure()
+    spool.lock.write_text(str(os.getppid()), encoding="utf-8")
+    fake, logs = FakeTranscriber(), []
+    Worker(spool, fake).serve(idle_timeout=5, log=logs.append)
+    assert fake.loads == 0
+    assert "already serves" in logs[0]
+    assert spool.lock.read_text(encoding="utf-8") == str(os.getppid())
+
+
+def test_stale_lock_is_taken_over(spool):
+    spool.ensure()
+    spool.lock.write_text(str(_dead_pid()), encoding="utf-8")
+    assert spool.acquire()
+    assert spool.lock_holder() == os.getpid()
+    spool.release()
+    assert not spool.lock.exists()
+
+
+@pytest.fixture
+def serving(spool, tmp_path, monkeypatch):
+    """A worker serving `spool` from a thread of this process, with its own transcript cache."""
+    monkeypatch.setattr(transcript_cache.TranscriptCache.__init__, "__defaults__", (tmp_path / "transcripts",))
+    fake = FakeTranscriber()
+    worker = Worker(spool, fake, TranscriptCache())
+    thread = threading.Thread(target=worker.serve, kwargs={"idle_timeout": 30, "log": lambda m: None}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while spool.worker() is None:
+        assert time.monotonic() < deadline, "worker did not start"
+        time.sleep(0.01)
+    yield fake
+    spool.stop_flag.touch()
+    thread.join(5)
+    assert not spool.lock.exists()
+
+
+def test_transcribe_through_the_worker_and_the_cache(spool, media, tmp_path, serving):
+    out = tmp_path / "standup.txt"
+    first = asr_worker.transcribe(media, out, spool, timeout=10)
+    assert first["status"] == "ok" and not first["cached"]
+    assert serving.loads == 1 and serving.calls == 1
+    stamp = out.stat().st_mtime_ns
+
+    again = asr_worker.transcribe(media, out, spool, timeout=10)
+    assert again["cached"] and serving.calls == 1
+    assert out.stat().st_mtime_ns == stamp  # identical transcript left untouched
+
+    fresh = asr_worker.transcribe(media, out, spool, timeout=10, cache=False)
+    assert not fresh["cached"] and serving.calls == 2
+    assert not list(spool.done.glob("*.json"))  # results are collected
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_transcribe_raises_on_missing_media(spool, tmp_path, serving, cache):
+    with pytest.raises(TranscriptionError, match="media not found"):
+        asr_worker.transcribe(tmp_path / "gone.mp4", tmp_path / "gone.txt", spool, timeout=10, cache=cache)
+
+
+def test_transcribe_raises_on_failed_job(spool, media, tmp_path, serving):
+    serving.fail = True
+    with pytest.raises(TranscriptionError, match="decoder exploded"):
+        asr_worker.transcribe(media, tmp_path / "out.txt", spool, timeout=10)
+
+
+def test_cli_status_stop_and_missing_media(spool, tmp_path, capsys):
+    def run(*args):
+        with pytest.raises(SystemExit) as e:
+            asr_worker.main([*args, "--spool", str(spool.root)])
+        return e.value.code, capsys.readouterr().out
+
+    assert run("status") == (0, "No worker running; queue: 0 pending, 0 running, 0 done\n")
+    assert run("stop") == (0, "Stop requested\n")
+    assert spool.stop_flag.exists()
+    code, out = run("submit", str(tmp_path / "gone.mp4"), str(tmp_path / "gone.txt"))
+    assert code == 1 and "media not found" in out
@@ -0,0 +1,96 @@
+import random
+
+import numpy as np
+import pytest
+from scipy.optimize import linear_sum_assignment
+
+import evaluate
+from evaluate import evaluate as run_evaluate, features, match_block
+
+THRESHOLDS = [0.1, 0.25, 1 / 3, 0.5, 0.6, 0.75, 0.9, 1.0]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def brute_force(preds, golds, threshold):
+    """Best total similarity of a one-to-one matching over the full matrix."""
+    sim = np.array([[jaccard(p, g) for g in golds] for p in preds])
+    sim[sim < threshold] = 0.0
+    r, c = linear_sum_assignment(sim, maximize=True)
+    return float(sim[r, c].sum())
+
+
+def random_sets(rng, n, vocab=14):
+    return [frozenset(rng.sample(range(vocab), rng.randint(1, 8))) for _ in range(n)]
+
+
+def check_valid(preds, golds, threshold, matches):
+    assert len({i for i, _, _ in matches}) == len({j for _, j, _ in matches}) == len(matches)
+    for i, j, s in matches:
+        assert s == pytest.approx(jaccard(preds[i], golds[j]))
+        assert s >= threshold
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_match_block_is_the_optimal_assignment(threshold):
+    rng = random.Random(int(threshold * 1000))
+    for _ in range(300):
+        preds, golds = random_sets(rng, rng.randint(1, 7)), random_sets(rng, rng.randint(1, 7))
+        matches = match_block(preds, golds, threshold)
+        check_valid(preds, golds, threshold, matches)
+        assert sum(s for _, _, s in matches) == pytest.approx(brute_force(preds, golds, threshold)), (preds, golds)
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_prefix_filter_finds_the_best_gold(threshold):
+    # one prediction: no assignment to hide a missed candidate behind
+    rng = random.Random(7 + int(threshold * 1000))
+    for _ in range(500):
+        pred, golds = random_sets(rng, 1), random_sets(rng, rng.randint(1, 12), vocab=10)
+        best = max(jaccard(pred[0], g) for g in golds)
+        matches = match_block(pred, golds, threshold)
+        if best >= threshold:
+            assert len(matches) == 1 and matches[0][2] == pytest.approx(best), (pred, golds)
+        else:
+            assert matches == []
+
+
+def test_greedy_fallback_stays_one_to_one(monkeypatch):
+    monkeypatch.setattr(evaluate, "HUNGARIAN_MAX_CELLS", 0)
+    rng = random.Random(3)
+    for _ in range(200):
+        preds, golds = random_sets(rng, 6), random_sets(rng, 6)
+        check_valid(preds, golds, 0.3, match_block(preds, golds, 0.3))
+
+
+def test_char_features_and_empty_text():
+    assert features("Send it", "char") == {" se", "sen", "end", "nd ", "d i", " it", "it "}
+    assert features("can you please", "token") == {"can", "you", "please"}  # only stopwords: keep them
+    assert match_block([frozenset()], [frozenset({"a"})], 0.5) == []
+
+
+def test_evaluate_scores_each_meeting():
+    pred = [
+        {"meeting": "m1", "assignee": "Anna", "action_item": "send the budget report", "deadline_iso": "2024-03-01"},
+        {"meeting": "m1", "assignee": "Anna", "action_item": "book the meeting room", "deadline_text": "tomorrow"},
+        {"meeting": "m1", "assignee": "Bob", "action_item": "review the slides"},
+        {"meeting": "m2", "assignee": "Cara", "action_item": "order new laptops"},
+    ]
+    gold = [
+        {"meeting": "m1", "assignee": "Anna", "action_item": "send budget report", "deadline_iso": "2024-03-01"},
+        {"meeting": "m1", "assignee": "anna", "action_item": "book meeting room", "deadline_text": "Tomorrow "},
+        {"meeting": "m1", "assignee": "Anna", "action_item": "review the slides"},  # same text, other assignee
+        {"meeting": "m2", "assignee": "Cara", "action_item": "order new laptops", "deadline_text": "friday"},
+        {"meeting": "m3", "assignee": "Dan", "action_item": "call the vendor"},
+    ]
+    report = run_evaluate(pred, gold)
+    m = report["meetings"]
+    assert m["m1"] == {"tp": 2, "fp": 1, "fn": 1, "precision": 0.6667, "recall": 0.6667, "f1": 0.6667, "deadline_acc": 1.0}
+    assert m["m2"] == {"tp": 1, "fp": 0, "fn": 0, "precision": 1.0, "recall": 1.0, "f1": 1.0, "deadline_acc": 0.0}
+    assert m["m3"] == {"tp": 0, "fp": 0, "fn": 1, "precision": 0.0, "recall": 0.0, "f1": 0.0, "deadline_acc": None}
+    assert report["overall"] == {"tp": 3, "fp": 1, "fn": 2, "precision": 0.75, "recall": 0.6, "f1": 0.6667,
+                                 "deadline_acc": 0.6667}
+    # blocking on the meeting only lets Bob's prediction match Anna's gold
+    assert run_evaluate(pred, gold, blocking="meeting")["meetings"]["m1"]["tp"] == 3
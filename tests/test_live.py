@@ -0,0 +1,15 @@
+import pytest
+
+from live import parse_segment
+
+
+def test_segment_and_transcript_lines():
+    utt = parse_segment('{"start": 1.5, "end": 3.0, "text": " Can you send it? ", "speaker": "A"}\n')
+    assert (utt.speaker, utt.text, utt.start, utt.end) == ("A", "Can you send it?", 1.5, 3.0)
+    assert parse_segment('{"start": 0, "end": 1, "text": "hi"}').speaker == "UNK"
+    assert parse_segment('{"start": 0, "end": 1, "text": "  "}') is None
+
+
+@pytest.mark.parametrize("line", ["{bad json", '{"text": "unterminated', "{1: 2}", "{}"])
+def test_malformed_segments_are_skipped(line):
+    assert parse_segment(line) is None
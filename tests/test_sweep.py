@@ -0,0 +1,101 @@
+import random
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+from corpus_cache import iter_meetings
+from infer_ml import ml_pipeline
+from pipeline import labeled_utterances, load_model
+from sweep import Curve, emitted_scores, point, score_corpus
+from synth import generate_corpus
+
+
+def brute_force(scores, gold, positives, base, t):
+    pred = base | (np.nan_to_num(scores, nan=-np.inf) >= t)
+    return point(int(np.count_nonzero(pred & gold)), int(np.count_nonzero(pred & ~gold)), positives, t)
+
+
+def random_case(rng):
+    n = rng.randint(0, 60)
+    # few distinct values, so ties are common
+    scores = np.array([rng.choice([np.nan, 0.0, 0.1, 0.25, 0.5, 0.5, 0.75, 0.9, 1.0, rng.random()]) for _ in range(n)])
+    gold = np.array([rng.random() < 0.3 for _ in range(n)], dtype=bool)
+    base = np.array([rng.random() < 0.2 for _ in range(n)], dtype=bool) if rng.random() < 0.5 else None
+    positives = int(np.count_nonzero(gold)) + rng.randint(0, 3)  # gold actions not placed on an utterance
+    return scores, gold, positives, base
+
+
+def assert_point(got, want):
+    assert (got["tp"], got["fp"]) == (want["tp"], want["fp"])
+    for key in ("precision", "recall", "f1"):
+        assert got[key] == pytest.approx(want[key])
+
+
+def test_curve_matches_brute_force():
+    rng = random.Random(11)
+    for _ in range(300):
+        scores, gold, positives, base = random_case(rng)
+        curve = Curve(scores, gold, positives, base)
+        base = np.zeros(gold.size, dtype=bool) if base is None else base
+        grid = np.array([-0.1, 0.0, 0.1, 0.25, 0.3, 0.5, 0.9, 1.0, 1.1])
+        at = curve.at(grid)
+        for k, t in enumerate(grid):
+            assert_point({key: v[k] for key, v in at.items()}, brute_force(scores, gold, positives, base, t))
+
+        full = curve.full()
+        distinct = sorted({s for s, b in zip(scores, base) if not b and not np.isnan(s)}, reverse=True)
+        assert full["threshold"].tolist() == distinct
+        points = [brute_force(scores, gold, positives, base, t) for t in distinct]
+        for k, want in enumerate(points):
+            assert_point({key: v[k] for key, v in full.items()}, want)
+
+        best = curve.best()
+        if not distinct:
+            assert best is None
+            continue
+        top = max(p["f1"] for p in points)
+        assert best["f1"] == pytest.approx(top)
+        assert best["threshold"] == max(p["threshold"] for p in points if p["f1"] == pytest.approx(top))
+
+
+def test_nan_scores_are_only_predicted_through_base():
+    scores = np.array([np.nan, np.nan, 0.9, 0.2])
+    gold = np.array([True, False, True, False])
+    curve = Curve(scores, gold, 3, base=np.array([True, False, False, False]))
+    assert (curve.base_tp, curve.base_fp) == (1, 0)
+    assert curve.full()["threshold"].tolist() == [0.9, 0.2]
+    assert curve.at(np.array([0.0]))["tp"].tolist() == [2]
+    assert curve.at(np.array([0.0]))["fp"].tolist() == [1]
+    assert Curve(np.full(3, np.nan), np.ones(3, dtype=bool), 3).best() is None
+
+
+@pytest.fixture(scope="module")
+def scored_corpus(tmp_path_factory):
+    root = tmp_path_factory.mktemp("sweep")
+    raw = root / "raw"
+    generate_corpus(raw, utterances=2000, per_meeting=400, action_rate=0.15, seed=5, gold_path=root / "gold.jsonl")
+    texts, labels = zip(*labeled_utterances(iter_meetings(raw, use_cache=False)))
+    # a deliberately weak model, so plenty of scores fall on both sides of the thresholds
+    clf = make_pipeline(TfidfVectorizer(max_features=300), LogisticRegression(C=0.3))
+    model_path = str(root / "clf.joblib")
+    joblib.dump(clf.fit(texts, labels), model_path)
+    assert load_model(model_path) is None
+    return raw, model_path, score_corpus(raw, model_path, root / "gold.jsonl", use_cache=False)
+
+
+@pytest.mark.parametrize("threshold, min_task_words", [(0.5, 4), (0.2, 4), (0.3, 1), (0.7, 6)])
+def test_ml_point_counts_what_infer_ml_emits(scored_corpus, threshold, min_task_words):
+    raw, model_path, arrays = scored_corpus
+    positives = max(1, int(np.count_nonzero(arrays["gold"])))
+    curve = Curve(emitted_scores(arrays, min_task_words), arrays["gold"], positives)
+    current = curve.at(np.array([threshold]))
+    predicted = int(current["tp"][0] + current["fp"][0])
+
+    pipeline = ml_pipeline(model_path, threshold, min_task_words)
+    emitted = sum(len(pipeline(m)) for m in iter_meetings(raw, use_cache=False))
+    assert emitted > 0
+    assert predicted == emitted